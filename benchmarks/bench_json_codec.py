@@ -0,0 +1,64 @@
+"""
+Microbenchmark for the JSON backends of the points pipeline.
+
+Reads all_points.jsonl and bms_vocabs.json from PARSER_OUTPUT_DIR and reports,
+for every installed backend, how many records per second it:
+- decodes into dicts (label_point_tokens input);
+- decodes into the point_label / building_id columns (generate_bms_vocab input);
+- encodes as annotated output lines, for the tokens and compact output modes,
+  through codec.encoder() as the pipeline does. The tokens mode uses the
+  default separators, which every backend writes with json's encoder.
+
+Run with:
+    poetry run python -m benchmarks.bench_json_codec
+"""
+
+import os
+import time
+from pathlib import Path
+
+from src.bms.json_codec import available_backends, get_codec
+from src.bms.label_point_tokens import TokenLabeler, annotate_record, load_vocabs
+from src.bms.tokenizer import tokenize, tokenize_with_spans
+
+
+def bench(fn, n_records, repeat=3):
+    """Return the best records/sec over `repeat` runs of fn()."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return n_records / best
+
+
+def main():
+    """Run the JSON backend microbenchmark and print records/sec per backend and task."""
+    out_dir = Path(os.getenv("PARSER_OUTPUT_DIR", "data/output/point-name-parser"))
+    lines = (out_dir / "all_points.jsonl").read_bytes().splitlines()
+    records = get_codec("stdlib").decode_records(lines)
+    vocabs = load_vocabs(str(out_dir / "bms_vocabs.json"))
+    labeler = TokenLabeler(vocabs)
+    annotated = [annotate_record(r, vocabs, tokens=tokenize(r["point_label"]), labeler=labeler) for r in records]
+    compact = []
+    for r in records:
+        tokens, spans = tokenize_with_spans(r["point_label"])
+        compact.append(annotate_record(r, vocabs, tokens=tokens, spans=spans, output_mode="compact", labeler=labeler))
+    print(f"Records: {len(records)} from {out_dir}")
+
+    columns = ["point_label", "building_id"]
+    for name in available_backends():
+        codec = get_codec(name)
+        encode, encode_compact = codec.encoder(), codec.encoder((",", ":"))
+        tasks = [
+            ("decode records", lambda: codec.decode_records(lines)),
+            ("decode columns", lambda: codec.decode_columns(lines, columns)),
+            ("encode tokens", lambda: [encode(a) for a in annotated]),
+            ("encode compact", lambda: [encode_compact(a) for a in compact]),
+        ]
+        for task, fn in tasks:
+            print(f"  {name:8s} {task:16s} {bench(fn, len(records)):>12,.0f} records/sec")
+
+
+if __name__ == "__main__":
+    main()
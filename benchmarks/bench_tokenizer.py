@@ -0,0 +1,51 @@
+"""
+Microbenchmark for the BMS label tokenizers.
+
+Reads every cell of every building CSV in BMS_INPUT_DIR and reports how many
+labels per second each tokenizer processes.
+
+Run with:
+    poetry run python -m benchmarks.bench_tokenizer
+"""
+
+import csv
+import os
+import time
+from pathlib import Path
+
+from src.bms.tokenizer import tokenize, tokenize_single_pass
+
+
+def load_labels(raw_dir: Path) -> list[str]:
+    """Collect every cell string from the CSV files in raw_dir."""
+    labels = []
+    for csv_path in sorted(raw_dir.glob("*.csv")):
+        with csv_path.open("r", encoding="utf-8", errors="replace", newline="") as f:
+            for row in csv.reader(f):
+                labels.extend(row)
+    return labels
+
+
+def bench(fn, labels, repeat=3):
+    """Return the best labels/sec over `repeat` runs of fn over labels."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for lbl in labels:
+            fn(lbl)
+        best = min(best, time.perf_counter() - start)
+    return len(labels) / best
+
+
+def main():
+    """Run the tokenizer microbenchmark and print labels/sec per engine."""
+    raw_dir = Path(os.getenv("BMS_INPUT_DIR", "data/bms-fierro/buildings"))
+    labels = load_labels(raw_dir)
+    print(f"Labels: {len(labels)} from {raw_dir}")
+
+    for name, fn in [("tokenize", tokenize), ("tokenize_single_pass", tokenize_single_pass)]:
+        print(f"  {name:24s} {bench(fn, labels):>12,.0f} labels/sec")
+
+
+if __name__ == "__main__":
+    main()
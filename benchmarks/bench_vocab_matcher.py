@@ -0,0 +1,109 @@
+"""
+Microbenchmark for the glued-token splitter of the labeller.
+
+Reads bms_vocabs.json (and its frequency table, from bms_vocabs.stats.json if
+the vocab output was split) and all_points.jsonl from PARSER_OUTPUT_DIR and
+reports labels/sec of annotating every point with and without --split-glued,
+the throughput cost per label. Over the tokens of the frequency table, it reports:
+- how many MISC tokens (distinct, and weighted by frequency) --split-glued splits;
+- tokens/sec of TokenLabeler with and without split_glued, from a cold cache;
+- tokens/sec of VocabTrie.segment on the MISC tokens, and on longer tokens made
+  by gluing four split tokens together, against a dynamic program testing every
+  substring of the token against the vocabulary set.
+
+Run with:
+    poetry run python -m benchmarks.bench_vocab_matcher
+"""
+
+import os
+import time
+from pathlib import Path
+
+from src.bms.dataset_io import iter_record_batches
+from src.bms.generate_bms_vocab import load_vocab_stats
+from src.bms.label_point_tokens import BATCH_SIZE, TokenLabeler, annotate_batch, load_vocabs
+from src.bms.vocab_matcher import MIN_PIECE_LENGTH, VocabTrie
+
+
+def bench(fn, items, repeat=3):
+    """Return the best items/sec over `repeat` runs of fn(items)."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(items)
+        best = min(best, time.perf_counter() - start)
+    return len(items) / best
+
+
+def segment_by_substrings(token: str, words: set[str], min_length: int = MIN_PIECE_LENGTH):
+    """Baseline: fewest-words split of token testing every substring against the word set."""
+    text = token.upper()
+    n = len(text)
+    pieces = [None] * n + [0]
+    for start in range(n - min_length, -1, -1):
+        for end in range(n, start + min_length - 1, -1):
+            if text[start:end] in words and pieces[end] is not None:
+                if pieces[start] is None or pieces[end] + 1 < pieces[start]:
+                    pieces[start] = pieces[end] + 1
+    return pieces[0]
+
+
+def main():
+    """Run the glued-token microbenchmark and print coverage and throughput."""
+    out_dir = Path(os.getenv("PARSER_OUTPUT_DIR", "data/output/point-name-parser"))
+    vocab_path = out_dir / "bms_vocabs.json"
+    vocabs = load_vocabs(str(vocab_path))
+    frequency = load_vocab_stats(vocab_path)["frequency"]
+    tokens = list(frequency)
+
+    plain = TokenLabeler(vocabs)
+    misc = [tok for tok in tokens if plain.label(tok) == "MISC"]
+    trie = VocabTrie(plain.table)
+    split = [tok for tok in misc if trie.segment(tok)]
+    print(f"Tokens: {len(tokens)} from {vocab_path}, {sum(frequency.values())} occurrences")
+    print(f"  MISC tokens: {len(misc)} ({sum(frequency[tok] for tok in misc)} occurrences)")
+    print(f"  split by --split-glued: {len(split)} ({sum(frequency[tok] for tok in split)} occurrences)")
+
+    points_path = out_dir / "all_points.jsonl"
+    batches = list(iter_record_batches(points_path, BATCH_SIZE))
+    n_labels = sum(map(len, batches))
+
+    def annotate(split_glued):
+        def run(_items):
+            labeler = TokenLabeler(vocabs, split_glued=split_glued)
+            for raw_records in batches:
+                annotate_batch(raw_records, vocabs, labeler)
+
+        return run
+
+    plain_rate = bench(annotate(False), range(n_labels))
+    split_rate = bench(annotate(True), range(n_labels))
+    print(f"Points: {n_labels} labels from {points_path}")
+    print(f"  annotate               {plain_rate:>12,.0f} labels/sec  ({1e6 / plain_rate:.2f} us/label)")
+    print(f"  annotate + split_glued {split_rate:>12,.0f} labels/sec  ({1e6 / split_rate:.2f} us/label)")
+    print(f"  cost of --split-glued: {1e6 / split_rate - 1e6 / plain_rate:.2f} us/label")
+
+    def label(split_glued):
+        def run(items):
+            labeler = TokenLabeler(vocabs, split_glued=split_glued)
+            labeler.split_glued_tokens(items, None, labeler.label_tokens(items))
+
+        return run
+
+    words = {word for word in plain.table if len(word) >= MIN_PIECE_LENGTH}
+    long_tokens = ["".join(split[i : i + 4]) for i in range(len(split))]
+    tasks = [
+        ("label", tokens, label(False)),
+        ("label + split_glued", tokens, label(True)),
+        ("trie segment (MISC)", misc, lambda items: [trie.segment(tok) for tok in items]),
+        ("substring DP (MISC)", misc, lambda items: [segment_by_substrings(tok, words) for tok in items]),
+        ("trie segment (long)", long_tokens, lambda items: [trie.segment(tok) for tok in items]),
+        ("substring DP (long)", long_tokens, lambda items: [segment_by_substrings(tok, words) for tok in items]),
+    ]
+    for task, items, fn in tasks:
+        rate = bench(fn, items)
+        print(f"  {task:22s} {rate:>12,.0f} tokens/sec  ({1e6 / rate:.2f} us/token)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Reading and writing the extracted BMS points dataset.
+
+The points dataset has one record per BMS point with the fields building_id,
+source_file, point_label and point_label_col. It is written by
+`src.bms.extract_point_names` and read by `src.bms.generate_bms_vocab` and
+`src.bms.label_point_tokens`, in one of two formats:
+
+- jsonl (all_points.jsonl): one JSON object per line, easy to inspect;
+- parquet (all_points.parquet): columnar, with building_id, source_file and
+  point_label_col dictionary-encoded, so the repeated metadata strings are
+  stored once per row group and no JSON parsing is needed when reading.
+
+Readers hand out records in batches, so downstream code can tokenize and
+label a batch at a time regardless of the file format. They can also read a
+single shard of the dataset (see plan_shards), so a pass over the points can
+be split across processes or machines: a shard is a byte range of the JSONL
+file (holding the lines that start inside it) or a row range of the Parquet file
+made of whole row groups.
+JSONL lines are decoded by the JSON backend chosen with json_backend (see
+src.bms.json_codec); every backend gives the same records.
+
+An incrementally extracted JSONL dataset has a manifest next to it (see
+load_manifest) recording the byte range of every source file's rows.
+"""
+
+import json
+from bisect import bisect_left
+from collections.abc import Iterator
+from itertools import accumulate, islice
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from src.bms.json_codec import get_codec
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+POINTS_FORMATS = ("jsonl", "parquet")
+
+POINT_COLUMNS = ["building_id", "source_file", "point_label", "point_label_col"]
+
+# Columns with few distinct values, stored dictionary-encoded in Parquet
+DICTIONARY_COLUMNS = ["building_id", "source_file", "point_label_col"]
+
+# Rows per Parquet row group; Parquet shards are made of whole row groups
+POINTS_ROW_GROUP_SIZE = 65_536
+
+
+def points_path(output_dir, fmt: str = "jsonl") -> Path:
+    """Return the path of the points dataset in output_dir for the given format."""
+    if fmt not in POINTS_FORMATS:
+        raise ValueError(f"Unknown points format {fmt!r}, expected one of {POINTS_FORMATS}")
+    return Path(output_dir) / f"all_points.{fmt}"
+
+
+def is_parquet(path) -> bool:
+    """Check if a points dataset path is a Parquet file (by suffix)."""
+    return Path(path).suffix == ".parquet"
+
+
+def write_points_parquet(df: "pd.DataFrame", path, row_group_size: int = POINTS_ROW_GROUP_SIZE):
+    """Write a points DataFrame to Parquet with the metadata columns dictionary-encoded."""
+    df = df[POINT_COLUMNS].astype({c: "category" for c in DICTIONARY_COLUMNS})
+    df.to_parquet(path, index=False, row_group_size=row_group_size)
+
+
+def read_points_frame(path) -> "pd.DataFrame":
+    """Load a whole points dataset (JSONL or Parquet) into a DataFrame."""
+    # pandas is only needed when loading the whole dataset (generate_bms_vocab reads batches)
+    import pandas as pd
+
+    if is_parquet(path):
+        return pd.read_parquet(path)
+    return pd.read_json(path, lines=True)
+
+
+def row_group_bounds(metadata) -> list[int]:
+    """First row of every row group of a Parquet file's metadata, followed by its number of rows."""
+    return list(accumulate((metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)), initial=0))
+
+
+def manifest_path_for(bms_output_file) -> Path:
+    """The incremental-extraction manifest lives next to the output, e.g. all_points.manifest.json."""
+    return Path(bms_output_file).with_suffix(".manifest.json")
+
+
+def load_manifest(bms_output_file, options: dict | None) -> dict[str, dict[str, Any]]:
+    """
+    Return the per-file manifest entries for bms_output_file, or {} if there is no usable manifest.
+    A manifest is only trusted if the output file still has the size and mtime it recorded
+    and was written with the same extraction options (dedup, sniff_rows); options=None accepts any.
+    """
+    out_path = Path(bms_output_file)
+    manifest_path = manifest_path_for(out_path)
+    if not out_path.exists() or not manifest_path.exists():
+        return {}
+
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    stat = out_path.stat()
+    if manifest.get("output_size") != stat.st_size or manifest.get("output_mtime_ns") != stat.st_mtime_ns:
+        print(f"WARNING: {out_path} changed since {manifest_path} was written, rebuilding from scratch.")
+        return {}
+    if options is not None and manifest.get("options") != options:
+        return {}
+    return manifest.get("files", {})
+
+
+def plan_shards(path, n_shards: int) -> list[tuple[int, int]]:
+    """
+    Split a points dataset into at most n_shards contiguous (start, end) ranges covering it:
+    byte ranges for JSONL, row ranges for Parquet. Parquet ranges start and end on row group
+    boundaries, so each shard decodes only its own row groups. Empty ranges are dropped.
+    """
+    if is_parquet(path):
+        # pyarrow is only needed when reading Parquet
+        import pyarrow.parquet as pq
+
+        groups = row_group_bounds(pq.ParquetFile(path).metadata)
+        total = groups[-1]
+    else:
+        total = Path(path).stat().st_size
+    n_shards = max(1, min(n_shards, total))
+    bounds = [total * i // n_shards for i in range(n_shards + 1)]
+    if is_parquet(path):
+        bounds = [groups[bisect_left(groups, bound)] for bound in bounds]
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+def iter_jsonl_chunks(
+    path, chunk_size: int, start: int = 0, end: int | None = None, as_bytes: bool = False
+) -> Iterator[list[str]] | Iterator[list[bytes]]:
+    """
+    Yield the lines of a JSONL file that start at a byte offset in [start, end), chunk_size lines at a time.
+    Lines are decoded to str unless as_bytes=True (the JSON decoders read UTF-8 bytes directly).
+    """
+    with open(path, "rb") as f:
+        if start > 0:
+            # Skip the line running across start; it belongs to the previous shard
+            f.seek(start - 1)
+            f.readline()
+        pos = f.tell()
+        while end is None or pos < end:
+            chunk = list(islice(f, chunk_size))
+            if not chunk:
+                break
+            if end is not None:
+                line_starts = list(accumulate((len(line) for line in chunk), initial=pos))
+                chunk = chunk[: bisect_left(line_starts, end, hi=len(chunk))]
+                pos = line_starts[-1]
+            yield chunk if as_bytes else [line.decode("utf-8") for line in chunk]
+
+
+def iter_parquet_batches(path, batch_size: int, columns: list[str] | None = None, shard=None):
+    """
+    Yield pyarrow record batches of a Parquet file, restricted to the row range shard=(start, end) if given.
+    Only the row groups overlapping the shard are decoded.
+    """
+    # pyarrow is only needed when reading Parquet
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    groups = row_group_bounds(parquet_file.metadata)
+    start, end = shard if shard is not None else (0, groups[-1])
+    selected = [i for i in range(len(groups) - 1) if groups[i] < end and groups[i + 1] > start]
+    if not selected:
+        return
+    row = groups[selected[0]]
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns, row_groups=selected):
+        lo, hi = row, row + batch.num_rows
+        row = hi
+        if lo < start or hi > end:
+            batch = batch.slice(max(start - lo, 0), min(hi, end) - max(lo, start))
+        yield batch
+
+
+def arrow_column_to_list(arr) -> list:
+    """Convert a pyarrow column to a Python list, decoding dictionary columns through their (small) dictionary."""
+    if hasattr(arr, "dictionary"):
+        values = arr.dictionary.to_pylist()
+        return [None if i is None else values[i] for i in arr.indices.to_pylist()]
+    return arr.to_pylist()
+
+
+def iter_column_batches(
+    path,
+    batch_size: int,
+    columns: list[str],
+    defaults: dict[str, Any] | None = None,
+    shard=None,
+    json_backend: str | None = None,
+) -> Iterator[dict[str, list]]:
+    """
+    Yield a points dataset (JSONL or Parquet) column-wise: {column: [values]} for the
+    requested columns, at most batch_size rows at a time. Parquet columns are decoded
+    without building one dict per row; JSONL records missing a key get defaults[key] (or None).
+    With shard=(start, end) from plan_shards, only that shard is read.
+    """
+    if is_parquet(path):
+        for batch in iter_parquet_batches(path, batch_size, columns=columns, shard=shard):
+            yield {name: arrow_column_to_list(batch.column(name)) for name in columns}
+        return
+
+    codec = get_codec(json_backend)
+    start, end = shard or (0, None)
+    for chunk in iter_jsonl_chunks(path, batch_size, start, end, as_bytes=True):
+        yield codec.decode_columns(chunk, columns, defaults)
+
+
+def iter_record_batches(
+    path, batch_size: int, shard=None, json_backend: str | None = None
+) -> Iterator[list[dict[str, Any]]]:
+    """
+    Yield the records of a points dataset (JSONL or Parquet) as lists of dicts,
+    at most batch_size records at a time. Blank JSONL lines are skipped.
+    With shard=(start, end) from plan_shards, only that shard is read.
+    """
+    if is_parquet(path):
+        for batch in iter_parquet_batches(path, batch_size, shard=shard):
+            names = batch.schema.names
+            columns = [arrow_column_to_list(batch.column(name)) for name in names]
+            yield [dict(zip(names, row)) for row in zip(*columns)]
+        return
+
+    codec = get_codec(json_backend)
+    start, end = shard or (0, None)
+    for chunk in iter_jsonl_chunks(path, batch_size, start, end, as_bytes=True):
+        yield codec.decode_records(chunk)
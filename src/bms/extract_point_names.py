@@ -30,6 +30,18 @@ look like BMS-style strings and selects the column with the strongest signal.
 For each row in the chosen column, the module constructs a normalized record
 containing the extracted point label and relevant metadata. All records from
 all files are combined and written to a JSONL file, one point per line.
+With --sniff-rows N the header and point column are decided on the first N
+rows of each file only, and the full pass parses just the point column. In
+streaming mode (--streaming) files are always sniffed this way, and the point
+column is then read and written in chunks, so memory stays bounded regardless
+of how large the exports are.
+With --incremental, a manifest next to the output records each file's size,
+mtime, content hash, detected header and point column, and only new or changed
+files are parsed again; the rows of unchanged files are copied from the
+previous output.
+With --dedup, byte-identical CSV files (the same export saved under two names)
+are ingested only once, and repeated point labels within a building file are
+dropped, so duplicates do not inflate the downstream token statistics.
 
 Overall, this module serves as a normalization layer that converts messy,
 vendor-specific CSV dumps into a consistent corpus of BMS point names, ready for
@@ -37,14 +49,32 @@ token-level annotation, weak labeling, BIO tagging, and structured semantic
 interpretation.
 """
 
+import argparse
+import hashlib
+import json
 import os
 import random
 import re
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
+from typing import Any
 
+import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
 
+from src.bms.dataset_io import (
+    POINTS_FORMATS,
+    load_manifest,
+    manifest_path_for,
+    points_path,
+    read_points_frame,
+    write_points_parquet,
+)
+
 load_dotenv(override=True)
 
 
@@ -56,6 +86,10 @@ POINT_COLS_DICT = {
 
 PREFERRED_POINT_COLS = {c.lower(): c for c in POINT_COLS_DICT.values()}
 
+# Rows sniffed for header / point-column detection, and rows per read chunk in streaming mode
+HEAD_ROWS = 1000
+CHUNK_ROWS = 50_000
+
 
 def is_bms_style_string(s: str) -> bool:
     """
@@ -103,6 +137,72 @@ def is_bms_style_string(s: str) -> bool:
     return False
 
 
+# Per-byte character classes for ASCII, used by bms_style_mask
+_CH_SEP, _CH_DIGIT, _CH_ALPHA, _CH_UPPER, _CH_SPACE = 1, 2, 4, 8, 16
+_ASCII_CLASSES: np.ndarray = np.zeros(256, dtype=np.uint8)
+for _code in range(128):
+    _ch = chr(_code)
+    _ASCII_CLASSES[_code] = (
+        (_CH_SEP if _ch in "_.-" else 0)
+        | (_CH_DIGIT if _ch.isdigit() else 0)
+        | (_CH_ALPHA if _ch.isalpha() else 0)
+        | (_CH_UPPER if _ch.isupper() else 0)
+        | (_CH_SPACE if _ch.isspace() else 0)
+    )
+
+
+def bms_style_mask(values: pd.Series) -> pd.Series:
+    """
+    Vectorized is_bms_style_string: one boolean per value, same results.
+
+    All ASCII strings of the column are concatenated into one byte buffer; the
+    separator / digit / alpha / uppercase features are looked up per byte and summed
+    per string with NumPy, so the whole column is classified in one pass. Non-strings
+    are False, and the (rare) non-ASCII strings go through is_bms_style_string to keep
+    Unicode isdigit / isalpha / isupper semantics.
+    """
+    objs = values.to_numpy(dtype=object)
+    flags: np.ndarray = np.zeros(len(objs), dtype=bool)
+
+    is_ascii = np.fromiter((isinstance(v, str) and v.isascii() for v in objs), dtype=bool, count=len(objs))
+    for i in np.flatnonzero(~is_ascii):
+        flags[i] = is_bms_style_string(objs[i])
+
+    strs = objs[is_ascii]
+    lengths = np.fromiter(map(len, strs), dtype=np.int64, count=len(strs))
+    nonempty = lengths > 0
+    if nonempty.any():
+        classes = _ASCII_CLASSES[np.frombuffer("".join(strs).encode("ascii"), dtype=np.uint8)]
+        starts = (np.cumsum(lengths) - lengths)[nonempty]
+
+        def per_string(fn, arr):
+            return fn.reduceat(arr, starts)
+
+        has_sep = per_string(np.logical_or, (classes & _CH_SEP) > 0)
+        has_digit = per_string(np.logical_or, (classes & _CH_DIGIT) > 0)
+        n_alpha = per_string(np.add, ((classes & _CH_ALPHA) > 0).astype(np.int64))
+        n_upper = per_string(np.add, ((classes & _CH_UPPER) > 0).astype(np.int64))
+        has_upper = n_upper > 0
+
+        # length after strip(): from the first to the last non-whitespace character
+        pos = np.arange(len(classes))
+        non_space = (classes & _CH_SPACE) == 0
+        first = per_string(np.minimum, np.where(non_space, pos, len(classes)))
+        last = per_string(np.maximum, np.where(non_space, pos, -1))
+        stripped_len = np.where(last >= first, last - first + 1, 0)
+
+        upper_frac = np.where(n_alpha > 0, n_upper / np.maximum(n_alpha, 1), 0.0)
+        mostly_upper = upper_frac >= 0.7
+
+        ascii_flags: np.ndarray = np.zeros(len(strs), dtype=bool)
+        ascii_flags[nonempty] = (stripped_len >= 3) & (
+            mostly_upper | (has_sep & (has_digit | has_upper)) | (has_digit & has_upper)
+        )
+        flags[is_ascii] = ascii_flags
+
+    return pd.Series(flags, index=values.index, dtype=bool)
+
+
 def detect_header(df: pd.DataFrame) -> bool:
     """
     Decide whether the first row should be treated as header.
@@ -124,32 +224,27 @@ def detect_header(df: pd.DataFrame) -> bool:
     if n_rows == 0:
         return False
 
+    # Classify the first three rows in one vectorized pass: flags[i, j] is row i, column j
+    head = df.iloc[:3].astype(str).to_numpy()
+    flags = bms_style_mask(pd.Series(head.ravel(), dtype=object)).to_numpy().reshape(head.shape)
+
     # --- Case A: we have at least 3 rows -> use column-wise pattern ---
     if n_rows >= 3:
-        # Work column-wise
-        for col in df.columns:
-            col_vals = df[col].astype(str)
-            b0 = is_bms_style_string(col_vals.iloc[0])
-            b1 = is_bms_style_string(col_vals.iloc[1])
-            b2 = is_bms_style_string(col_vals.iloc[2])
-
-            # Candidate point column: row1 & row2 look like points, row0 does not.
-            if (not b0) and b1 and b2:
-                return True  # first row is header
+        # Candidate point column: row1 & row2 look like points, row0 does not.
+        if ((~flags[0]) & flags[1] & flags[2]).any():
+            return True  # first row is header
 
         # If no column satisfies the pattern, fall through to fallback below.
 
     # --- Case B: fallback for small or ambiguous cases ---
-    first_row = df.iloc[0].astype(str)
-    first_point_like = sum(is_bms_style_string(v) for v in first_row)
+    first_point_like = flags[0].sum()
 
     if n_rows == 1:
         # With only one row we can't be sure; default to "no header"
         return False
 
     # n_rows >= 2 here
-    second_row = df.iloc[1].astype(str)
-    second_point_like = sum(is_bms_style_string(v) for v in second_row)
+    second_point_like = flags[1].sum()
 
     # Classic simple rule: if row0 has no point-like strings at all,
     # and row1 does, it's likely a header row.
@@ -178,7 +273,7 @@ def guess_point_label_column(df: pd.DataFrame) -> str | None:
         if len(series) == 0:
             continue
         sample = series.sample(min(200, len(series)), random_state=42)
-        score = sample.apply(is_bms_style_string).mean()
+        score = bms_style_mask(sample).mean()
         if score > best_score:
             best_score = score
             best_col = col
@@ -199,81 +294,512 @@ def derive_building_id_from_filename(fname: str) -> str:
     return stem
 
 
-def load_all_bms_points(raw_dir: Path, bms_output_file):
-    """Load all BMS point names from CSV files in raw_dir and save to JSONL."""
-    records = []
+def promote_header(df: pd.DataFrame, has_header: bool | None = None) -> pd.DataFrame:
+    """
+    Use the first row as column names if it is a header, otherwise assign col_0, col_1, ...
+    has_header defaults to detect_header(df).
+    """
+    if has_header is None:
+        has_header = detect_header(df)
+
+    if has_header:
+        # Promote first row to header
+        df.columns = df.iloc[0].astype(str)
+        return df.iloc[1:].reset_index(drop=True)
+
+    # Synthetic column names
+    df.columns = [f"col_{i}" for i in range(df.shape[1])]
+    return df
+
+
+def to_point_records(df: pd.DataFrame, point_col: str, building_id: str, source_file: str) -> pd.DataFrame:
+    """Build the normalized output frame (one row per point) from the chosen column."""
+    return pd.DataFrame(
+        {
+            "building_id": building_id,
+            "source_file": source_file,
+            "point_label": df[point_col].astype(str),
+            "point_label_col": point_col,
+        },
+        index=df.index,
+    )
+
+
+def list_csv_files(raw_dir: Path) -> list[Path]:
+    """Return the CSV files of raw_dir sorted by filename, so output order is deterministic."""
+    return sorted(raw_dir.glob("*.csv"))
+
+
+def file_sha256(path: Path) -> str:
+    """Content hash of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def drop_duplicate_files(csv_paths: list[Path]) -> list[Path]:
+    """
+    Drop byte-identical copies of a building export (e.g. CHEM.csv and site-efcf3bcb-....csv).
+    Files are compared by size first and by content hash only when sizes collide;
+    the first file in csv_paths order is kept.
+    """
+    by_size: dict[int, list[Path]] = {}
+    for csv_path in csv_paths:
+        by_size.setdefault(csv_path.stat().st_size, []).append(csv_path)
+
+    first_by_hash: dict[str, Path] = {}
+    duplicates = set()
+    for csv_path in csv_paths:
+        if len(by_size[csv_path.stat().st_size]) < 2:
+            continue
+        digest = file_sha256(csv_path)
+        if digest in first_by_hash:
+            print(f"Skipping {csv_path}: duplicate of {first_by_hash[digest].name}")
+            duplicates.add(csv_path)
+        else:
+            first_by_hash[digest] = csv_path
+
+    return [csv_path for csv_path in csv_paths if csv_path not in duplicates]
+
+
+def drop_duplicate_labels(records: pd.DataFrame, seen: set[int]) -> pd.DataFrame:
+    """
+    Drop rows whose point_label was already seen in this building file.
+    Labels are compared by their 64-bit pandas hash; `seen` carries hashes across chunks.
+    """
+    hashes = pd.util.hash_pandas_object(records["point_label"], index=False)
+    keep = ~hashes.duplicated() & ~hashes.isin(seen)
+    seen.update(hashes[keep].tolist())
+    return records[keep.to_numpy()]
+
+
+def sniff_csv(csv_path: Path, head_rows: int = HEAD_ROWS) -> dict | None:
+    """
+    Decide header and point column from the first `head_rows` rows of a CSV file only.
+
+    detect_header looks at three rows and guess_point_label_column samples at most 200
+    values, so a small head is enough. Returns {"has_header", "point_col", "col_idx"}
+    (point_col / col_idx are None if no point column was found), or None if the file
+    cannot be read or is empty.
+    """
+    try:
+        head = pd.read_csv(csv_path, header=None, dtype=str, nrows=head_rows)
+    except Exception as e:
+        print(f"Skipping {csv_path}: {e}")
+        return None
+
+    if head.empty:
+        print(f"WARNING: Empty file {csv_path}, skipping.")
+        return None
+
+    has_header = detect_header(head)
+    head = promote_header(head, has_header)
+    point_col = guess_point_label_column(head)
+    if point_col is None:
+        print(f"WARNING: No point label column found in {csv_path}")
+        return {"has_header": has_header, "point_col": None, "col_idx": None}
+
+    col_idx = list(head.columns).index(point_col)
+    return {"has_header": has_header, "point_col": point_col, "col_idx": col_idx}
+
+
+def read_point_column(csv_path: Path, sniffed: dict, chunk_rows: int | None = None):
+    """
+    Read only the sniffed point column of a CSV file (usecols), dropping the header row.
+    Returns one DataFrame, or an iterator of DataFrames of `chunk_rows` rows if given;
+    the single column is named after the detected point column.
+    """
+    point_col, col_idx = sniffed["point_col"], sniffed["col_idx"]
+    if chunk_rows is None:
+        df = pd.read_csv(csv_path, header=None, dtype=str, usecols=[col_idx])
+        if sniffed["has_header"]:
+            df = df.iloc[1:].reset_index(drop=True)
+        return df.set_axis([point_col], axis=1)
+
+    def chunks():
+        reader = pd.read_csv(csv_path, header=None, dtype=str, usecols=[col_idx], chunksize=chunk_rows)
+        for i, chunk in enumerate(reader):
+            if i == 0 and sniffed["has_header"]:
+                chunk = chunk.iloc[1:]
+            yield chunk.set_axis([point_col], axis=1)
+
+    return chunks()
 
-    for csv_path in raw_dir.glob("*.csv"):
-        print(f"Processing {csv_path}")
+
+def extract_points_from_csv(
+    csv_path: Path, info: dict | None = None, dedup: bool = False, sniff_rows: int | None = None
+) -> pd.DataFrame | None:
+    """
+    Read one CSV file and return its normalized point records, or None if it has no usable points.
+    If `info` is given, the detected has_header and point_col are stored in it.
+    With dedup=True, repeated point labels within the file are dropped.
+    With sniff_rows, header and point column are decided on the first sniff_rows rows
+    (see sniff_csv) and only the point column is parsed from the full file.
+    """
+    print(f"Processing {csv_path}")
+    if sniff_rows:
+        sniffed = sniff_csv(csv_path, sniff_rows)
+        if sniffed is None:
+            return None
+        has_header, point_col = sniffed["has_header"], sniffed["point_col"]
+        if info is not None:
+            info["has_header"] = has_header
+            info["point_col"] = point_col
+        if point_col is None:
+            return None
+        try:
+            df = read_point_column(csv_path, sniffed)
+        except Exception as e:
+            print(f"Skipping {csv_path}: {e}")
+            return None
+    else:
         try:
             # Always read without header first
             df = pd.read_csv(csv_path, header=None, dtype=str)
         except Exception as e:
             print(f"Skipping {csv_path}: {e}")
-            continue
+            return None
 
         if df.empty:
             print(f"WARNING: Empty file {csv_path}, skipping.")
-            continue
+            return None
 
         # Decide if first row is header
-        if detect_header(df):
-            # Promote first row to header
-            df.columns = df.iloc[0].astype(str)
-            df = df.iloc[1:].reset_index(drop=True)
-        else:
-            # Synthetic column names
-            df.columns = [f"col_{i}" for i in range(df.shape[1])]
+        has_header = detect_header(df)
+        df = promote_header(df, has_header)
 
         point_col = guess_point_label_column(df)
+        if info is not None:
+            info["has_header"] = has_header
+            info["point_col"] = point_col
         if point_col is None:
             print(f"WARNING: No point label column found in {csv_path}")
-            continue
+            return None
+
+    building_id = derive_building_id_from_filename(csv_path.name)
 
-        building_id = derive_building_id_from_filename(csv_path.name)
+    records = to_point_records(df, point_col, building_id, csv_path.name)
+    if dedup:
+        records = drop_duplicate_labels(records, set())
+    return records
 
-        tmp = df.copy()
-        tmp["point_label"] = tmp[point_col].astype(str)
-        tmp["point_label_col"] = point_col
-        tmp["building_id"] = building_id
-        tmp["source_file"] = csv_path.name
 
-        records.append(tmp[["building_id", "source_file", "point_label", "point_label_col"]])
+def load_all_bms_points(
+    raw_dir: Path,
+    bms_output_file,
+    streaming: bool = False,
+    workers: int = 1,
+    dedup: bool = False,
+    sniff_rows: int | None = None,
+    output_format: str = "jsonl",
+):
+    """
+    Load all BMS point names from CSV files in raw_dir and save to JSONL (or Parquet).
+    With streaming=True, files are read in chunks and written as they go (see stream_all_bms_points).
+    With workers > 1, files are extracted in a process pool; output order is still by filename.
+    With dedup=True, byte-identical CSV files and repeated labels within a file are dropped.
+    With sniff_rows, header and point column are decided on the first sniff_rows rows of each
+    file and only the point column is parsed (streaming mode always works this way).
+    With output_format="parquet", the dataset is written as Parquet with dictionary-encoded
+    metadata columns (see dataset_io.write_points_parquet); not available in streaming mode.
+    """
+    if output_format not in POINTS_FORMATS:
+        raise ValueError(f"Unknown output_format {output_format!r}, expected one of {POINTS_FORMATS}")
+    if streaming and output_format != "jsonl":
+        raise ValueError("Streaming mode only writes JSONL.")
+
+    if streaming:
+        stream_all_bms_points(raw_dir, bms_output_file, head_rows=sniff_rows or HEAD_ROWS, workers=workers, dedup=dedup)
+        return
+
+    csv_paths = list_csv_files(raw_dir)
+    if dedup:
+        csv_paths = drop_duplicate_files(csv_paths)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            frames = list(pool.map(partial(extract_points_from_csv, dedup=dedup, sniff_rows=sniff_rows), csv_paths))
+    else:
+        frames = [extract_points_from_csv(csv_path, dedup=dedup, sniff_rows=sniff_rows) for csv_path in csv_paths]
 
+    records = [frame for frame in frames if frame is not None]
     if not records:
         raise RuntimeError("No valid CSV files with point labels found.")
 
     full_df = pd.concat(records, ignore_index=True)
-    full_df.to_json(bms_output_file, orient="records", lines=True)
+    if output_format == "parquet":
+        write_points_parquet(full_df, bms_output_file)
+    else:
+        full_df.to_json(bms_output_file, orient="records", lines=True)
+
+
+def stream_points_from_csv(
+    csv_path: Path, fout, head_rows: int = HEAD_ROWS, chunk_rows: int = CHUNK_ROWS, dedup: bool = False
+) -> bool:
+    """
+    Stream the point records of one CSV file into the open JSONL handle fout.
+
+    Header and point column are decided on the first `head_rows` rows (see sniff_csv);
+    only the point column is then read, `chunk_rows` rows at a time, and each chunk is
+    written straight away. With dedup=True, repeated point labels within the file are dropped.
+    Returns False (and writes nothing) if the file is skipped.
+    """
+    print(f"Processing {csv_path}")
+    sniffed = sniff_csv(csv_path, head_rows)
+    if sniffed is None or sniffed["point_col"] is None:
+        return False
+
+    point_col = sniffed["point_col"]
+    building_id = derive_building_id_from_filename(csv_path.name)
+
+    # Remember where this file starts so a parse error half-way does not leave partial rows
+    start_pos = fout.tell()
+    seen: set[int] = set()
+    try:
+        for chunk in read_point_column(csv_path, sniffed, chunk_rows):
+            records = to_point_records(chunk, point_col, building_id, csv_path.name)
+            if dedup:
+                records = drop_duplicate_labels(records, seen)
+            records.to_json(fout, orient="records", lines=True)
+    except Exception as e:
+        print(f"Skipping {csv_path}: {e}")
+        fout.seek(start_pos)
+        fout.truncate()
+        return False
+
+    return True
+
+
+def stream_points_to_part_file(csv_path: Path, part_path: Path, head_rows: int, chunk_rows: int, dedup: bool) -> bool:
+    """Pool worker: stream one CSV file into its own JSONL part file."""
+    with open(part_path, "w", encoding="utf-8") as fout:
+        return stream_points_from_csv(csv_path, fout, head_rows, chunk_rows, dedup)
+
+
+def stream_all_bms_points(
+    raw_dir: Path,
+    bms_output_file,
+    head_rows: int = HEAD_ROWS,
+    chunk_rows: int = CHUNK_ROWS,
+    workers: int = 1,
+    dedup: bool = False,
+):
+    """
+    Constant-memory variant of load_all_bms_points.
+
+    Each file is streamed chunk by chunk (see stream_points_from_csv), so memory
+    stays bounded by the chunk size. With workers > 1, every file is streamed into
+    its own part file in a process pool and the parts are concatenated in filename
+    order. Output lines have the same format as the non-streaming mode.
+    """
+    csv_paths = list_csv_files(raw_dir)
+    if dedup:
+        csv_paths = drop_duplicate_files(csv_paths)
+
+    if workers > 1:
+        with tempfile.TemporaryDirectory(dir=Path(bms_output_file).parent) as tmp_dir:
+            part_paths = [Path(tmp_dir) / f"{i:06d}.jsonl" for i in range(len(csv_paths))]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                worker = partial(stream_points_to_part_file, head_rows=head_rows, chunk_rows=chunk_rows, dedup=dedup)
+                written = list(pool.map(worker, csv_paths, part_paths))
+            with open(bms_output_file, "w", encoding="utf-8") as fout:
+                for part_path, ok in zip(part_paths, written):
+                    if ok:
+                        with open(part_path, "r", encoding="utf-8") as fpart:
+                            shutil.copyfileobj(fpart, fout)
+    else:
+        with open(bms_output_file, "w", encoding="utf-8") as fout:
+            written = [stream_points_from_csv(csv_path, fout, head_rows, chunk_rows, dedup) for csv_path in csv_paths]
+
+    if not any(written):
+        raise RuntimeError("No valid CSV files with point labels found.")
+
+
+def extract_csv_to_jsonl(csv_path: Path, dedup: bool = False, sniff_rows: int | None = None) -> tuple[bytes, dict]:
+    """Pool worker: extract one CSV file to JSONL bytes plus the detected has_header / point_col."""
+    info: dict = {"has_header": None, "point_col": None}
+    frame = extract_points_from_csv(csv_path, info, dedup, sniff_rows)
+    if frame is None:
+        return b"", info
+    return frame.to_json(orient="records", lines=True).encode("utf-8"), info
+
+
+def update_bms_points(
+    raw_dir: Path, bms_output_file, workers: int = 1, dedup: bool = False, sniff_rows: int | None = None
+):
+    """
+    Incrementally refresh the JSONL output of load_all_bms_points.
+
+    A manifest next to the output records, for every CSV file, its size, mtime,
+    content hash, detected header / point column and the byte range of its rows in
+    the output. Files whose size and mtime (or, failing that, content hash) are
+    unchanged keep their rows, copied straight from the previous output; only new or
+    changed files are parsed again. Files that disappeared are dropped. Output is
+    ordered by filename and identical to a full rebuild. With dedup=True, a file whose
+    hash matches an earlier file is recorded as duplicate_of that file and contributes no rows.
+    """
+    out_path = Path(bms_output_file)
+    options = {"dedup": dedup, "sniff_rows": sniff_rows}
+    old_entries: dict[str, dict[str, Any]] = load_manifest(out_path, options)
+    csv_paths = list_csv_files(raw_dir)
+
+    entries: dict[str, dict[str, Any]] = {}
+    todo: list[Path] = []
+    first_by_hash: dict[str, str] = {}
+    for csv_path in csv_paths:
+        stat = csv_path.stat()
+        entry: dict[str, Any] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        old = old_entries.get(csv_path.name)
+        if old and old["size"] == stat.st_size and old["mtime_ns"] == stat.st_mtime_ns:
+            entry["sha256"] = old["sha256"]
+        else:
+            entry["sha256"] = file_sha256(csv_path)
+        if dedup and entry["sha256"] in first_by_hash:
+            print(f"Skipping {csv_path}: duplicate of {first_by_hash[entry['sha256']]}")
+            entry.update({"duplicate_of": first_by_hash[entry["sha256"]], "length": 0})
+            entries[csv_path.name] = entry
+            continue
+        first_by_hash.setdefault(entry["sha256"], csv_path.name)
+        if old and old["sha256"] == entry["sha256"] and "duplicate_of" not in old:
+            entry.update({k: old[k] for k in ("has_header", "point_col", "offset", "length")})
+        else:
+            todo.append(csv_path)
+        entries[csv_path.name] = entry
+
+    if workers > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            worker = partial(extract_csv_to_jsonl, dedup=dedup, sniff_rows=sniff_rows)
+            extracted = dict(zip(todo, pool.map(worker, todo)))
+    else:
+        extracted = {csv_path: extract_csv_to_jsonl(csv_path, dedup, sniff_rows) for csv_path in todo}
+
+    tmp_path = out_path.with_name(out_path.name + ".tmp")
+    with open(tmp_path, "wb") as fout:
+        fold = open(out_path, "rb") if old_entries else None
+        try:
+            for csv_path in csv_paths:
+                entry = entries[csv_path.name]
+                if "duplicate_of" in entry:
+                    continue
+                if csv_path in extracted:
+                    data, info = extracted[csv_path]
+                    entry.update(info)
+                else:
+                    assert fold is not None
+                    fold.seek(entry["offset"])
+                    data = fold.read(entry["length"])
+                entry["offset"] = fout.tell()
+                entry["length"] = len(data)
+                fout.write(data)
+        finally:
+            if fold is not None:
+                fold.close()
+
+    if not any(entry["length"] for entry in entries.values()):
+        tmp_path.unlink()
+        raise RuntimeError("No valid CSV files with point labels found.")
+
+    os.replace(tmp_path, out_path)
+    stat = out_path.stat()
+    manifest = {"output_size": stat.st_size, "output_mtime_ns": stat.st_mtime_ns, "options": options, "files": entries}
+    with open(manifest_path_for(out_path), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    removed = len(set(old_entries) - set(entries))
+    duplicates = sum("duplicate_of" in entry for entry in entries.values())
+    reused = len(entries) - len(todo) - duplicates
+    print(f"Incremental update: {len(todo)} parsed, {reused} reused, {removed} removed, {duplicates} duplicates")
 
 
 def sample_one_point_per_building(jsonl_path, seed=42):
     """
-    Read the extracted BMS JSONL file, select one random point name for each
+    Read the extracted BMS JSONL (or Parquet) file, select one random point name for each
     building_id, and return the selected point names separated by newlines.
     """
     # Fix randomness for reproducibility
     random.seed(seed)
 
-    # Load JSONL into a DataFrame
-    df = pd.read_json(jsonl_path, lines=True)
+    # Load JSONL / Parquet into a DataFrame
+    df = read_points_frame(jsonl_path)
 
     if "building_id" not in df.columns or "point_label" not in df.columns:
         raise ValueError("JSONL must contain 'building_id' and 'point_label' columns.")
 
     # Group by building and sample one point per building
-    samples = df.groupby("building_id")["point_label"].apply(lambda s: s.sample(1, random_state=seed).iloc[0])
+    samples = df.groupby("building_id", observed=True)["point_label"].apply(
+        lambda s: s.sample(1, random_state=seed).iloc[0]
+    )
 
     # Join into newline-separated string
     return "\n".join(samples.tolist())
 
 
-def main():
+def parse_args(argv=None):
+    """Parse command-line options for the extraction run."""
+    parser = argparse.ArgumentParser(description="Extract BMS point names from CSV files into JSONL.")
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="read each CSV in chunks and write JSONL as it goes, keeping memory bounded",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of processes extracting CSV files in parallel (output order is by filename)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="re-parse only new or changed CSV files, using the manifest next to the output",
+    )
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="skip byte-identical CSV files and drop repeated point labels within a building file",
+    )
+    parser.add_argument(
+        "--sniff-rows",
+        type=int,
+        default=None,
+        help="decide header and point column on the first N rows, then parse only the point column",
+    )
+    parser.add_argument(
+        "--format",
+        choices=POINTS_FORMATS,
+        default="jsonl",
+        help="write all_points.jsonl, or all_points.parquet with dictionary-encoded metadata columns",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """Entry point for pattern parser."""
+    args = parse_args(argv)
+    if args.format != "jsonl" and (args.streaming or args.incremental):
+        raise SystemExit("--format parquet cannot be combined with --streaming or --incremental")
     bms_input_directory = Path(os.getenv("BMS_INPUT_DIR", "data/bms-fierro/buildings"))
-    bms_output_file = Path(os.getenv("PARSER_OUTPUT_DIR", "data/output/point-name-parser")) / "all_points.jsonl"
-
-    load_all_bms_points(raw_dir=bms_input_directory, bms_output_file=bms_output_file)
+    bms_output_file = points_path(os.getenv("PARSER_OUTPUT_DIR", "data/output/point-name-parser"), args.format)
+
+    if args.incremental:
+        update_bms_points(
+            raw_dir=bms_input_directory,
+            bms_output_file=bms_output_file,
+            workers=args.workers,
+            dedup=args.dedup,
+            sniff_rows=args.sniff_rows,
+        )
+    else:
+        load_all_bms_points(
+            raw_dir=bms_input_directory,
+            bms_output_file=bms_output_file,
+            streaming=args.streaming,
+            workers=args.workers,
+            dedup=args.dedup,
+            sniff_rows=args.sniff_rows,
+            output_format=args.format,
+        )
     print(sample_one_point_per_building(jsonl_path=bms_output_file))
 
 
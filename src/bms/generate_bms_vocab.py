@@ -31,8 +31,10 @@ The main steps are:
    - how often it appears in the whole dataset (global frequency);
    - in how many different buildings it appears (building support);
    - how often it is followed by a numeric token (e.g. "AHU 03", "VAV 12").
-   This information is stored in counters and is later used to filter out
-   rare or building-specific artefacts.
+   This information is accumulated in one pass by `src.bms.token_stats.TokenStats`,
+   which interns tokens and buildings as integer IDs and keeps building support
+   as per-token bitsets, and is later used to filter out rare or
+   building-specific artefacts.
 
 3. Seed vocabularies and thresholds
    The module starts from a small set of hand-picked "seed" terms that are
@@ -79,9 +81,25 @@ The main steps are:
    - vendor_vocab: sorted list of vendor tokens;
    - frequency: a full dictionary of all token frequencies (for inspection);
    - stats: basic statistics such as number of distinct tokens and buildings.
+   With --split-output, bms_vocabs.json only holds the five vocabularies (the
+   part the labelling modules load, written compactly) and frequency and stats
+   go to bms_vocabs.stats.json, or bms_vocabs.stats.json.gz with
+   --compress-stats; load_vocab_stats reads them back from either layout.
    It also prints a short summary to the console and shows the "weakest" equipment
    candidates, which can be reviewed and optionally added to a manual blacklist.
 
+Steps 1-2 form a map phase (count_vocab_shard) and steps 3-6 a reduce phase
+(classify_vocab). The map phase can run on shards of the points file in a
+process pool (--workers) or on separate machines (--shard I/N --save-partial),
+and the reduce phase merges the partial statistics (--from-partials) without
+re-reading the points.
+With --incremental, the token statistics of every source file are kept in
+bms_vocabs.state.json, so after `extract_point_names --incremental` only
+added or changed building files are counted again and only tokens whose
+statistics changed are reclassified.
+--json-backend picks the JSON decoder for the points file (see
+src.bms.json_codec); all backends give the same vocabularies.
+
 In summary, this module provides a data-driven way to bootstrap and maintain
 vocabularies for BMS point name analysis. It does not rely on any machine learning
 model, only on token counts and simple heuristics, so it remains transparent and
@@ -89,13 +107,21 @@ easy to adjust by domain experts. The resulting vocabularies are used by the
 labelling module to assign semantic categories to tokens in individual point names.
 """
 
+import argparse
+import gzip
 import json
 import os
-from collections import Counter, defaultdict
+from collections import Counter
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Dict, Set
+from typing import Any, Dict, Set
 
-from src.bms.tokenizer import tokenize
+from src.bms.dataset_io import POINTS_FORMATS, iter_column_batches, load_manifest, plan_shards, points_path
+from src.bms.json_codec import JSON_BACKENDS
+from src.bms.token_stats import TokenStats, merge_token_stats
+from src.bms.tokenizer import tokenize_many
 
 ###############################################
 # Global thresholds & seed vocabularies
@@ -161,6 +187,9 @@ EQUIP_STOPWORDS = {
 # Optional: explicit blacklist if you later find bad equipment tokens
 EQUIP_BLACKLIST: set[str] = set()
 
+# Number of point records tokenized together in one flat buffer
+BATCH_SIZE = 10_000
+
 
 ###############################################
 # Scoring helpers (for trimming)
@@ -211,14 +240,14 @@ def is_vendor(tok: str) -> bool:
     return False
 
 
-def passes_global_thresholds(tok: str, token_counter: Counter, token_buildings: dict) -> bool:
+def passes_global_thresholds(tok: str, token_counter: Counter, token_buildings: Mapping) -> bool:
     """Check if token passes global frequency and building-support thresholds."""
     freq = token_counter[tok]
     building_support = len(token_buildings.get(tok, set()))
     return (freq >= MIN_GLOBAL_FREQ) and (building_support >= MIN_BUILDINGS)
 
 
-def likely_equip(tok: str, token_counter: Counter, token_buildings: dict, token_numid_bigram: Counter) -> bool:
+def likely_equip(tok: str, token_counter: Counter, token_buildings: Mapping, token_numid_bigram: Counter) -> bool:
     """
     Decide if a token is likely an equipment type.
     Uses:
@@ -260,7 +289,7 @@ def likely_equip(tok: str, token_counter: Counter, token_buildings: dict, token_
     return True
 
 
-def likely_subcomponent(tok: str, token_counter: Counter, token_buildings: dict) -> bool:
+def likely_subcomponent(tok: str, token_counter: Counter, token_buildings: Mapping) -> bool:
     """
     Subcomponents are measurement-ish terms and abbreviations.
     """
@@ -285,7 +314,7 @@ def likely_subcomponent(tok: str, token_counter: Counter, token_buildings: dict)
     return False
 
 
-def likely_point_func(tok: str, token_counter: Counter, token_buildings: dict) -> bool:
+def likely_point_func(tok: str, token_counter: Counter, token_buildings: Mapping) -> bool:
     """
     Commands or states: CMD, STATUS, RUN, START, etc.
     """
@@ -328,42 +357,87 @@ def likely_point_func(tok: str, token_counter: Counter, token_buildings: dict) -
 ###############################################
 
 
-def extract_vocab(jsonl_path: Path):
-    """Extract BMS vocabularies from a JSONL file of point labels."""
-    # All stats are collected on UPPERCASE tokens
-    token_counter: Counter[str] = Counter()  # token -> freq
-    token_buildings: dict[str, set[str]] = defaultdict(set)  # token -> set(building_ids)
-    token_numid_bigram: Counter[str] = Counter()  # token -> count of (token, numeric) bigrams
-    per_building_counter: dict[str, Counter[str]] = defaultdict(Counter)  # building -> Counter(token)
+def count_vocab_shard(jsonl_path: Path, shard=None, json_backend: str | None = None) -> TokenStats:
+    """
+    Map phase: count token statistics over a JSONL (or Parquet) points file,
+    or only over one shard=(start, end) of it (see dataset_io.plan_shards).
+    json_backend picks the JSON decoder (see src.bms.json_codec).
+    """
+    # All stats are collected on UPPERCASE tokens, interned as integer IDs (see src.bms.token_stats)
+    token_stats = TokenStats()
+    for cols in iter_column_batches(
+        jsonl_path,
+        BATCH_SIZE,
+        ["point_label", "building_id"],
+        defaults={"building_id": "unknown"},
+        shard=shard,
+        json_backend=json_backend,
+    ):
+        token_stats.add_batch(tokenize_many(cols["point_label"]), cols["building_id"])
+    return token_stats
+
+
+def count_vocab_stats(jsonl_path: Path, workers: int = 1, json_backend: str | None = None) -> TokenStats:
+    """
+    Count token statistics over a points file. With workers > 1, the file is split into
+    byte (JSONL) or row (Parquet) shards counted in a process pool, and the partial
+    statistics are merged in file order, which gives the same result as one pass.
+    """
+    if workers <= 1:
+        return count_vocab_shard(jsonl_path, json_backend=json_backend)
+    shards = plan_shards(jsonl_path, workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        partials = list(pool.map(partial(count_vocab_shard, jsonl_path, json_backend=json_backend), shards))
+    return merge_token_stats(partials)
+
+
+def extract_vocab(jsonl_path: Path, workers: int = 1, json_backend: str | None = None):
+    """Extract BMS vocabularies from a JSONL (or Parquet) points file."""
+    return classify_vocab(count_vocab_stats(jsonl_path, workers=workers, json_backend=json_backend))
 
-    with open(jsonl_path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
 
-            obj = json.loads(line)
-            lbl = obj["point_label"]
-            bldg = obj.get("building_id", "unknown")
+def classify_token(tok: str, token_counter: Counter, token_buildings, token_numid_bigram: Counter) -> str | None:
+    """
+    Assign an UPPERCASE token to one group: "io_type", "vendor", "point_func", "subcomp" or "equip",
+    or None if it fits none. The result depends only on the token's own statistics.
+    """
+    t = tok
 
-            toks = tokenize(lbl)
-            if not toks:
-                continue
+    # IO first (very strict & small set)
+    if is_io_type(t):
+        return "io_type"
 
-            toks_upper = [t.upper() for t in toks]
+    # Vendor second
+    if is_vendor(t):
+        return "vendor"
 
-            token_counter.update(toks_upper)
-            per_building_counter[bldg].update(toks_upper)
+    # Point function
+    if likely_point_func(t, token_counter, token_buildings):
+        return "point_func"
 
-            for t in set(toks_upper):
-                token_buildings[t].add(bldg)
+    # Subcomponent
+    if likely_subcomponent(t, token_counter, token_buildings):
+        return "subcomp"
 
-            # record bigrams (TOKEN, NUMERIC_TOKEN) on original tokens
-            for i in range(len(toks) - 1):
-                t_curr = toks[i].upper()
-                t_next = toks[i + 1]
-                if t_next.isdigit():
-                    token_numid_bigram[t_curr] += 1
+    # Equipment
+    if likely_equip(t, token_counter, token_buildings, token_numid_bigram):
+        return "equip"
+
+    return None
+
+
+def classify_vocab(token_stats: TokenStats, token_groups: dict[str, str | None] | None = None):
+    """
+    Reduce phase: classify, score and trim tokens from (merged) token statistics,
+    and build the vocabularies JSON. token_groups (token -> classify_token result)
+    can be passed in when already known, e.g. cached by update_vocab.
+    """
+    token_counter: Counter[str] = Counter(token_stats.frequency())  # token -> freq
+    token_numid_bigram = token_stats.numid_bigram_counter()  # token -> count of (token, numeric) bigrams
+    building_support = token_stats.building_support()  # token -> number of buildings
+    if token_groups is None:
+        token_buildings = token_stats.token_buildings()  # token -> set(building_ids), decoded on access
+        token_groups = {t: classify_token(t, token_counter, token_buildings, token_numid_bigram) for t in token_counter}
 
     # Candidate collections (with stats)
     equip_candidates = {}
@@ -374,37 +448,22 @@ def extract_vocab(jsonl_path: Path):
     vendor_vocab = set()
 
     # Collect candidates
-    for tok, freq in token_counter.items():
-        t = tok  # already uppercase
-
-        # IO first (very strict & small set)
-        if is_io_type(t):
+    for t, freq in token_counter.items():
+        group = token_groups[t]
+        if group == "io_type":
             io_vocab.add(t)
-            continue
-
-        # Vendor second
-        if is_vendor(t):
+        elif group == "vendor":
             vendor_vocab.add(t)
-            continue
-
-        # Point function
-        if likely_point_func(t, token_counter, token_buildings):
-            pointfunc_candidates[t] = {"freq": freq, "buildings": len(token_buildings.get(t, []))}
-            continue
-
-        # Subcomponent
-        if likely_subcomponent(t, token_counter, token_buildings):
-            subcomp_candidates[t] = {"freq": freq, "buildings": len(token_buildings.get(t, []))}
-            continue
-
-        # Equipment
-        if likely_equip(t, token_counter, token_buildings, token_numid_bigram):
+        elif group == "point_func":
+            pointfunc_candidates[t] = {"freq": freq, "buildings": building_support[t]}
+        elif group == "subcomp":
+            subcomp_candidates[t] = {"freq": freq, "buildings": building_support[t]}
+        elif group == "equip":
             equip_candidates[t] = {
                 "freq": freq,
-                "buildings": len(token_buildings.get(t, [])),
+                "buildings": building_support[t],
                 "numid_bigrams": token_numid_bigram.get(t, 0),
             }
-            continue
 
     # === Scoring and trimming ===
 
@@ -445,29 +504,273 @@ def extract_vocab(jsonl_path: Path):
         "io_type_vocab": sorted(io_vocab),
         "vendor_vocab": sorted(vendor_vocab),
         "stats": {
-            "num_tokens": len(token_counter),
-            "num_buildings": len(per_building_counter),
+            "num_tokens": token_stats.num_tokens,
+            "num_buildings": token_stats.num_buildings,
         },
     }
 
     return vocabs
 
 
+###############################################
+# Incremental updates
+###############################################
+
+
+def state_path_for(vocab_file) -> Path:
+    """The incremental vocab state lives next to the vocab file, e.g. bms_vocabs.state.json."""
+    return Path(vocab_file).with_suffix(".state.json")
+
+
+def group_key(token_stats: TokenStats, tok_id: int) -> list[int]:
+    """The statistics a token's group depends on: [freq, buildings, numid_bigrams]."""
+    return [
+        int(token_stats.freq[tok_id]),
+        token_stats.support[tok_id].bit_count(),
+        int(token_stats.numid_bigrams[tok_id]),
+    ]
+
+
+def update_vocab(points_file, state_file, workers: int = 1, json_backend: str | None = None) -> dict:
+    """
+    Incrementally recompute the vocabularies after buildings were added, changed or removed.
+
+    Needs the manifest written by `extract_point_names --incremental`, which records the
+    content hash and byte range of every source CSV's points in points_file. state_file
+    (see state_path_for) keeps the token statistics of every source file and the group of
+    every token. Only source files whose hash changed are counted again (reading just
+    their byte range); the others reuse their saved statistics, and statistics of files
+    that disappeared are dropped. classify_token then reruns only for tokens whose
+    statistics changed. The result is identical to extract_vocab(points_file).
+    """
+    entries = load_manifest(points_file, None)
+    if not entries:
+        raise SystemExit(
+            f"No up-to-date extraction manifest for {points_file}; run extract_point_names --incremental first."
+        )
+    segments = sorted(
+        ((name, entry) for name, entry in entries.items() if entry.get("length")), key=lambda kv: kv[1]["offset"]
+    )
+
+    state_path = Path(state_file)
+    old_state: dict[str, dict[str, Any]] = {"files": {}, "groups": {}}
+    if state_path.exists():
+        with open(state_path, "r", encoding="utf-8") as f:
+            old_state = json.load(f)
+
+    file_stats: dict[str, TokenStats] = {}
+    todo = []
+    for name, entry in segments:
+        old = old_state["files"].get(name)
+        if old and old["sha256"] == entry["sha256"]:
+            file_stats[name] = TokenStats.from_dict(old["stats"])
+        else:
+            todo.append((name, (entry["offset"], entry["offset"] + entry["length"])))
+
+    if workers > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            counted = pool.map(
+                partial(count_vocab_shard, points_file, json_backend=json_backend), [shard for _, shard in todo]
+            )
+            file_stats.update(zip([name for name, _ in todo], counted))
+    else:
+        file_stats.update(
+            (name, count_vocab_shard(points_file, shard=shard, json_backend=json_backend)) for name, shard in todo
+        )
+
+    # Merging in file order gives the same statistics (and token order) as one pass over points_file
+    token_stats = merge_token_stats(file_stats[name] for name, _ in segments)
+
+    token_counter: Counter[str] = Counter(token_stats.frequency())
+    token_buildings = token_stats.token_buildings()
+    token_numid_bigram = token_stats.numid_bigram_counter()
+    old_groups = old_state["groups"]
+    groups = {}
+    token_groups = {}
+    reclassified = 0
+    for tok_id, tok in enumerate(token_stats.tokens):
+        key = group_key(token_stats, tok_id)
+        old = old_groups.get(tok)
+        if old is not None and old[1:] == key:
+            group = old[0]
+        else:
+            group = classify_token(tok, token_counter, token_buildings, token_numid_bigram)
+            reclassified += 1
+        token_groups[tok] = group
+        groups[tok] = [group, *key]
+
+    vocabs = classify_vocab(token_stats, token_groups)
+
+    state = {
+        "files": {name: {"sha256": entry["sha256"], "stats": file_stats[name].to_dict()} for name, entry in segments},
+        "groups": groups,
+    }
+    tmp_path = state_path.with_name(state_path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+
+    removed = len(set(old_state["files"]) - set(file_stats))
+    print(
+        f"Incremental vocab update: {len(todo)} files counted, {len(segments) - len(todo)} reused, "
+        f"{removed} removed, {reclassified} tokens reclassified"
+    )
+    return vocabs
+
+
 ###############################################
 # Run and write output file
 ###############################################
 
+# Keys of the vocab output that only serve inspection; --split-output moves them to the statistics file
+STATS_KEYS = ("frequency", "stats")
+
 
-def main():
+def stats_path_for(vocab_file, compress: bool = False) -> Path:
+    """The statistics file of a split vocab output, e.g. bms_vocabs.stats.json(.gz)."""
+    vocab_file = Path(vocab_file)
+    return vocab_file.with_name(f"{vocab_file.stem}.stats.json{'.gz' if compress else ''}")
+
+
+def write_vocabs(vocabs: dict, vocab_file, split: bool = False, compress_stats: bool = False):
+    """
+    Write the classify_vocab output to vocab_file, as one file, or split into the runtime
+    vocabularies (vocab_file) and the statistics file (stats_path_for). Statistics files of
+    the other layouts are removed so they cannot go stale.
+    """
+    vocab_file = Path(vocab_file)
+    for compress in (False, True):
+        if not split or compress != compress_stats:
+            stats_path_for(vocab_file, compress).unlink(missing_ok=True)
+    if not split:
+        with open(vocab_file, "w") as f:
+            json.dump(vocabs, f, indent=2)
+        return
+
+    with (gzip.open if compress_stats else open)(stats_path_for(vocab_file, compress_stats), "wt") as f:
+        json.dump({key: vocabs[key] for key in STATS_KEYS}, f, indent=None if compress_stats else 2)
+    with open(vocab_file, "w") as f:
+        json.dump({key: value for key, value in vocabs.items() if key not in STATS_KEYS}, f, separators=(",", ":"))
+
+
+def load_vocab_stats(vocab_file) -> dict:
+    """The frequency and stats of a vocab output, from its statistics file if it was split."""
+    for compress in (True, False):
+        path = stats_path_for(vocab_file, compress)
+        if path.is_file():
+            with (gzip.open if compress else open)(path, "rt") as f:
+                return json.load(f)
+    with open(vocab_file) as f:
+        vocabs = json.load(f)
+    return {key: vocabs[key] for key in STATS_KEYS}
+
+
+def parse_args(argv=None):
+    """Parse command-line options for the vocabulary extraction run."""
+    parser = argparse.ArgumentParser(description="Extract BMS vocabularies from the extracted points dataset.")
+    parser.add_argument(
+        "--input-format",
+        choices=POINTS_FORMATS,
+        default="jsonl",
+        help="read all_points.jsonl or all_points.parquet from PARSER_OUTPUT_DIR",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of processes counting shards of the points file in parallel",
+    )
+    parser.add_argument(
+        "--json-backend",
+        choices=("auto", *JSON_BACKENDS),
+        default=None,
+        help="JSON decoder for all_points.jsonl (default: BMS_JSON_BACKEND, else the fastest installed)",
+    )
+    parser.add_argument(
+        "--shard",
+        default=None,
+        metavar="I/N",
+        help="with --save-partial, count only shard I (0-based) of N equal shards of the points file",
+    )
+    parser.add_argument(
+        "--save-partial",
+        type=Path,
+        default=None,
+        metavar="PATH",
+        help="map phase only: write the token statistics to PATH instead of building vocabularies",
+    )
+    parser.add_argument(
+        "--from-partials",
+        type=Path,
+        nargs="+",
+        default=None,
+        metavar="PATH",
+        help="reduce phase only: merge these saved token statistics (in the given order) and build vocabularies",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="recount only source files changed since the last --incremental run "
+        "(needs the manifest of extract_point_names --incremental)",
+    )
+    parser.add_argument(
+        "--split-output",
+        action="store_true",
+        help="write only the vocabularies to bms_vocabs.json and frequency / stats to bms_vocabs.stats.json",
+    )
+    parser.add_argument(
+        "--compress-stats",
+        action="store_true",
+        help="with --split-output, gzip the statistics file (bms_vocabs.stats.json.gz)",
+    )
+    args = parser.parse_args(argv)
+    if args.compress_stats and not args.split_output:
+        parser.error("--compress-stats requires --split-output")
+    if args.incremental and (args.input_format != "jsonl" or args.save_partial or args.from_partials):
+        parser.error("--incremental works on all_points.jsonl and cannot be combined with partials")
+    if args.shard is not None and args.save_partial is None:
+        parser.error("--shard requires --save-partial")
+    if args.save_partial is not None and args.from_partials is not None:
+        parser.error("--save-partial and --from-partials are exclusive")
+    return args
+
+
+def parse_shard(spec: str, path) -> tuple[int, int]:
+    """Turn an 'I/N' shard spec into the (start, end) range of shard I of N of the points file."""
+    index, n_shards = (int(part) for part in spec.split("/"))
+    if not 0 <= index < n_shards:
+        raise SystemExit(f"Invalid --shard {spec!r}: expected I/N with 0 <= I < N")
+    bounds = plan_shards(path, n_shards)
+    # plan_shards drops empty ranges, so a tiny file can have fewer than N shards
+    return bounds[index] if index < len(bounds) else (0, 0)
+
+
+def main(argv=None):
     """Main entry point to extract vocabularies and write to JSON file."""
-    INPUT = Path(os.getenv("PARSER_OUTPUT_DIR", "data/output/point-name-parser")) / "all_points.jsonl"
+    args = parse_args(argv)
+    INPUT = points_path(os.getenv("PARSER_OUTPUT_DIR", "data/output/point-name-parser"), args.input_format)
     OUTPUT = Path(os.getenv("PARSER_OUTPUT_DIR", "data/output/point-name-parser")) / "bms_vocabs.json"
 
-    vocabs = extract_vocab(INPUT)
-    with open(OUTPUT, "w") as f:
-        json.dump(vocabs, f, indent=2)
+    if args.save_partial is not None:
+        if args.shard is not None:
+            token_stats = count_vocab_shard(INPUT, shard=parse_shard(args.shard, INPUT), json_backend=args.json_backend)
+        else:
+            token_stats = count_vocab_stats(INPUT, workers=args.workers, json_backend=args.json_backend)
+        token_stats.save(args.save_partial)
+        print(f"Saved token statistics ({token_stats.num_tokens} tokens) to {args.save_partial}")
+        return
+
+    if args.from_partials is not None:
+        vocabs = classify_vocab(merge_token_stats(TokenStats.load(path) for path in args.from_partials))
+    elif args.incremental:
+        vocabs = update_vocab(INPUT, state_path_for(OUTPUT), workers=args.workers, json_backend=args.json_backend)
+    else:
+        vocabs = extract_vocab(INPUT, workers=args.workers, json_backend=args.json_backend)
+    write_vocabs(vocabs, OUTPUT, split=args.split_output, compress_stats=args.compress_stats)
 
     print("\nDone! Created:", OUTPUT)
+    if args.split_output:
+        print("Statistics:", stats_path_for(OUTPUT, args.compress_stats))
     print("Summary:")
     print("  tokens:", vocabs["stats"]["num_tokens"])
     print("  buildings:", vocabs["stats"]["num_buildings"])
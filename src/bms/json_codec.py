@@ -0,0 +1,192 @@
+"""
+Pluggable JSON backends for the JSONL files of the BMS points pipeline.
+
+Reading all_points.jsonl and writing point_names_labeled.jsonl spend most of
+their time in JSON decoding and encoding, one line at a time. A `JsonCodec`
+wraps one backend:
+
+- msgspec: the fastest decoder; column reads decode each line straight into a
+  typed struct holding only the requested fields;
+- orjson;
+- stdlib: the json module, always available and the fallback of the others.
+
+`get_codec(name)` returns the codec of a backend; "auto" (the default, or the
+BMS_JSON_BACKEND environment variable) picks the first installed backend in the
+order above. orjson and msgspec are optional dependencies.
+
+All backends write exactly the bytes json.dumps writes, so existing consumers
+of the JSONL files see no difference. orjson and msgspec only write compact
+JSON and keep non-ASCII characters as UTF-8, so they are used for compact
+separators when their output is plain printable ASCII; anything else (the
+default ", " / ": " separators, non-ASCII text) is written by json.dumps.
+The fast backends therefore speed up decoding and compact output only: the
+default (tokens) output of label_point_tokens is encoded by json either way.
+Floats are formatted differently by each backend; the pipeline writes none.
+Input a fast decoder rejects but json.loads accepts (lone surrogates, NaN) is
+decoded by json.loads.
+"""
+
+import importlib.util
+import json
+import os
+from collections.abc import Callable, Sequence
+from functools import lru_cache
+from typing import Any
+
+# Fastest first: the order "auto" tries installed backends in
+JSON_BACKENDS = ("msgspec", "orjson", "stdlib")
+
+COMPACT_SEPARATORS = (",", ":")
+
+
+def available_backends() -> list[str]:
+    """Return the installed JSON backends, fastest first."""
+    return [name for name in JSON_BACKENDS if name == "stdlib" or importlib.util.find_spec(name) is not None]
+
+
+def get_codec(name: str | None = None) -> "JsonCodec":
+    """
+    Return the codec of a JSON backend: one of JSON_BACKENDS or "auto".
+    Without a name, BMS_JSON_BACKEND is used (default "auto").
+    """
+    return _codec(name or os.getenv("BMS_JSON_BACKEND", "auto"))
+
+
+@lru_cache(maxsize=None)
+def _codec(name: str) -> "JsonCodec":
+    """One shared codec per backend name."""
+    if name == "auto":
+        name = available_backends()[0]
+    if name not in JSON_BACKENDS:
+        raise ValueError(f"Unknown JSON backend {name!r}, expected 'auto' or one of {JSON_BACKENDS}")
+    if name not in available_backends():
+        raise ValueError(f"JSON backend {name!r} is not installed")
+    return {"msgspec": MsgspecCodec, "orjson": OrjsonCodec, "stdlib": JsonCodec}[name]()
+
+
+class JsonCodec:
+    """JSON loads/dumps and JSONL batch decoding with the stdlib json module; base of the faster backends."""
+
+    name = "stdlib"
+
+    def loads(self, data: str | bytes) -> Any:
+        """Decode one JSON document."""
+        return json.loads(data)
+
+    def dumps(self, obj: Any, separators: tuple[str, str] | None = None) -> str:
+        """Encode obj exactly as json.dumps(obj, separators=separators) does."""
+        return self.encoder(separators)(obj)
+
+    def encoder(self, separators: tuple[str, str] | None = None) -> Callable[[Any], str]:
+        """
+        Return a function encoding objects like json.dumps(obj, separators=separators).
+        Encoding many objects through one encoder saves the per-call setup of dumps.
+        """
+        # json.dumps builds a new JSONEncoder on every call with non-default separators
+        return json.JSONEncoder(separators=separators).encode
+
+    def decode_records(self, lines: Sequence[str | bytes]) -> list[dict[str, Any]]:
+        """Decode JSONL lines into dicts, skipping blank lines."""
+        loads = self.loads
+        return [loads(line) for line in lines if line.strip()]
+
+    def decode_columns(
+        self, lines: Sequence[str | bytes], columns: Sequence[str], defaults: dict[str, Any] | None = None
+    ) -> dict[str, list]:
+        """Decode JSONL lines column-wise into {column: [values]}; missing keys get defaults[key] (or None)."""
+        defaults = defaults or {}
+        records = self.decode_records(lines)
+        return {name: [r.get(name, defaults.get(name)) for r in records] for name in columns}
+
+
+class _FastCodec(JsonCodec):
+    """Fallbacks shared by the orjson and msgspec codecs; subclasses set _loads and _dumps."""
+
+    _loads: Callable[[bytes | str], Any]
+    _dumps: Callable[[Any], bytes]
+
+    def loads(self, data: str | bytes) -> Any:
+        try:
+            return self._loads(data)
+        except ValueError:
+            return json.loads(data)
+
+    def decode_records(self, lines: Sequence[str | bytes]) -> list[dict[str, Any]]:
+        loads = self._loads
+        try:
+            return [loads(line) for line in lines if line.strip()]
+        except ValueError:
+            # Decode line by line, falling back to json.loads where the fast decoder fails
+            return super().decode_records(lines)
+
+    def encoder(self, separators: tuple[str, str] | None = None) -> Callable[[Any], str]:
+        fallback = super().encoder(separators)
+        if separators is None or tuple(separators) != COMPACT_SEPARATORS:
+            return fallback
+        fast_dumps = self._dumps
+
+        def encode(obj: Any) -> str:
+            try:
+                out = fast_dumps(obj)
+            except (TypeError, ValueError, OverflowError):
+                return fallback(obj)
+            # json.dumps escapes every non-ASCII character and DEL; the fast encoders write them as is
+            if out.isascii() and b"\x7f" not in out:
+                return out.decode("ascii")
+            return fallback(obj)
+
+        return encode
+
+
+class OrjsonCodec(_FastCodec):
+    """orjson backend."""
+
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self._loads = orjson.loads
+        self._dumps = orjson.dumps
+
+
+class MsgspecCodec(_FastCodec):
+    """msgspec backend; column reads decode into typed structs of the requested columns."""
+
+    name = "msgspec"
+
+    def __init__(self):
+        import msgspec
+
+        self._msgspec = msgspec
+        self._loads = msgspec.json.Decoder().decode
+        self._dumps = msgspec.json.Encoder().encode
+        self._column_decoders: dict[tuple, Any] = {}
+
+    def _column_decoder(self, columns: tuple[str, ...], defaults: tuple):
+        """Decoder of one line into a struct with only the given columns (other keys are skipped)."""
+        key = (columns, defaults)
+        decoder = self._column_decoders.get(key)
+        if decoder is None:
+            struct = self._msgspec.defstruct(
+                "PointColumns", [(name, Any, default) for name, default in zip(columns, defaults)]
+            )
+            decoder = self._column_decoders[key] = self._msgspec.json.Decoder(struct).decode
+        return decoder
+
+    def decode_columns(
+        self, lines: Sequence[str | bytes], columns: Sequence[str], defaults: dict[str, Any] | None = None
+    ) -> dict[str, list]:
+        defaults = defaults or {}
+        columns = tuple(columns)
+        decode = self._column_decoder(columns, tuple(defaults.get(name) for name in columns))
+        rows = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                rows.append(decode(line))
+            except ValueError:
+                # Let the dict path decode (or reject) what the struct decoder does not take
+                return super().decode_columns(lines, columns, defaults)
+        return {name: [getattr(row, name) for row in rows] for name in columns}
@@ -0,0 +1,134 @@
+"""
+On-disk SQLite cache of point-label annotations.
+
+`src.bms.label_point_tokens` annotates a point from its point_label and the
+vocabularies alone; building and provenance fields are copied from the input
+record. The cache keeps, per point_label (keyed by a 16-byte BLAKE2b hash of
+its text) and output mode, the serialized label-dependent parts of the
+annotation, together with the distinct uppercase tokens of the label.
+
+The vocabularies the entries were computed with are stored alongside, as an
+uppercase token -> category table and its fingerprint. When a run opens the
+cache with different vocabularies, only the entries holding a token whose
+category changed are deleted; every other entry is still exact, since none of
+its token labels can have changed. The labelling rules are recorded too, as a
+rules version string: when it differs, every entry is deleted.
+
+hits and misses count distinct labels: a label looked up again in the same run
+is not counted twice.
+"""
+
+import hashlib
+import json
+import sqlite3
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+
+# Max number of keys per SELECT ... IN (...) query
+QUERY_CHUNK = 500
+
+
+def label_key(point_label: str) -> bytes:
+    """Cache key of a point label: 16-byte BLAKE2b hash of its UTF-8 text."""
+    return hashlib.blake2b(point_label.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+def vocab_fingerprint(vocab_table: dict[str, str]) -> str:
+    """Fingerprint of an uppercase token -> category table, independent of its order."""
+    canonical = json.dumps(sorted(vocab_table.items()), separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LabelCache:
+    """SQLite-backed point_label -> (head, tail) annotation fragments, valid for one vocab table."""
+
+    def __init__(self, path, vocab_table: dict[str, str], mode: str = "tokens", rules_version: str = ""):
+        self.path = Path(path)
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self._looked_up: set[bytes] = set()
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        # A rowid table with a unique index: keys are hashes, so inserts land at random index positions,
+        # which is much cheaper in the small index than in a table clustered on the key
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS labels ("
+            "label_key BLOB NOT NULL, mode TEXT NOT NULL, tokens TEXT, head TEXT, tail TEXT, UNIQUE (label_key, mode))"
+        )
+        self.invalidated = self._sync_rules(rules_version) + self._sync_vocab(vocab_table)
+
+    def _meta(self, key: str) -> str | None:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _sync_rules(self, rules_version: str) -> int:
+        """Drop every entry if the labelling rules changed since they were stored; return how many were dropped."""
+        if self._meta("rules_version") == rules_version:
+            return 0
+        dropped = self.conn.execute("DELETE FROM labels").rowcount
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rules_version', ?)", (rules_version,))
+        self.conn.commit()
+        return dropped
+
+    def _sync_vocab(self, vocab_table: dict[str, str]) -> int:
+        """Drop entries whose tokens changed category since the stored vocab; return how many were dropped."""
+        fingerprint = vocab_fingerprint(vocab_table)
+        old_fingerprint = self._meta("vocab_fingerprint")
+        if old_fingerprint == fingerprint:
+            return 0
+
+        dropped = 0
+        if old_fingerprint is not None:
+            old_table = json.loads(self._meta("vocab_table") or "{}")
+            changed = {
+                tok for tok in old_table.keys() | vocab_table.keys() if old_table.get(tok) != vocab_table.get(tok)
+            }
+            stale = [
+                (key, mode)
+                for key, mode, tokens in self.conn.execute("SELECT label_key, mode, tokens FROM labels")
+                if not changed.isdisjoint(tokens.split(" "))
+            ]
+            self.conn.executemany("DELETE FROM labels WHERE label_key = ? AND mode = ?", stale)
+            dropped = len(stale)
+        else:
+            # Entries without a recorded vocab cannot be trusted
+            dropped = self.conn.execute("DELETE FROM labels").rowcount
+
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [("vocab_fingerprint", fingerprint), ("vocab_table", json.dumps(vocab_table, sort_keys=True))],
+        )
+        self.conn.commit()
+        return dropped
+
+    def get_many(self, keys: Sequence[bytes]) -> dict[bytes, tuple[str, str]]:
+        """Look up many label keys; returns the cached (head, tail) of the keys that are present."""
+        found: dict[bytes, tuple[str, str]] = {}
+        unique = list(dict.fromkeys(keys))
+        new = [key for key in unique if key not in self._looked_up]
+        self._looked_up.update(new)
+        for i in range(0, len(unique), QUERY_CHUNK):
+            chunk = unique[i : i + QUERY_CHUNK]
+            query = (
+                "SELECT label_key, head, tail FROM labels "
+                f"WHERE mode = ? AND label_key IN ({', '.join('?' * len(chunk))})"
+            )
+            for key, head, tail in self.conn.execute(query, (self.mode, *chunk)):
+                found[key] = (head, tail)
+        hits = sum(1 for key in new if key in found)
+        self.hits += hits
+        self.misses += len(new) - hits
+        return found
+
+    def put_many(self, entries: Iterable[tuple[bytes, Iterable[str], str, str]]):
+        """Store (key, uppercase tokens, head, tail) entries."""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO labels (label_key, mode, tokens, head, tail) VALUES (?, ?, ?, ?, ?)",
+            [(key, self.mode, " ".join(sorted(set(tokens))), head, tail) for key, tokens, head, tail in entries],
+        )
+
+    def close(self):
+        """Commit pending entries and close the database."""
+        self.conn.commit()
+        self.conn.close()
@@ -49,6 +49,9 @@ The labelling process works in several steps:
    - then, regular expressions identify floors, rooms and IDs
      (for example, patterns like "FL03" or "RM1202E");
    - any token not matched by these rules is marked as MISC.
+   The batch run uses TokenLabeler, which folds the vocabularies into one
+   token -> category table and caches the pattern results of other tokens,
+   so repeated tokens cost a dict lookup.
 
 4. BIO sequence tagging
    In addition to plain categories, the module produces BIO tags. These
@@ -80,7 +83,10 @@ The labelling process works in several steps:
 6. Input and output files
    The module reads:
    - a JSONL file with all extracted points (all_points.jsonl)
-   - a JSON file containing the vocabularies (bms_vocabs.json)
+   - a JSON file containing the vocabularies (bms_vocabs.json); with
+     --workers, it is first compiled into bms_vocabs.bin (see
+     src.bms.vocab_store), which all workers memory-map and look tokens
+     up in, instead of each building its own vocabulary table
    Both locations can be controlled via an environment variable that
    points to the parser output directory.
 
@@ -93,6 +99,31 @@ The labelling process works in several steps:
    - the list of BIO tags
    - building and provenance metadata
    - the simple structured interpretation
+   With --output-mode spans, each line also carries token_spans, the
+   (start, end) character offsets of every token in point_label. With
+   --output-mode compact, token_spans replace the token strings and the
+   JSON is written without padding whitespace; tokens are recovered as
+   point_label[start:end].
+   With --cache, the label-dependent part of every annotation is kept in an
+   SQLite cache (see src.bms.label_cache), so a rerun only annotates point
+   labels that are new or contain a token whose vocabulary category changed;
+   a change of the labelling rules (LABEL_RULES_VERSION) empties the cache.
+   With --format parquet, the annotations go to point_names_labeled.parquet
+   instead (see src.bms.labeled_io): token offsets, integer-coded categories
+   and BIO tags, and dictionary-encoded metadata, several times smaller than
+   the JSONL and read back as the same dicts.
+   --json-backend picks the JSON library used for reading and writing (see
+   src.bms.json_codec); the output bytes do not depend on it.
+   With --dedup-labels, each distinct point_label is tokenized and labelled
+   once per run (per shard with --workers) and its annotation is expanded to
+   every row carrying it, which pays off when exports repeat the same labels.
+   With --split-glued, tokens labelled MISC that are made of vocabulary
+   words written together ("OCCSENSOR", "CLGMAXFLO") are split into those
+   words, each labelled with its vocabulary category (see
+   src.bms.vocab_matcher); the tokens, spans and tags then follow the split.
+   Only vocabulary words are used as pieces: with the shipped vocabularies,
+   "OPENOFF", "PIPEVLV" and "SUPPLYAIRTEMP" stay MISC, since OFF, PIPE,
+   SUPPLY and AIR are not vocabulary words.
 
 Overall, this module provides a weak, rule-based labelling pipeline for
 BMS point names. It does not require any machine learning model and is
@@ -101,14 +132,52 @@ resulting labelled dataset can be used directly for analysis, or as
 training data for more advanced AI models in later stages.
 """
 
+import argparse
+import hashlib
 import json
 import os
 import re
-from collections.abc import Sequence
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-from src.bms.tokenizer import tokenize
+from src.bms.dataset_io import POINTS_FORMATS, iter_record_batches, plan_shards, points_path
+from src.bms.json_codec import JSON_BACKENDS, JsonCodec, get_codec
+from src.bms.label_cache import LabelCache, label_key
+from src.bms.labeled_io import LabeledPointsWriter, annotations_to_table
+from src.bms.tokenizer import tokenize, tokenize_many, tokenize_with_spans
+from src.bms.vocab_matcher import VocabTrie
+from src.bms.vocab_store import (
+    CompiledVocab,
+    VocabView,
+    is_compiled_vocab,
+    source_digest,
+    write_compiled_vocab,
+)
+
+# Number of point records tokenized together in one flat buffer
+BATCH_SIZE = 10_000
+
+# How tokens are written: strings, strings + (start, end) offsets, or offsets only
+OUTPUT_MODES = ("tokens", "spans", "compact")
+
+# With --workers, the input is split into this many shards per worker, for load balancing
+SHARDS_PER_WORKER = 4
+
+# Vocabulary categories in the order label_token checks them
+VOCAB_PRECEDENCE = ("VENDOR_TAG", "IO_TYPE", "EQUIP", "SUBCOMP", "POINT_FUNC")
+
+# Keys of bms_vocabs.json load_vocabs reads (generate_bms_vocab --split-output writes only these)
+VOCAB_KEYS = ("equip_vocab", "subcomp_vocab", "point_func_vocab", "io_type_vocab", "vendor_vocab")
+
+# Version of the labelling rules (label_token, BIO tags, build_structured, output fields);
+# bump it when they change, so that --cache drops annotations made with the old rules
+LABEL_RULES_VERSION = 1
+
+# Max number of non-vocab tokens whose label TokenLabeler keeps cached
+LABEL_CACHE_SIZE = 65_536
 
 # ---------------------------------------------------------
 # Load vocabularies
@@ -116,15 +185,26 @@ from src.bms.tokenizer import tokenize
 
 
 def load_vocabs(vocab_path: str):
-    """Load vocabularies from JSON file."""
-    with open(vocab_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    """Load vocabularies from JSON file, or from a compiled vocab file (see compile_vocabs)."""
+    if is_compiled_vocab(vocab_path):
+        return CompiledVocab(vocab_path).as_vocabs()
+    with open(vocab_path, "rb") as f:
+        return parse_vocabs(f.read())
 
-    equip_vocab = set(data.get("equip_vocab", []))
-    subcomp_vocab = set(data.get("subcomp_vocab", []))
-    point_func_vocab = set(data.get("point_func_vocab", []))
-    io_type_vocab = set(data.get("io_type_vocab", []))
-    vendor_vocab = set(data.get("vendor_vocab", []))
+
+def parse_vocabs(raw: bytes):
+    """
+    Vocabulary sets of the content of bms_vocabs.json (only the VOCAB_KEYS lists are used).
+    Raises ValueError if the content is not a JSON object, e.g. a file still being rewritten.
+    """
+    data = get_codec().loads(raw) if raw.strip() else None
+    if not isinstance(data, dict):
+        raise ValueError("vocab file does not contain a JSON object")
+    equip_vocab = set(data.get("equip_vocab") or [])
+    subcomp_vocab = set(data.get("subcomp_vocab") or [])
+    point_func_vocab = set(data.get("point_func_vocab") or [])
+    io_type_vocab = set(data.get("io_type_vocab") or [])
+    vendor_vocab = set(data.get("vendor_vocab") or [])
 
     return {
         "EQUIP": equip_vocab,
@@ -135,6 +215,23 @@ def load_vocabs(vocab_path: str):
     }
 
 
+def compile_vocabs(vocab_path, compiled_path=None) -> Path:
+    """
+    Compile bms_vocabs.json into a memory-mapped vocab file (see src.bms.vocab_store), by default
+    bms_vocabs.bin next to it, unless that file was already compiled from the same JSON.
+    Returns the compiled path, which load_vocabs reads without parsing JSON or building sets.
+    """
+    vocab_path = Path(vocab_path)
+    if is_compiled_vocab(vocab_path):
+        return vocab_path
+    compiled_path = Path(compiled_path) if compiled_path else vocab_path.with_suffix(".bin")
+    raw = vocab_path.read_bytes()
+    digest = hashlib.sha256(raw).digest()
+    if source_digest(compiled_path) != digest:
+        write_compiled_vocab(parse_vocabs(raw), compiled_path, digest)
+    return compiled_path
+
+
 # ---------------------------------------------------------
 # Regex patterns for floors / rooms / equip IDs / building
 # ---------------------------------------------------------
@@ -159,6 +256,37 @@ BUILDING_HINT_PATTERNS = [
     re.compile(r"^BLDG\d+$", re.I),
 ]
 
+# Pattern categories in the order label_token tries them
+PATTERN_PRECEDENCE = [
+    ("FLOOR", FLOOR_PATTERNS),
+    ("ZONE", ROOM_PATTERNS),
+    ("EQUIP_ID", EQUIP_ID_PATTERNS),
+    ("BLDG", BUILDING_HINT_PATTERNS),
+]
+
+
+def combine_patterns(categories) -> re.Pattern:
+    """
+    Fold anchored ^...$ patterns into one regex with a named group per category.
+    Alternatives are tried left to right, so the first pattern (in list order) that
+    matches the whole token decides the group, as the one-by-one cascade would;
+    each pattern keeps its own IGNORECASE flag.
+    """
+    groups = []
+    for category, patterns in categories:
+        alternatives = []
+        for p in patterns:
+            if not (p.pattern.startswith("^") and p.pattern.endswith("$")):
+                raise ValueError(f"Pattern {p.pattern!r} of {category} is not anchored with ^...$")
+            flags = "i" if p.flags & re.I else ""
+            alternatives.append(f"(?{flags}:{p.pattern[1:-1]})")
+        groups.append(f"(?P<{category}>{'|'.join(alternatives)})")
+    return re.compile(f"^(?:{'|'.join(groups)})$")
+
+
+# One regex call classifies a non-vocab token: match.lastgroup is its category
+TOKEN_PATTERN_RE = combine_patterns(PATTERN_PRECEDENCE)
+
 
 # ---------------------------------------------------------
 # Weak rule-based labelling for a single token
@@ -193,23 +321,16 @@ def label_token(token: str, vocabs: Dict[str, set]) -> str:
     if t in vocabs["POINT_FUNC"]:
         return "POINT_FUNC"
 
-    # Floor
-    if any(p.match(token) for p in FLOOR_PATTERNS):
-        return "FLOOR"
-
-    # Room / Zone
-    if any(p.match(token) for p in ROOM_PATTERNS):
-        return "ZONE"
-
-    # Equipment ID
-    if any(p.match(token) for p in EQUIP_ID_PATTERNS):
-        return "EQUIP_ID"
+    # Floor, room / zone, equipment ID, building hints (in this order), else MISC
+    return pattern_category(token)
 
-    # Building hints
-    if any(p.match(token) for p in BUILDING_HINT_PATTERNS):
-        return "BLDG"
 
-    # Fallback
+def pattern_category(token: str) -> str:
+    """Category of a token that is in no vocabulary: FLOOR, ZONE, EQUIP_ID, BLDG or MISC."""
+    m = TOKEN_PATTERN_RE.match(token)
+    if m:
+        assert m.lastgroup is not None  # every alternative of TOKEN_PATTERN_RE is a named group
+        return m.lastgroup
     return "MISC"
 
 
@@ -218,6 +339,118 @@ def weak_label_tokens(tokens: List[str], vocabs: Dict[str, set]) -> List[str]:
     return [label_token(tok, vocabs) for tok in tokens]
 
 
+# ---------------------------------------------------------
+# Compiled labeller: token -> category table + LRU fallback
+# ---------------------------------------------------------
+
+
+def label_rules_version() -> str:
+    """LABEL_RULES_VERSION with a hash of the token patterns and vocab precedence, as stored by LabelCache."""
+    rules = json.dumps([TOKEN_PATTERN_RE.pattern, VOCAB_PRECEDENCE])
+    return f"{LABEL_RULES_VERSION}:{hashlib.sha256(rules.encode('utf-8')).hexdigest()[:16]}"
+
+
+def vocab_table(vocabs: Dict[str, set]) -> Dict[str, str]:
+    """Vocabulary token -> the category label_token gives it (the first vocabulary containing it)."""
+    table: Dict[str, str] = {}
+    for category in VOCAB_PRECEDENCE:
+        for tok in vocabs[category]:
+            table.setdefault(tok, category)
+    return table
+
+
+def uppercase_vocab_table(vocabs: Dict[str, set]) -> Dict[str, str]:
+    """vocab_table restricted to the tokens a lookup can serve as is (see TokenLabeler)."""
+    # label_token matches on token.upper(), so only tokens equal to their uppercase hit directly
+    return {tok: category for tok, category in vocab_table(vocabs).items() if tok.upper() == tok}
+
+
+def compiled_label_token(store: CompiledVocab) -> Callable[[str], str]:
+    """label_token over the vocabularies of a compiled vocab file, with one lookup per token."""
+    categories = store.category_table(VOCAB_PRECEDENCE)
+    mask = store.mask
+
+    def label(token: str) -> str:
+        return categories[mask(token.upper())] or pattern_category(token)
+
+    return label
+
+
+class TokenLabeler:
+    """
+    Same labels as label_token, computed with dict lookups.
+
+    The vocabularies are folded once into one exact token -> category table
+    (keeping label_token's precedence when a token is in several vocabularies).
+    Tokens not in the table, i.e. non-vocab tokens and vocab tokens that are not
+    written in uppercase, go through label_token once and are then served from
+    a bounded LRU cache of cache_size entries.
+
+    Compiled vocabularies (the VocabViews of load_vocabs on a compiled file) are
+    not copied into a table: every token is looked up in the shared mapping, with
+    one hash probe giving all its categories, through the LRU cache, so each
+    worker only holds the tokens it has seen.
+
+    With split_glued, split_glued_tokens also breaks MISC tokens made of
+    vocabulary words ("OCCSENSOR") into those words (see src.bms.vocab_matcher).
+    """
+
+    def __init__(self, vocabs: Dict[str, set], cache_size: int = LABEL_CACHE_SIZE, split_glued: bool = False):
+        self.vocabs = vocabs
+        stores = {tokens.store for tokens in vocabs.values() if isinstance(tokens, VocabView)}
+        compiled = len(stores) == 1 and all(isinstance(tokens, VocabView) for tokens in vocabs.values())
+        self.table = {} if compiled else uppercase_vocab_table(vocabs)
+        if compiled:
+            label = compiled_label_token(stores.pop())
+        else:
+            label = partial(label_token, vocabs=vocabs)
+        self._fallback = lru_cache(maxsize=cache_size)(label)
+        self.split_glued = split_glued
+        self._segment = None
+        if split_glued:
+            trie = VocabTrie(self.table or uppercase_vocab_table(vocabs))
+            self._segment = lru_cache(maxsize=cache_size)(trie.segment)
+
+    def label(self, token: str) -> str:
+        """Return the category of one token, as label_token would."""
+        return self.table.get(token) or self._fallback(token)
+
+    def label_tokens(self, tokens: List[str]) -> List[str]:
+        """Label a list of tokens, as weak_label_tokens would."""
+        get = self.table.get
+        fallback = self._fallback
+        return [get(tok) or fallback(tok) for tok in tokens]
+
+    def split_glued_tokens(
+        self, tokens: List[str], spans: Optional[List[Tuple[int, int]]], token_labels: List[str]
+    ) -> Tuple[List[str], Optional[List[Tuple[int, int]]], List[str]]:
+        """
+        Replace every MISC token made of vocabulary words by those words, with their spans (if given)
+        and categories; returns the new tokens, spans and labels. A no-op without split_glued.
+        """
+        if self._segment is None or "MISC" not in token_labels:
+            return tokens, spans, token_labels
+        segment = self._segment
+        new_tokens: List[str] = []
+        new_spans: List[Tuple[int, int]] = []
+        new_labels: List[str] = []
+        for i, (tok, category) in enumerate(zip(tokens, token_labels)):
+            pieces = segment(tok) if category == "MISC" else None
+            if pieces is None:
+                new_tokens.append(tok)
+                new_labels.append(category)
+                if spans is not None:
+                    new_spans.append(spans[i])
+                continue
+            for start, end, piece_category in pieces:
+                new_tokens.append(tok[start:end])
+                new_labels.append(piece_category)
+                if spans is not None:
+                    offset = spans[i][0]
+                    new_spans.append((offset + start, offset + end))
+        return new_tokens, new_spans if spans is not None else None, new_labels
+
+
 # ---------------------------------------------------------
 # Category -> BIO conversion
 # ---------------------------------------------------------
@@ -307,59 +540,406 @@ def build_structured(tokens: List[str], cats: List[str]) -> Dict[str, Optional[s
 # ---------------------------------------------------------
 
 
-def annotate_record(raw_record: Dict[str, Any], vocabs: Dict[str, set]) -> Dict[str, Any]:
-    """Annotate one raw record with tokens, labels, BIO tags, structured interpretation."""
+def annotate_record(
+    raw_record: Dict[str, Any],
+    vocabs: Dict[str, set],
+    tokens: Optional[List[str]] = None,
+    spans: Optional[List[Tuple[int, int]]] = None,
+    output_mode: str = "tokens",
+    labeler: Optional[TokenLabeler] = None,
+) -> Dict[str, Any]:
+    """
+    Annotate one raw record with tokens, labels, BIO tags, structured interpretation.
+    Pass `tokens` (and `spans`) when the label was already tokenized (e.g. by tokenize_many),
+    and a TokenLabeler built from vocabs to label tokens through its lookup table.
+
+    output_mode:
+      - "tokens":  token strings only (default)
+      - "spans":   token strings plus token_spans, the (start, end) offsets into point_label
+      - "compact": token_spans only; tokens are point_label[start:end]
+    """
+    if output_mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output_mode {output_mode!r}, expected one of {OUTPUT_MODES}")
+
     point_label = raw_record["point_label"]
-    building_id = raw_record.get("building_id")
 
-    tokens = tokenize(point_label)
-    token_labels = weak_label_tokens(tokens, vocabs)  # coarse categories
+    if output_mode != "tokens" and spans is None:
+        tokens, spans = tokenize_with_spans(point_label)
+    elif tokens is None:
+        tokens = tokenize(point_label)
+    if labeler is not None:
+        token_labels = labeler.label_tokens(tokens)  # coarse categories
+        if labeler.split_glued:
+            tokens, spans, token_labels = labeler.split_glued_tokens(tokens, spans, token_labels)
+    else:
+        token_labels = weak_label_tokens(tokens, vocabs)
     bio_tags = categories_to_bio(token_labels)  # BIO scheme
     structured = build_structured(tokens, token_labels)
 
+    annotated: Dict[str, Any] = {"point_label": point_label}
+    if output_mode != "compact":
+        annotated["tokens"] = tokens
+    if output_mode != "tokens":
+        annotated["token_spans"] = spans
+    annotated.update({"token_labels": token_labels, "bio_tags": bio_tags})
+    annotated.update(provenance_fields(raw_record))
+    annotated["structured"] = structured
+    return annotated
+
+
+def provenance_fields(raw_record: Dict[str, Any]) -> Dict[str, Any]:
+    """The fields of an annotation copied from the input record rather than derived from point_label."""
     return {
-        "point_label": point_label,
-        "tokens": tokens,
-        "token_labels": token_labels,
-        "bio_tags": bio_tags,
-        "building_id": building_id,
+        "building_id": raw_record.get("building_id"),
         "source_file": raw_record.get("source_file"),
         "point_label_col": raw_record.get("point_label_col"),
         "label_source": "rule",
-        "structured": structured,
     }
 
 
+def annotation_fragments(annotated_json: str, separators=None) -> Tuple[str, str]:
+    """
+    Split the JSON of an annotation (json.dumps(annotate_record(...), separators=separators))
+    into the parts that depend on point_label only: head is the object up to bio_tags
+    without its closing brace, tail is the structured field with the closing brace.
+    assemble_annotation_line puts them back together around new provenance fields.
+    """
+    item_sep = separators[0] if separators else ", "
+    # A '"' right after a separator cannot sit inside a JSON string (it would be escaped),
+    # so the first matches are the building_id and structured keys themselves
+    head_end = annotated_json.index(f'{item_sep}"building_id"')
+    tail_start = annotated_json.index(f'{item_sep}"structured"', head_end) + len(item_sep)
+    return annotated_json[:head_end], annotated_json[tail_start:]
+
+
+def assemble_annotation_line(head: str, tail: str, raw_record: Dict[str, Any], separators=None, memo=None) -> str:
+    """
+    Rebuild the output JSONL line json.dumps(annotate_record(...)) gives, from cached fragments.
+    memo (a dict) remembers the JSON of provenance fields already seen, which repeat across rows.
+    """
+    item_sep = separators[0] if separators else ", "
+    fields = provenance_fields(raw_record)
+    memo_key = (fields["building_id"], fields["source_file"], fields["point_label_col"])
+    middle = memo.get(memo_key) if memo is not None else None
+    if middle is None:
+        middle = json.dumps(fields, separators=separators)[1:-1]
+        if memo is not None:
+            memo[memo_key] = middle
+    return f"{head}{item_sep}{middle}{item_sep}{tail}\n"
+
+
+# ---------------------------------------------------------
+# Annotate batches and shards of the points file
+# ---------------------------------------------------------
+
+
+def annotate_batch_lines(
+    raw_records: List[Dict[str, Any]],
+    vocabs: Dict[str, set],
+    labeler: Optional[TokenLabeler] = None,
+    output_mode: str = "tokens",
+    cache: Optional[LabelCache] = None,
+    seen: Optional[Dict[str, Tuple[str, str]]] = None,
+    codec: Optional[JsonCodec] = None,
+) -> List[str]:
+    """
+    Annotate a batch of raw records (tokenized together) and return their output JSONL lines.
+    With a LabelCache, labels annotated by an earlier run are not tokenized or labelled again.
+    With seen (a dict kept across batches), every distinct point_label is annotated only once.
+    codec (default get_codec()) encodes the lines; every JSON backend writes the same bytes.
+    """
+    # compact output also drops the whitespace json.dumps puts after separators
+    separators = (",", ":") if output_mode == "compact" else None
+    codec = codec or get_codec()
+    if cache is not None or seen is not None:
+        return annotate_batch_lines_dedup(
+            raw_records, vocabs, labeler, output_mode, separators, {} if seen is None else seen, cache, codec
+        )
+
+    dumps = codec.encoder(separators)
+    return [dumps(annotated) + "\n" for annotated in annotate_batch(raw_records, vocabs, labeler, output_mode)]
+
+
+def annotate_batch(
+    raw_records: List[Dict[str, Any]],
+    vocabs: Dict[str, set],
+    labeler: Optional[TokenLabeler] = None,
+    output_mode: str = "tokens",
+) -> List[Dict[str, Any]]:
+    """Annotate a batch of raw records, tokenized together; returns the annotate_record dicts."""
+    with_spans = output_mode != "tokens"
+    batch = tokenize_many((r["point_label"] for r in raw_records), with_spans=with_spans)
+    return [
+        annotate_record(
+            raw_record,
+            vocabs,
+            tokens=batch.label_tokens(i),
+            spans=batch.label_spans(i) if with_spans else None,
+            output_mode=output_mode,
+            labeler=labeler,
+        )
+        for i, raw_record in enumerate(raw_records)
+    ]
+
+
+def annotate_batch_lines_dedup(
+    raw_records,
+    vocabs,
+    labeler,
+    output_mode,
+    separators,
+    seen: Dict[str, Tuple[str, str]],
+    cache=None,
+    codec: Optional[JsonCodec] = None,
+):
+    """
+    annotate_batch_lines keyed by point_label: each label not yet in seen is looked up in the
+    cache (if any) or annotated once, and its (head, tail) fragments are expanded back to every
+    row with that label, around the row's own building_id / source_file / point_label_col.
+    """
+    todo: Dict[str, Dict[str, Any]] = {}  # label -> first record with that label, in input order
+    for raw_record in raw_records:
+        if raw_record["point_label"] not in seen:
+            todo.setdefault(raw_record["point_label"], raw_record)
+
+    if todo and cache is not None:
+        keys = {label: label_key(label) for label in todo}
+        cached = cache.get_many(list(keys.values()))
+        for label, key in keys.items():
+            if key in cached:
+                seen[label] = cached[key]
+                del todo[label]
+
+    if todo:
+        todo_records = list(todo.values())
+        batch = tokenize_many(todo, with_spans=output_mode != "tokens")
+        dumps = (codec or get_codec()).encoder(separators)
+        new_entries = []
+        for i, (label, raw_record) in enumerate(zip(todo, todo_records)):
+            tokens = batch.label_tokens(i)
+            annotated = annotate_record(
+                raw_record,
+                vocabs,
+                tokens=tokens,
+                spans=batch.label_spans(i) if batch.spans is not None else None,
+                output_mode=output_mode,
+                labeler=labeler,
+            )
+            seen[label] = annotation_fragments(dumps(annotated), separators)
+            if cache is not None:
+                new_entries.append((label_key(label), (tok.upper() for tok in tokens), *seen[label]))
+        if cache is not None:
+            cache.put_many(new_entries)
+
+    memo: Dict[tuple, str] = {}
+    return [
+        assemble_annotation_line(*seen[raw_record["point_label"]], raw_record, separators, memo)
+        for raw_record in raw_records
+    ]
+
+
+# Vocabs and labeler of a pool worker process, loaded once by init_annotation_worker
+_worker_vocabs: Dict[str, Any] = {}
+
+
+def init_annotation_worker(vocab_path: str, split_glued: bool = False):
+    """Pool initializer: load the vocabs and build the labeler once per worker process."""
+    vocabs = load_vocabs(vocab_path)
+    _worker_vocabs.update({"vocabs": vocabs, "labeler": TokenLabeler(vocabs, split_glued=split_glued)})
+
+
+def annotate_shard(
+    input_path, shard, output_mode: str = "tokens", dedup_labels: bool = False, json_backend: Optional[str] = None
+) -> Tuple[str, int, Set[bytes]]:
+    """
+    Pool worker: annotate one shard of the points file.
+    Returns its output JSONL text, its record count and the label_key of each distinct label it
+    annotated with dedup_labels (empty if off), so that labels shared by shards are counted once.
+    """
+    vocabs, labeler = _worker_vocabs["vocabs"], _worker_vocabs["labeler"]
+    seen: Optional[Dict[str, Tuple[str, str]]] = {} if dedup_labels else None
+    codec = get_codec(json_backend)
+    lines: List[str] = []
+    for raw_records in iter_record_batches(input_path, BATCH_SIZE, shard=shard, json_backend=json_backend):
+        lines.extend(annotate_batch_lines(raw_records, vocabs, labeler, output_mode, seen=seen, codec=codec))
+    return "".join(lines), len(lines), {label_key(label) for label in seen or ()}
+
+
+def annotate_shard_table(input_path, shard, json_backend: Optional[str] = None):
+    """Pool worker for --format parquet: annotate one shard into an Arrow table (see src.bms.labeled_io)."""
+    vocabs, labeler = _worker_vocabs["vocabs"], _worker_vocabs["labeler"]
+    annotated: List[Dict[str, Any]] = []
+    for raw_records in iter_record_batches(input_path, BATCH_SIZE, shard=shard, json_backend=json_backend):
+        annotated.extend(annotate_batch(raw_records, vocabs, labeler, "compact"))
+    return annotations_to_table(annotated)
+
+
+def write_labeled_parquet(
+    input_path, vocab_path, output_path, workers: int = 1, json_backend=None, split_glued: bool = False
+) -> int:
+    """Annotate a points file into point_names_labeled.parquet (see src.bms.labeled_io); returns the row count."""
+    with LabeledPointsWriter(output_path) as writer:
+        if workers > 1:
+            shards = plan_shards(input_path, workers * SHARDS_PER_WORKER)
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=init_annotation_worker,
+                initargs=(str(compile_vocabs(vocab_path)), split_glued),
+            ) as pool:
+                for table in pool.map(partial(annotate_shard_table, input_path, json_backend=json_backend), shards):
+                    writer.write_table(table)
+        else:
+            vocabs = load_vocabs(str(vocab_path))
+            labeler = TokenLabeler(vocabs, split_glued=split_glued)
+            for raw_records in iter_record_batches(input_path, BATCH_SIZE, json_backend=json_backend):
+                writer.write_annotations(annotate_batch(raw_records, vocabs, labeler, "compact"))
+    return writer.num_rows
+
+
 # ---------------------------------------------------------
 # Main: read JSONL, annotate, write JSONL
 # ---------------------------------------------------------
 
 
-def main():
+def parse_args(argv=None):
+    """Parse command-line options for the labelling run."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0].strip())
+    parser.add_argument(
+        "--output-mode",
+        choices=OUTPUT_MODES,
+        default="tokens",
+        help="tokens: token strings; spans: token strings plus (start, end) offsets; compact: offsets only",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of processes annotating shards of the input in parallel (output order is kept)",
+    )
+    parser.add_argument(
+        "--cache",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="PATH",
+        help="reuse annotations of unchanged point labels from an SQLite cache "
+        "(default PATH: point_names_labeled.cache.sqlite next to the output)",
+    )
+    parser.add_argument(
+        "--dedup-labels",
+        action="store_true",
+        help="annotate each distinct point_label once and copy its annotation to every row with that label",
+    )
+    parser.add_argument(
+        "--json-backend",
+        choices=("auto", *JSON_BACKENDS),
+        default=None,
+        help="JSON library reading the points and writing the output; all write the same bytes, and only "
+        "reading and --output-mode compact get faster (default: BMS_JSON_BACKEND, else the fastest installed)",
+    )
+    parser.add_argument(
+        "--input-format",
+        choices=POINTS_FORMATS,
+        default="jsonl",
+        help="read all_points.jsonl or all_points.parquet from PARSER_OUTPUT_DIR",
+    )
+    parser.add_argument(
+        "--format",
+        choices=POINTS_FORMATS,
+        default="jsonl",
+        help="write point_names_labeled.jsonl, or point_names_labeled.parquet with integer-coded labels "
+        "(read back with src.bms.labeled_io.iter_labeled_records)",
+    )
+    parser.add_argument(
+        "--split-glued",
+        action="store_true",
+        help="split MISC tokens made of vocabulary words (e.g. OCCSENSOR -> OCC SENSOR) into those words; "
+        "tokens with a piece outside bms_vocabs.json (e.g. OPENOFF: OFF is not in the shipped vocab) stay MISC",
+    )
+    args = parser.parse_args(argv)
+    if args.cache is not None and args.workers > 1:
+        parser.error("--cache cannot be combined with --workers")
+    if args.cache is not None and args.split_glued:
+        # Cache entries are invalidated by the categories of a label's tokens, not of their substrings
+        parser.error("--cache cannot be combined with --split-glued")
+    if args.format == "parquet" and (args.cache is not None or args.dedup_labels):
+        parser.error("--format parquet cannot be combined with --cache or --dedup-labels")
+    return args
+
+
+def main(argv=None):
     """Annotate all BMS point names in the input JSONL file and write to output JSONL file."""
-    INPUT = Path(os.getenv("PARSER_OUTPUT_DIR", "data/output/point-name-parser")) / "all_points.jsonl"
+    args = parse_args(argv)
+
+    INPUT = points_path(os.getenv("PARSER_OUTPUT_DIR", "data/output/point-name-parser"), args.input_format)
     VOCABS = Path(os.getenv("PARSER_OUTPUT_DIR", "data/output/point-name-parser")) / "bms_vocabs.json"
 
     OUTPUT = Path(os.getenv("PARSER_OUTPUT_DIR", "data/output/point-name-parser")) / Path("point_names_labeled.jsonl")
+    if args.cache == "":
+        args.cache = OUTPUT.with_suffix(".cache.sqlite")
 
-    vocabs = load_vocabs(str(VOCABS))
+    if args.format == "parquet":
+        OUTPUT = OUTPUT.with_suffix(".parquet")
+        num_out = write_labeled_parquet(INPUT, VOCABS, OUTPUT, args.workers, args.json_backend, args.split_glued)
+        print(f"Done. Read {num_out} records, wrote {num_out} annotated records to {OUTPUT}")
+        return
 
     num_in = 0
     num_out = 0
-
-    with INPUT.open("r", encoding="utf-8") as fin, OUTPUT.open("w", encoding="utf-8") as fout:
-
-        for line in fin:
-            line = line.strip()
-            if not line:
-                continue
-
-            num_in += 1
-            raw_record = json.loads(line)
-            annotated = annotate_record(raw_record, vocabs)
-            fout.write(json.dumps(annotated) + "\n")
-            num_out += 1
-
+    num_distinct = 0
+    num_annotated = 0  # with --workers, labels repeated across shards are annotated once per shard
+
+    with OUTPUT.open("w", encoding="utf-8") as fout:
+        if args.workers > 1:
+            # Workers read their own shard of the input; results are written back in input order
+            shards = plan_shards(INPUT, args.workers * SHARDS_PER_WORKER)
+            # Workers map one compiled copy of the vocabularies instead of each parsing the JSON
+            with ProcessPoolExecutor(
+                max_workers=args.workers,
+                initializer=init_annotation_worker,
+                initargs=(str(compile_vocabs(VOCABS)), args.split_glued),
+            ) as pool:
+                annotate = partial(
+                    annotate_shard,
+                    INPUT,
+                    output_mode=args.output_mode,
+                    dedup_labels=args.dedup_labels,
+                    json_backend=args.json_backend,
+                )
+                distinct_keys: Set[bytes] = set()
+                for text, count, keys in pool.map(annotate, shards):
+                    fout.write(text)
+                    num_in += count
+                    num_out += count
+                    num_annotated += len(keys)
+                    distinct_keys |= keys
+                num_distinct = len(distinct_keys)
+        else:
+            vocabs = load_vocabs(str(VOCABS))
+            labeler = TokenLabeler(vocabs, split_glued=args.split_glued)
+            cache = None
+            if args.cache:
+                cache = LabelCache(args.cache, vocab_table(vocabs), args.output_mode, label_rules_version())
+            seen: Optional[Dict[str, Tuple[str, str]]] = {} if args.dedup_labels else None
+            codec = get_codec(args.json_backend)
+            for raw_records in iter_record_batches(INPUT, BATCH_SIZE, json_backend=args.json_backend):
+                num_in += len(raw_records)
+                lines = annotate_batch_lines(raw_records, vocabs, labeler, args.output_mode, cache, seen, codec)
+                fout.writelines(lines)
+                num_out += len(lines)
+            num_distinct = num_annotated = len(seen or ())
+            if cache is not None:
+                cache.close()
+                print(
+                    f"Label cache {args.cache}: {cache.hits} hits, {cache.misses} misses (distinct labels), "
+                    f"{cache.invalidated} entries invalidated by vocab or rule changes"
+                )
+
+    if args.dedup_labels:
+        print(
+            f"Label dedup: {num_out} rows, {num_distinct} distinct point labels "
+            f"({num_out / max(num_distinct, 1):.2f} rows per label), {num_annotated} annotated"
+        )
     print(f"Done. Read {num_in} records, wrote {num_out} annotated records to {OUTPUT}")
 
 
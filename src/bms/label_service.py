@@ -0,0 +1,393 @@
+"""
+Local HTTP service labelling BMS point names with the weak rule-based labeller.
+
+`src.bms.label_point_tokens` labels a whole points file per run and loads
+bms_vocabs.json every time. This service loads the vocabularies once and keeps
+a `TokenLabeler` warm, so interactive tools can label a few points per request:
+
+    POST /annotate  {"points": [{"point_label": "AHU-01.SAT_AI", "building_id": "B1"}, ...],
+                     "output_mode": "tokens"}
+    -> {"vocab_version": "...", "annotations": [<annotate_record dict>, ...]}
+
+    POST /annotate/stream?output_mode=tokens   (body: NDJSON point records)
+    -> NDJSON annotations, the lines label_point_tokens writes, sent as they are produced
+
+    GET /health     -> vocab path, version, load time and number of vocabulary tokens
+
+The streaming endpoint never holds a whole upload in memory. The body is cut
+into chunks of stream_chunk records; each chunk is annotated in a worker pool
+(a thread, or --stream-workers processes) so the event loop stays responsive,
+and the pending chunks wait in a queue of queue_depth entries, in input order.
+When the client reads the output slowly the queue fills up, reading the request
+body pauses, and the client is slowed down instead of the server buffering.
+Clients must therefore read the response while they upload (as curl does); one
+that reads nothing before its whole body is sent stalls on large uploads. A vocab
+reload applies from the next chunk read, and a chunk that fails (e.g. a line that
+is not JSON) ends the response with an {"error": ...} line.
+
+The vocab file is watched: when its modification time or size changes (checked
+at most every check_interval seconds, on the next request), the new file is
+loaded and a new labeler built before both are swapped in together. A request
+always uses one consistent vocab snapshot, and a file that fails to load (e.g.
+while it is being rewritten) leaves the previous vocabularies in service.
+Each version is compiled into bms_vocabs.bin (see src.bms.vocab_store), which
+the service and its stream workers memory-map: workers are sent the path and
+version of the file, not the vocabularies, and open each version once.
+
+Run with:
+    poetry run python -m src.bms.label_service --port 8000
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from collections.abc import AsyncIterator, Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Literal, NamedTuple, Optional, Tuple
+
+from src.bms.json_codec import get_codec
+from src.bms.label_cache import vocab_fingerprint
+from src.bms.label_point_tokens import (
+    OUTPUT_MODES,
+    TokenLabeler,
+    annotate_batch,
+    annotate_batch_lines,
+    compile_vocabs,
+    load_vocabs,
+    vocab_table,
+)
+
+# Seconds between two checks of the vocab file for changes
+CHECK_INTERVAL = 1.0
+
+# Max number of points in one /annotate request
+MAX_BATCH = 100_000
+
+# Records per chunk handed to the worker pool by /annotate/stream
+STREAM_CHUNK = 1_000
+
+# Chunks of one stream that may be annotated or waiting to be sent before reading the body pauses
+STREAM_QUEUE_DEPTH = 4
+
+# Longest NDJSON line /annotate/stream accepts
+MAX_LINE_BYTES = 1 << 20
+
+
+class VocabSnapshot(NamedTuple):
+    """Vocabularies loaded from one version of the vocab file, with their labeler."""
+
+    vocabs: Dict[str, set]
+    labeler: TokenLabeler
+    version: str  # fingerprint of the token -> category table
+    compiled_path: str  # the compiled vocab file the vocabularies are mapped from
+    file_stat: tuple  # (mtime_ns, size) of the file it was loaded from
+    loaded_at: float
+    num_tokens: int
+
+
+def load_snapshot(vocab_path) -> VocabSnapshot:
+    """Compile and map the vocab file, and build its labeler."""
+    stat = os.stat(vocab_path)
+    compiled_path = str(compile_vocabs(vocab_path))
+    vocabs = load_vocabs(compiled_path)
+    table = vocab_table(vocabs)
+    return VocabSnapshot(
+        vocabs,
+        TokenLabeler(vocabs),
+        vocab_fingerprint(table),
+        compiled_path,
+        (stat.st_mtime_ns, stat.st_size),
+        time.time(),
+        len(table),
+    )
+
+
+class VocabStore:
+    """The current VocabSnapshot of a vocab file, reloaded when the file changes."""
+
+    def __init__(self, vocab_path, check_interval: float = CHECK_INTERVAL):
+        self.vocab_path = Path(vocab_path)
+        self.check_interval = check_interval
+        self.reload_errors = 0
+        self._snapshot = load_snapshot(self.vocab_path)
+        self._checked_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def current(self) -> VocabSnapshot:
+        """Return the snapshot to label with, reloading first if the vocab file changed."""
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            self.maybe_reload()
+        return self._snapshot
+
+    def maybe_reload(self) -> bool:
+        """Reload the vocab file if its mtime or size changed; returns True if a new snapshot was swapped in."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                stat = os.stat(self.vocab_path)
+                if (stat.st_mtime_ns, stat.st_size) == self._snapshot.file_stat:
+                    return False
+                snapshot = load_snapshot(self.vocab_path)
+            except (OSError, ValueError) as e:
+                # Keep serving the previous vocabularies; the next check tries again
+                self.reload_errors += 1
+                print(f"Could not reload {self.vocab_path}: {e}")
+                return False
+            # One reference swap: requests see either the old or the new snapshot, never a mix
+            self._snapshot = snapshot
+            return True
+
+
+# ---------------------------------------------------------
+# Streaming: NDJSON in, annotated NDJSON out, bounded buffering
+# ---------------------------------------------------------
+
+# Vocabs and labeler of the vocab version a pool worker last annotated with
+_chunk_labelers: Dict[str, Tuple[Dict[str, Any], TokenLabeler]] = {}
+
+
+def worker_labeler(compiled_path: str, version: str) -> Tuple[Dict[str, Any], TokenLabeler]:
+    """The vocabs and labeler of a vocab version, mapped from compiled_path once per worker."""
+    entry = _chunk_labelers.get(version)
+    if entry is None:
+        _chunk_labelers.clear()
+        vocabs = load_vocabs(compiled_path)
+        entry = _chunk_labelers[version] = (vocabs, TokenLabeler(vocabs))
+    return entry
+
+
+def annotate_ndjson_chunk(lines: List[bytes], compiled_path: str, version: str, output_mode: str) -> str:
+    """
+    Worker pool task: annotate a chunk of NDJSON point records into the output lines
+    label_point_tokens writes, with the vocab version compiled at compiled_path.
+    (A worker first opening a version after the file was recompiled labels with the newer file.)
+    """
+    vocabs, labeler = worker_labeler(compiled_path, version)
+    codec = get_codec()
+    return "".join(annotate_batch_lines(codec.decode_records(lines), vocabs, labeler, output_mode, codec=codec))
+
+
+async def iter_ndjson_chunks(
+    byte_stream: AsyncIterator[bytes], chunk_size: int = STREAM_CHUNK, max_line: int = MAX_LINE_BYTES
+) -> AsyncIterator[List[bytes]]:
+    """Regroup a stream of byte blocks into lists of at most chunk_size NDJSON lines."""
+    partial_line = b""
+    lines: List[bytes] = []
+    async for data in byte_stream:
+        *complete, partial_line = (partial_line + data).split(b"\n")
+        if len(partial_line) > max_line or any(len(line) > max_line for line in complete):
+            raise ValueError(f"NDJSON line longer than {max_line} bytes")
+        lines.extend(complete)
+        while len(lines) >= chunk_size:
+            yield lines[:chunk_size]
+            lines = lines[chunk_size:]
+    if partial_line.strip():
+        lines.append(partial_line)
+    if lines:
+        yield lines
+
+
+async def stream_annotations(
+    byte_stream: AsyncIterator[bytes],
+    current: Callable[[], VocabSnapshot],
+    executor: Executor,
+    output_mode: str = "tokens",
+    chunk_size: int = STREAM_CHUNK,
+    queue_depth: int = STREAM_QUEUE_DEPTH,
+) -> AsyncIterator[str]:
+    """
+    Annotate an NDJSON byte stream chunk by chunk in executor, yielding the output text of each
+    chunk in input order. At most queue_depth + 2 chunks are read ahead of what was yielded.
+    Each chunk is labelled with the vocab snapshot current() gives when it is read. A chunk
+    that fails ends the stream with one {"error": ...} line.
+    """
+    loop = asyncio.get_running_loop()
+    pending: asyncio.Queue = asyncio.Queue(maxsize=queue_depth)
+
+    async def read_body():
+        try:
+            async for lines in iter_ndjson_chunks(byte_stream, chunk_size):
+                snapshot = current()
+                task = loop.run_in_executor(
+                    executor, annotate_ndjson_chunk, lines, snapshot.compiled_path, snapshot.version, output_mode
+                )
+                # Waits while the queue is full, which stops reading the body until the client catches up
+                await pending.put(task)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            await pending.put(e)
+        await pending.put(None)
+
+    reader = asyncio.create_task(read_body())
+    try:
+        while (item := await pending.get()) is not None:
+            try:
+                if isinstance(item, Exception):
+                    raise item
+                yield await item
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                yield json_error_line(e)
+                break
+    finally:
+        reader.cancel()
+
+
+def json_error_line(error: Exception) -> str:
+    """The NDJSON line ending a failed stream."""
+    return get_codec().dumps({"error": f"{type(error).__name__}: {error}"}) + "\n"
+
+
+# ---------------------------------------------------------
+# App
+# ---------------------------------------------------------
+
+
+def create_app(
+    vocab_path,
+    check_interval: float = CHECK_INTERVAL,
+    stream_workers: int = 0,
+    stream_chunk: int = STREAM_CHUNK,
+    queue_depth: int = STREAM_QUEUE_DEPTH,
+):
+    """
+    Build the FastAPI app serving the vocab file at vocab_path.
+    /annotate/stream annotates in stream_workers processes, or in one thread if 0.
+    """
+    # fastapi and pydantic are only needed for the service
+    from fastapi import FastAPI, HTTPException, Request, Response
+    from fastapi.responses import StreamingResponse
+    from pydantic import BaseModel
+
+    class PointIn(BaseModel):
+        """One point of an /annotate request, as in all_points.jsonl."""
+
+        point_label: str
+        building_id: Optional[Any] = None
+        source_file: Optional[Any] = None
+        point_label_col: Optional[Any] = None
+
+    class AnnotateRequest(BaseModel):
+        """Body of /annotate: the points to annotate and how tokens are written."""
+
+        points: List[PointIn]
+        output_mode: Literal[OUTPUT_MODES] = "tokens"  # type: ignore[valid-type]
+
+    store = VocabStore(vocab_path, check_interval)
+    codec = get_codec()
+    executor: Executor = ThreadPoolExecutor(1)
+    if stream_workers > 0:
+        # Workers forked while a client is connected would keep its socket open after the response
+        snapshot = store.current()
+        executor = ProcessPoolExecutor(
+            stream_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=worker_labeler,
+            initargs=(snapshot.compiled_path, snapshot.version),
+        )
+
+    @asynccontextmanager
+    async def lifespan(_app):
+        yield
+        executor.shutdown(cancel_futures=True)
+
+    app = FastAPI(title="BMS point label service", lifespan=lifespan)
+    app.state.vocab_store = store
+
+    @app.post("/annotate")
+    def annotate(request: AnnotateRequest) -> Response:
+        if len(request.points) > MAX_BATCH:
+            raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH} points per request")
+        snapshot = store.current()
+        raw_records = [point.model_dump() for point in request.points]
+        annotations = annotate_batch(raw_records, snapshot.vocabs, snapshot.labeler, request.output_mode)
+        # Encode once with the pipeline's JSON codec instead of FastAPI's generic encoder
+        body = codec.dumps({"vocab_version": snapshot.version, "annotations": annotations}, separators=(",", ":"))
+        return Response(content=body, media_type="application/json")
+
+    class DuplexStreamingResponse(StreamingResponse):
+        """
+        StreamingResponse whose content reads the request body while the response is sent.
+        Before ASGI spec 2.4 (uvicorn), StreamingResponse watches for a disconnect by reading
+        request messages, which would take the body away from the content; here the watch
+        starts once the body has been read.
+        """
+
+        def __init__(self, content, body_read: asyncio.Event, **kwargs):
+            super().__init__(content, **kwargs)
+            self.body_read = body_read
+
+        async def listen_for_disconnect(self, receive):
+            await self.body_read.wait()
+            await super().listen_for_disconnect(receive)
+
+    @app.post("/annotate/stream")
+    async def annotate_stream(request: Request, output_mode: Literal[OUTPUT_MODES] = "tokens"):  # type: ignore
+        body_read = asyncio.Event()
+
+        async def body():
+            try:
+                async for data in request.stream():
+                    yield data
+            finally:
+                body_read.set()
+
+        chunks = stream_annotations(body(), store.current, executor, output_mode, stream_chunk, queue_depth)
+        return DuplexStreamingResponse(chunks, body_read, media_type="application/x-ndjson")
+
+    @app.get("/health")
+    def health() -> Dict[str, Any]:
+        snapshot = store.current()
+        return {
+            "status": "ok",
+            "vocab_path": str(store.vocab_path),
+            "vocab_version": snapshot.version,
+            "vocab_loaded_at": snapshot.loaded_at,
+            "vocab_tokens": snapshot.num_tokens,
+            "reload_errors": store.reload_errors,
+        }
+
+    return app
+
+
+# ---------------------------------------------------------
+# Main: serve the vocab file of PARSER_OUTPUT_DIR
+# ---------------------------------------------------------
+
+
+def parse_args(argv=None):
+    """Parse command-line options for the labelling service."""
+    parser = argparse.ArgumentParser(description="Serve the weak rule-based BMS point labeller over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="interface to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="port to listen on")
+    parser.add_argument(
+        "--check-interval",
+        type=float,
+        default=CHECK_INTERVAL,
+        help="seconds between checks of bms_vocabs.json for changes",
+    )
+    parser.add_argument(
+        "--stream-workers",
+        type=int,
+        default=0,
+        help="processes annotating /annotate/stream chunks (0: one thread of the service process)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Load bms_vocabs.json from PARSER_OUTPUT_DIR and serve it until interrupted."""
+    args = parse_args(argv)
+    # uvicorn is only needed to run the service
+    import uvicorn
+
+    VOCABS = Path(os.getenv("PARSER_OUTPUT_DIR", "data/output/point-name-parser")) / "bms_vocabs.json"
+    app = create_app(VOCABS, args.check_interval, stream_workers=args.stream_workers)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
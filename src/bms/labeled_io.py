@@ -0,0 +1,227 @@
+"""
+Binary (Parquet) form of the labelled points written by `src.bms.label_point_tokens`.
+
+Every line of point_names_labeled.jsonl repeats the category and BIO tag
+strings of its tokens, the keys of the structured interpretation, and the
+building / source-file metadata. point_names_labeled.parquet stores the same
+annotations with one row per point and these columns:
+
+- point_label: the label text;
+- token_starts / token_ends: list<int32>, the (start, end) character offsets of
+  every token, so token i is point_label[token_starts[i]:token_ends[i]];
+- token_labels: list<uint8>, codes into TOKEN_CATEGORIES;
+- bio_tags: list<uint8>, codes into BIO_TAGS;
+- building_id, source_file, point_label_col, label_source: dictionary-encoded;
+- structured: a struct with the STRUCTURED_FIELDS of build_structured.
+
+Both code tables are also stored in the schema metadata, so the file can be
+decoded without this module. iter_labeled_records gives back the dicts
+annotate_record builds, for any output mode; read_labeled_table returns the
+Arrow table itself, e.g. to feed the integer label codes to a training loop.
+"""
+
+import json
+from collections.abc import Iterator, Sequence
+from typing import Any
+
+import numpy as np
+
+from src.bms.dataset_io import arrow_column_to_list
+
+# Every category label_token can give, in code order (code 0 is MISC)
+TOKEN_CATEGORIES = (
+    "MISC",
+    "BLDG",
+    "FLOOR",
+    "ZONE",
+    "EQUIP",
+    "EQUIP_ID",
+    "SUBCOMP",
+    "POINT_FUNC",
+    "IO_TYPE",
+    "VENDOR_TAG",
+)
+
+# Every BIO tag categories_to_bio can give, in code order (code 0 is O)
+BIO_TAGS = ("O", *(f"{prefix}-{cat}" for cat in TOKEN_CATEGORIES[1:] for prefix in ("B", "I")))
+
+# Keys of build_structured, in its order
+STRUCTURED_FIELDS = ("bldg", "floor", "zone", "equip", "equip_id", "subcomp", "point_func", "io_type", "vendor")
+
+METADATA_COLUMNS = ("building_id", "source_file", "point_label_col", "label_source")
+
+_CATEGORY_CODES = {cat: code for code, cat in enumerate(TOKEN_CATEGORIES)}
+_BIO_CODES = {tag: code for code, tag in enumerate(BIO_TAGS)}
+
+
+def labeled_schema():
+    """Arrow schema of point_names_labeled.parquet, with the code tables in its metadata."""
+    # pyarrow is only needed for the binary output
+    import pyarrow as pa
+
+    dict_string = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema(
+        [
+            ("point_label", pa.string()),
+            ("token_starts", pa.list_(pa.int32())),
+            ("token_ends", pa.list_(pa.int32())),
+            ("token_labels", pa.list_(pa.uint8())),
+            ("bio_tags", pa.list_(pa.uint8())),
+            *((name, dict_string) for name in METADATA_COLUMNS),
+            ("structured", pa.struct([(name, pa.string()) for name in STRUCTURED_FIELDS])),
+        ],
+        metadata={"token_categories": json.dumps(TOKEN_CATEGORIES), "bio_tags": json.dumps(BIO_TAGS)},
+    )
+
+
+def _codes(values: list[str], codes: dict[str, int], what: str) -> list[int]:
+    """Map strings to their codes, naming the first unknown value if any."""
+    try:
+        return [codes[v] for v in values]
+    except KeyError as e:
+        raise ValueError(f"Unknown {what} {e.args[0]!r}; add it to src.bms.labeled_io") from None
+
+
+def annotations_to_table(annotated: Sequence[dict[str, Any]]):
+    """
+    Build an Arrow table in labeled_schema() from annotate_record dicts.
+    The dicts must carry token_spans (output_mode "spans" or "compact").
+    """
+    import pyarrow as pa
+
+    if annotated and "token_spans" not in annotated[0]:
+        raise ValueError("Binary output needs token_spans; annotate with output_mode 'spans' or 'compact'.")
+
+    offsets = [0]
+    starts: list[int] = []
+    ends: list[int] = []
+    labels: list[str] = []
+    bio: list[str] = []
+    for a in annotated:
+        for start, end in a["token_spans"]:
+            starts.append(start)
+            ends.append(end)
+        labels.extend(a["token_labels"])
+        bio.extend(a["bio_tags"])
+        offsets.append(len(starts))
+
+    offsets_arr = pa.array(offsets, pa.int32())
+
+    def list_column(values, value_type):
+        return pa.ListArray.from_arrays(offsets_arr, pa.array(values, value_type))
+
+    schema = labeled_schema()
+    columns = {
+        "point_label": pa.array([a["point_label"] for a in annotated], pa.string()),
+        "token_starts": list_column(starts, pa.int32()),
+        "token_ends": list_column(ends, pa.int32()),
+        "token_labels": list_column(_codes(labels, _CATEGORY_CODES, "token category"), pa.uint8()),
+        "bio_tags": list_column(_codes(bio, _BIO_CODES, "BIO tag"), pa.uint8()),
+    }
+    for name in METADATA_COLUMNS:
+        columns[name] = pa.array([a.get(name) for a in annotated], pa.string()).dictionary_encode()
+    structured = [a["structured"] for a in annotated]
+    columns["structured"] = pa.StructArray.from_arrays(
+        [pa.array([s[name] for s in structured], pa.string()) for name in STRUCTURED_FIELDS],
+        fields=list(schema.field("structured").type),
+    )
+    return pa.Table.from_pydict(columns, schema=schema)
+
+
+class LabeledPointsWriter:
+    """Append batches of annotations to point_names_labeled.parquet, one row group per batch."""
+
+    def __init__(self, path):
+        import pyarrow.parquet as pq
+
+        self.path = path
+        self.num_rows = 0
+        self._writer = pq.ParquetWriter(path, labeled_schema())
+
+    def write_table(self, table):
+        """Write a table built by annotations_to_table."""
+        if table.num_rows:
+            self._writer.write_table(table)
+            self.num_rows += table.num_rows
+
+    def write_annotations(self, annotated: Sequence[dict[str, Any]]):
+        """Write annotate_record dicts (with token_spans)."""
+        self.write_table(annotations_to_table(annotated))
+
+    def close(self):
+        """Finish the Parquet file."""
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_labeled_table(path, columns: list[str] | None = None):
+    """Load point_names_labeled.parquet (or some of its columns) as an Arrow table."""
+    import pyarrow.parquet as pq
+
+    return pq.read_table(path, columns=columns)
+
+
+def _split(flat: list, offsets: list[int]) -> list[list]:
+    """Cut a flat list into per-row lists at the given offsets."""
+    return [flat[offsets[i] : offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+def _flat_values(column) -> tuple[np.ndarray, np.ndarray]:
+    """Offsets (starting at 0) and flat values of a list<int> column."""
+    offsets = column.offsets.to_numpy()
+    return offsets - offsets[0], column.values.to_numpy()[offsets[0] : offsets[-1]]
+
+
+def iter_labeled_records(path, output_mode: str = "tokens", batch_size: int = 10_000) -> Iterator[dict[str, Any]]:
+    """
+    Yield the annotations of point_names_labeled.parquet as the dicts annotate_record builds
+    with the given output_mode ("tokens", "spans" or "compact").
+    """
+    if output_mode not in ("tokens", "spans", "compact"):
+        raise ValueError(f"Unknown output_mode {output_mode!r}")
+    # pyarrow is only needed for the binary output
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    metadata = parquet_file.schema_arrow.metadata or {}
+    categories = np.asarray(json.loads(metadata.get(b"token_categories", json.dumps(TOKEN_CATEGORIES))), dtype=object)
+    bio_tags = np.asarray(json.loads(metadata.get(b"bio_tags", json.dumps(BIO_TAGS))), dtype=object)
+
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        labels = batch.column("point_label").to_pylist()
+        offsets, starts = _flat_values(batch.column("token_starts"))
+        ends = _flat_values(batch.column("token_ends"))[1]
+        offsets = offsets.tolist()
+        token_labels = _split(categories[_flat_values(batch.column("token_labels"))[1]].tolist(), offsets)
+        bio = _split(bio_tags[_flat_values(batch.column("bio_tags"))[1]].tolist(), offsets)
+        flat_starts, flat_ends = starts.tolist(), ends.tolist()
+        spans = _split(list(zip(flat_starts, flat_ends)), offsets) if output_mode != "tokens" else None
+        tokens = None
+        if output_mode != "compact":
+            # The label of every token, to slice the token out of
+            token_labels_text: list[str] = np.repeat(np.asarray(labels, dtype=object), np.diff(offsets)).tolist()
+            tokens = _split([text[a:b] for text, a, b in zip(token_labels_text, flat_starts, flat_ends)], offsets)
+        columns = [arrow_column_to_list(batch.column(name)) for name in METADATA_COLUMNS]
+        structured = batch.column("structured").to_pylist()
+
+        for i, (point_label, building_id, source_file, point_label_col, label_source) in enumerate(
+            zip(labels, *columns)
+        ):
+            annotated: dict[str, Any] = {"point_label": point_label}
+            if tokens is not None:
+                annotated["tokens"] = tokens[i]
+            if spans is not None:
+                annotated["token_spans"] = spans[i]
+            annotated["token_labels"] = token_labels[i]
+            annotated["bio_tags"] = bio[i]
+            annotated["building_id"] = building_id
+            annotated["source_file"] = source_file
+            annotated["point_label_col"] = point_label_col
+            annotated["label_source"] = label_source
+            annotated["structured"] = structured[i]
+            yield annotated
@@ -0,0 +1,262 @@
+"""
+Compact token statistics for BMS vocabulary extraction.
+
+`TokenStats` accumulates, in one pass over tokenized point labels, everything
+`src.bms.generate_bms_vocab` needs to classify tokens:
+- the global frequency of every UPPERCASE token;
+- its building support (the set of buildings it appears in);
+- how often it is directly followed by a numeric token in the same label.
+
+Tokens and buildings are interned as integer IDs in first-seen order, so
+frequencies and numeric-follower counts live in NumPy arrays indexed by token
+ID, and the buildings of a token are one integer bitset (bit b set if the token
+appears in building b) instead of a set of building-name strings. Each raw
+token spelling is uppercased once, when it is first seen.
+
+Statistics of different shards of the points (byte ranges of a file, separate
+files, separate machines) can be merged with `TokenStats.merge`, and saved to /
+loaded from JSON with `save` / `load`, so counting can run as a map phase per
+shard followed by one cheap reduce. Merging shards in their file order gives
+exactly the statistics (including first-seen token order) of one pass over the
+whole file.
+"""
+
+import json
+from collections import Counter
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from pathlib import Path
+
+import numpy as np
+
+from src.bms.tokenizer import TokenBatch
+
+
+class TokenStats:
+    """Token frequency, building support and numeric-follower counts over integer token/building IDs."""
+
+    def __init__(self):
+        self.tokens: list[str] = []  # token ID -> UPPERCASE token
+        self.token_ids: dict[str, int] = {}  # UPPERCASE token -> token ID
+        self.buildings: list = []  # building ID -> building_id value
+        self.building_ids: dict = {}  # building_id value -> building ID
+        self.freq = np.zeros(0, dtype=np.int64)  # token ID -> number of occurrences
+        self.numid_bigrams = np.zeros(0, dtype=np.int64)  # token ID -> times followed by a numeric token
+        self.support: list[int] = []  # token ID -> bitset of building IDs
+        self._numeric = np.zeros(0, dtype=bool)  # token ID -> token is all digits
+        self._raw_ids: dict[str, int] = {}  # token as written in the label -> token ID
+
+    # -----------------------------
+    # Interning
+    # -----------------------------
+
+    def _intern_token(self, tok: str) -> int:
+        """Return the token ID of an UPPERCASE token, interning it if new."""
+        tok_id = self.token_ids.get(tok)
+        if tok_id is None:
+            tok_id = len(self.tokens)
+            self.token_ids[tok] = tok_id
+            self.tokens.append(tok)
+            self.support.append(0)
+        return tok_id
+
+    def _intern_raw(self, raw: str) -> int:
+        """Return the token ID of a raw token, interning its uppercase form if new."""
+        tok_id = self._raw_ids[raw] = self._intern_token(raw.upper())
+        return tok_id
+
+    def _intern_building(self, building) -> int:
+        """Return the building ID of a building_id value, interning it if new."""
+        b_id = self.building_ids.get(building)
+        if b_id is None:
+            b_id = len(self.buildings)
+            self.building_ids[building] = b_id
+            self.buildings.append(building)
+        return b_id
+
+    def _grow(self):
+        """Extend the per-token arrays to cover newly interned tokens."""
+        extra = len(self.tokens) - len(self.freq)
+        if extra <= 0:
+            return
+        self.freq = np.concatenate([self.freq, np.zeros(extra, dtype=np.int64)])
+        self.numid_bigrams = np.concatenate([self.numid_bigrams, np.zeros(extra, dtype=np.int64)])
+        # Digits have no case, so the uppercase token is numeric exactly when the raw one is
+        new_numeric = [tok.isdigit() for tok in self.tokens[len(self._numeric) :]]
+        self._numeric = np.concatenate([self._numeric, np.array(new_numeric, dtype=bool)])
+
+    # -----------------------------
+    # Counting
+    # -----------------------------
+
+    def add_batch(self, batch: TokenBatch, buildings: Sequence):
+        """Count the tokens of a tokenized batch of labels; buildings[i] is the building of label i."""
+        toks = batch.tokens
+        if not toks:
+            return
+
+        get = self._raw_ids.get
+        ids = [get(t) for t in toks]
+        if None in ids:
+            for j, tok_id in enumerate(ids):
+                if tok_id is None:
+                    raw = toks[j]
+                    ids[j] = self._raw_ids[raw] if raw in self._raw_ids else self._intern_raw(raw)
+            self._grow()
+        ids_arr = np.array(ids, dtype=np.int64)
+        n_tokens = len(self.tokens)
+
+        # Only buildings with at least one token are counted
+        offsets = np.asarray(batch.offsets, dtype=np.int64)
+        lengths = np.diff(offsets)
+        bget = self.building_ids.get
+        label_b = [bget(b, -1) for b in buildings]
+        if -1 in label_b:
+            for i, n in enumerate(lengths.tolist()):
+                if n and label_b[i] == -1:
+                    label_b[i] = self._intern_building(buildings[i])
+        token_b: np.ndarray = np.repeat(np.array(label_b, dtype=np.int64), lengths)
+
+        self.freq += np.bincount(ids_arr, minlength=n_tokens)
+
+        # (token, numeric token) bigrams, not crossing label boundaries
+        followed = self._numeric[ids_arr[1:]]
+        last = offsets[1:-1] - 1
+        followed[last[(last >= 0) & (last < len(followed))]] = False
+        self.numid_bigrams += np.bincount(ids_arr[:-1][followed], minlength=n_tokens)
+
+        n_buildings = len(self.buildings)
+        support = self.support
+        for code in np.unique(ids_arr * n_buildings + token_b).tolist():
+            tok_id, b_id = divmod(code, n_buildings)
+            support[tok_id] |= 1 << b_id
+
+    # -----------------------------
+    # Merging and persistence
+    # -----------------------------
+
+    def merge(self, other: "TokenStats") -> "TokenStats":
+        """
+        Add the statistics of other into this object and return it.
+        Tokens and buildings new to self are appended in other's first-seen order.
+        """
+        tok_map = [self._intern_token(tok) for tok in other.tokens]
+        b_map = [self._intern_building(b) for b in other.buildings]
+        self._grow()
+        if tok_map:
+            self.freq[tok_map] += other.freq
+            self.numid_bigrams[tok_map] += other.numid_bigrams
+
+        support = self.support
+        same_buildings = b_map == list(range(len(b_map)))
+        for tok_id, bits in zip(tok_map, other.support):
+            if same_buildings:
+                support[tok_id] |= bits
+                continue
+            for b, bit in enumerate(bin(bits)[:1:-1]):
+                if bit == "1":
+                    support[tok_id] |= 1 << b_map[b]
+        return self
+
+    def to_dict(self) -> dict:
+        """JSON-serializable form of the statistics (building bitsets as integers)."""
+        return {
+            "tokens": self.tokens,
+            "buildings": self.buildings,
+            "freq": self.freq.tolist(),
+            "numid_bigrams": self.numid_bigrams.tolist(),
+            "support": self.support,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TokenStats":
+        """Rebuild statistics from to_dict() output."""
+        stats = cls()
+        for tok in data["tokens"]:
+            stats._intern_token(tok)
+        for building in data["buildings"]:
+            stats._intern_building(building)
+        stats._grow()
+        stats.freq[:] = data["freq"]
+        stats.numid_bigrams[:] = data["numid_bigrams"]
+        stats.support = list(data["support"])
+        return stats
+
+    def save(self, path):
+        """Write the statistics to a JSON file."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path) -> "TokenStats":
+        """Read statistics written by save()."""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    # -----------------------------
+    # Views in the shape extract_vocab uses
+    # -----------------------------
+
+    @property
+    def num_tokens(self) -> int:
+        """Number of distinct UPPERCASE tokens."""
+        return len(self.tokens)
+
+    @property
+    def num_buildings(self) -> int:
+        """Number of buildings with at least one token."""
+        return len(self.buildings)
+
+    def frequency(self) -> dict[str, int]:
+        """Token -> frequency, in first-seen order."""
+        return dict(zip(self.tokens, self.freq.tolist()))
+
+    def numid_bigram_counter(self) -> Counter:
+        """Counter of (token, numeric token) bigrams per token, for tokens that have any."""
+        return Counter({self.tokens[i]: int(self.numid_bigrams[i]) for i in np.flatnonzero(self.numid_bigrams)})
+
+    def building_support(self) -> dict[str, int]:
+        """Token -> number of buildings it appears in."""
+        return {tok: bits.bit_count() for tok, bits in zip(self.tokens, self.support)}
+
+    def buildings_of(self, tok: str) -> frozenset:
+        """Return the building_id values a token appears in (empty if the token is unknown)."""
+        tok_id = self.token_ids.get(tok)
+        if tok_id is None:
+            return frozenset()
+        # bin() lists the bits most significant first; reversed, character b is building ID b
+        bits = bin(self.support[tok_id])[:1:-1]
+        return frozenset(self.buildings[b] for b, bit in enumerate(bits) if bit == "1")
+
+    def token_buildings(self) -> "TokenBuildings":
+        """Read-only token -> set(building_ids) mapping, decoded on access from the bitsets."""
+        return TokenBuildings(self)
+
+
+def merge_token_stats(partials: Iterable[TokenStats]) -> TokenStats:
+    """Merge partial statistics, in order, into one new TokenStats."""
+    merged = TokenStats()
+    for part in partials:
+        merged.merge(part)
+    return merged
+
+
+class TokenBuildings(Mapping):
+    """Lazy token -> frozenset(building_ids) view over TokenStats bitsets; each set is decoded once."""
+
+    def __init__(self, stats: TokenStats):
+        self._stats = stats
+        self._decoded: dict[str, frozenset] = {}
+
+    def __getitem__(self, tok: str) -> frozenset:
+        decoded = self._decoded.get(tok)
+        if decoded is None:
+            if tok not in self._stats.token_ids:
+                raise KeyError(tok)
+            decoded = self._decoded[tok] = self._stats.buildings_of(tok)
+        return decoded
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._stats.tokens)
+
+    def __len__(self) -> int:
+        return len(self._stats.tokens)
@@ -3,9 +3,15 @@ Tokenization utilities for BMS labels.
 """
 
 import re
+from collections.abc import Iterable
+from typing import NamedTuple
 
 DELIM_RE = re.compile(r"[ _\.\-\/:]+")  # separators: space, _, ., -, /, :
 
+# Single-pass scanner equivalent to DELIM_RE.split + split_alpha_num:
+# letter runs, digit runs, or any single char that is neither a separator nor whitespace.
+TOKEN_RE = re.compile(r"[A-Za-z]+|\d+|[^A-Za-z0-9 _.\-/:\s]")
+
 
 def split_alpha_num(token: str):
     """
@@ -23,3 +29,81 @@ def tokenize(label: str):
     for t in rough:
         tokens.extend(split_alpha_num(t))
     return tokens
+
+
+def tokenize_single_pass(label: str):
+    """
+    Tokenize a BMS point label with one precompiled scan.
+    Produces exactly the same tokens as tokenize(), without the intermediate splits.
+    """
+    return TOKEN_RE.findall(label)
+
+
+def tokenize_with_spans(label: str):
+    """
+    Tokenize a BMS point label and also return (start, end) character offsets of each token,
+    so that label[start:end] == token.
+    Example: 'AHU-03' -> (['AHU', '03'], [(0, 3), (4, 6)])
+    """
+    tokens = []
+    spans = []
+    for m in TOKEN_RE.finditer(label):
+        tokens.append(m.group())
+        spans.append(m.span())
+    return tokens, spans
+
+
+def tokens_from_spans(label: str, spans):
+    """Rebuild the token strings of a label from its (start, end) offsets."""
+    return [label[start:end] for start, end in spans]
+
+
+class TokenBatch(NamedTuple):
+    """
+    Tokens of many labels in one flat buffer (Arrow/CSR style).
+    Tokens of label i are tokens[offsets[i]:offsets[i + 1]]; len(offsets) == number of labels + 1.
+    """
+
+    tokens: list[str]
+    offsets: list[int]
+    spans: list[tuple[int, int]] | None = None  # (start, end) per token, if requested
+
+    def label_tokens(self, i: int) -> list[str]:
+        """Return the tokens of label i."""
+        return self.tokens[self.offsets[i] : self.offsets[i + 1]]
+
+    def label_spans(self, i: int) -> list[tuple[int, int]]:
+        """Return the (start, end) offsets of the tokens of label i."""
+        if self.spans is None:
+            raise ValueError("TokenBatch was built without spans; use tokenize_many(..., with_spans=True).")
+        return self.spans[self.offsets[i] : self.offsets[i + 1]]
+
+    def to_lists(self) -> list[list[str]]:
+        """Return one token list per label, as tokenize() would."""
+        tokens, offsets = self.tokens, self.offsets
+        return [tokens[offsets[i] : offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+def tokenize_many(labels: Iterable[str], with_spans: bool = False) -> TokenBatch:
+    """
+    Tokenize many point labels into one flat token buffer plus per-label offsets.
+    With with_spans=True, the batch also carries each token's (start, end) offsets into its label.
+    """
+    tokens: list[str] = []
+    offsets = [0]
+    if with_spans:
+        spans: list[tuple[int, int]] = []
+        for label in labels:
+            for m in TOKEN_RE.finditer(label):
+                tokens.append(m.group())
+                spans.append(m.span())
+            offsets.append(len(tokens))
+        return TokenBatch(tokens, offsets, spans)
+
+    extend = tokens.extend
+    append = offsets.append
+    findall = TOKEN_RE.findall
+    for label in labels:
+        extend(findall(label))
+        append(len(tokens))
+    return TokenBatch(tokens, offsets)
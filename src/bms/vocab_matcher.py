@@ -0,0 +1,80 @@
+"""
+Segmentation of glued tokens into vocabulary words.
+
+The tokenizer splits point names at separators and letter/digit boundaries,
+so abbreviations written without separators ("OCCSENSOR", "CLGMAXFLO",
+"LOOPOUT") stay one token, which label_token only finds in a vocabulary if
+the whole token is a vocabulary word, and otherwise labels MISC.
+
+A `VocabTrie` holds the vocabulary words in a character trie. segment() walks
+the trie from every position of a token, which finds every vocabulary word
+starting there in one pass over at most the longest word, and a dynamic
+program over the positions picks the split of the whole token into the fewest
+words (ties go to the longer leading word). The cost is linear in the token
+length for a given vocabulary, instead of testing every substring. Tokens
+that cannot be covered entirely by words of at least min_length characters
+are left alone: short words such as "CO" or "TO" would otherwise split
+ordinary words ("COND", "TODAY").
+"""
+
+from collections.abc import Mapping
+
+# Shortest vocabulary word segment() uses as a piece
+MIN_PIECE_LENGTH = 3
+
+# Trie node key of the category of the word ending at that node (characters are never empty)
+_WORD = ""
+
+
+class VocabTrie:
+    """Character trie of uppercase vocabulary words, each with its category."""
+
+    def __init__(self, table: Mapping[str, str], min_length: int = MIN_PIECE_LENGTH):
+        self.min_length = min_length
+        self.root: dict = {}
+        for word, category in table.items():
+            if len(word) < min_length:
+                continue
+            node = self.root
+            for char in word:
+                node = node.setdefault(char, {})
+            node[_WORD] = category
+
+    def segment(self, token: str) -> list[tuple[int, int, str]] | None:
+        """
+        Split token (matched in uppercase, as label_token does) into two or more vocabulary words:
+        their (start, end, category), or None if token is not made of vocabulary words.
+        """
+        text = token.upper()
+        n = len(text)
+        if n != len(token) or n < 2 * self.min_length:
+            return None
+        # pieces[i]: fewest words covering text[i:]; first[i]: (end, category) of the first of them
+        pieces: list[int | None] = [None] * n + [0]
+        first: list[tuple[int, str] | None] = [None] * n
+        root = self.root
+        for start in range(n - self.min_length, -1, -1):
+            node = root
+            best = None
+            for end in range(start, n):
+                child = node.get(text[end])
+                if child is None:
+                    break
+                node = child
+                rest = pieces[end + 1]
+                # <= : of two splits with as many words, keep the one with the longer leading word
+                if rest is not None and _WORD in node and (best is None or rest + 1 <= best):
+                    best = rest + 1
+                    first[start] = (end + 1, node[_WORD])
+            pieces[start] = best
+        if pieces[0] is None or pieces[0] < 2:
+            return None
+        segments = []
+        start = 0
+        while start < n:
+            piece = first[start]
+            assert piece is not None  # pieces[0] is set, so every piece start has its first word
+            end, category = piece
+            segments.append((start, end, category))
+            start = end
+        return segments
@@ -0,0 +1,207 @@
+"""
+Compiled, memory-mappable form of the labelling vocabularies.
+
+`load_vocabs` parses bms_vocabs.json (including its frequency table, which
+labelling never uses) and builds a set per vocabulary in every process that
+labels points. A compiled vocab file holds the same vocabularies in a binary
+layout that is read in place through mmap, so any number of pool or service
+worker processes share one read-only copy in the page cache and start without
+parsing JSON:
+
+    header      magic, token count, hash slot count, SHA-256 of the source file
+    categories  the category of every mask bit, comma-separated
+    offsets     uint32[num_tokens + 1]: token i is blob[offsets[i]:offsets[i + 1]]
+    masks       uint8[num_tokens]: bit b set if token i is in category b
+    slots       uint32[num_slots]: open-addressing hash index (CRC-32 of the token,
+                linear probing), 1 + token index, 0 for an empty slot
+    blob        the UTF-8 tokens, sorted by their bytes
+
+All integers are little-endian; big-endian hosts keep a byte-swapped copy of
+the offsets and slots and map the rest. `CompiledVocab.as_vocabs()` returns
+read-only set views keyed like load_vocabs, which label_token and TokenLabeler
+accept in place of the sets. A compiled file is replaced atomically when rewritten, so
+processes that still map the old file keep reading a consistent copy.
+"""
+
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from collections.abc import Iterable, Iterator, Mapping, Sequence, Set
+from pathlib import Path
+
+MAGIC = b"BMSVOC01"
+
+# magic, num_tokens, num_slots, len(categories), source digest
+_HEADER = struct.Struct("<8sIII32s")
+
+
+def is_compiled_vocab(path) -> bool:
+    """Return True if path is a compiled vocab file (rather than bms_vocabs.json)."""
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _slot(key: bytes, mask: int) -> int:
+    return zlib.crc32(key) & mask
+
+
+def write_compiled_vocab(vocabs: Mapping[str, Iterable[str]], path, source_digest: bytes = b"") -> Path:
+    """
+    Compile category -> tokens vocabularies (as load_vocabs returns them) into a vocab file at path.
+    source_digest (up to 32 bytes) records what the file was compiled from; see source_digest().
+    """
+    categories = list(vocabs)
+    if len(categories) > 8:
+        raise ValueError(f"A compiled vocab holds at most 8 categories, got {len(categories)}")
+    masks: dict[bytes, int] = {}
+    for bit, category in enumerate(categories):
+        for token in vocabs[category]:
+            key = token.encode("utf-8", "surrogatepass")
+            masks[key] = masks.get(key, 0) | (1 << bit)
+    keys = sorted(masks)
+
+    num_slots = 8
+    while num_slots < 2 * len(keys):
+        num_slots *= 2
+    slots = [0] * num_slots
+    for index, key in enumerate(keys):
+        slot = _slot(key, num_slots - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (num_slots - 1)
+        slots[slot] = index + 1
+
+    offsets = [0]
+    for key in keys:
+        offsets.append(offsets[-1] + len(key))
+    category_names = ",".join(categories).encode("ascii")
+    body = [
+        _HEADER.pack(MAGIC, len(keys), num_slots, len(category_names), source_digest.ljust(32, b"\0")),
+        category_names,
+        struct.pack(f"<{len(offsets)}I", *offsets),
+        bytes(masks[key] for key in keys),
+    ]
+    position = sum(map(len, body))
+    body.append(b"\0" * (-position % 4))  # align the slots
+    body.append(struct.pack(f"<{num_slots}I", *slots))
+    body.extend(keys)
+
+    path = Path(path)
+    # Per-process temporary name: several workers may compile the same file at once
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp_path.open("wb") as f:
+        f.writelines(body)
+    os.replace(tmp_path, path)
+    return path
+
+
+def source_digest(path) -> bytes:
+    """The digest compiled files record of an existing compiled file (b"" if it is missing or not compiled)."""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+    except FileNotFoundError:
+        return b""
+    if len(header) < _HEADER.size or not header.startswith(MAGIC):
+        return b""
+    return _HEADER.unpack(header)[4]
+
+
+class CompiledVocab:
+    """A compiled vocab file, mapped read-only."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < _HEADER.size or self._mmap[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} is not a compiled vocab file")
+        _, self.num_tokens, num_slots, categories_size, self.source_digest = _HEADER.unpack_from(self._mmap)
+        position = _HEADER.size
+        self.categories = tuple(self._mmap[position : position + categories_size].decode("ascii").split(","))
+        position += categories_size
+
+        view = memoryview(self._mmap)
+        self._offsets = self._uint32s(view, position, self.num_tokens + 1)
+        position += 4 * (self.num_tokens + 1)
+        self._masks = view[position : position + self.num_tokens]
+        position += self.num_tokens
+        position += -position % 4
+        self._slots = self._uint32s(view, position, num_slots)
+        self._slot_mask = num_slots - 1
+        self._blob = position + 4 * num_slots
+
+    @staticmethod
+    def _uint32s(view: memoryview, position: int, count: int) -> "memoryview | array[int]":
+        data = view[position : position + 4 * count]
+        if sys.byteorder == "little":
+            return data.cast("I")
+        # Big-endian host: read a byte-swapped copy of the file's little-endian integers
+        uint32s = array("I")
+        uint32s.frombytes(data)
+        uint32s.byteswap()
+        return uint32s
+
+    def _key(self, index: int) -> bytes:
+        return self._mmap[self._blob + self._offsets[index] : self._blob + self._offsets[index + 1]]
+
+    def mask(self, token: str) -> int:
+        """Category bits of token (0 if it is in no vocabulary)."""
+        key = token.encode("utf-8", "surrogatepass")
+        slots = self._slots
+        slot = _slot(key, self._slot_mask)
+        while index := slots[slot]:
+            if self._key(index - 1) == key:
+                return self._masks[index - 1]
+            slot = (slot + 1) & self._slot_mask
+        return 0
+
+    def category_table(self, precedence: Sequence[str]) -> list[str]:
+        """
+        For every mask value, the first category of precedence whose bit it has ("" if none),
+        so that table[self.mask(token)] is the category a lookup in that order would give.
+        """
+        bits = [(self.categories.index(category), category) for category in precedence if category in self.categories]
+        return [next((category for bit, category in bits if mask >> bit & 1), "") for mask in range(256)]
+
+    def tokens(self, bit: int | None = None) -> Iterator[str]:
+        """Every token in sorted order, or those of one category bit."""
+        for index in range(self.num_tokens):
+            if bit is None or self._masks[index] >> bit & 1:
+                yield self._key(index).decode("utf-8", "surrogatepass")
+
+    def as_vocabs(self) -> dict[str, "VocabView"]:
+        """category -> read-only set view, as load_vocabs returns sets."""
+        return {category: VocabView(self, bit) for bit, category in enumerate(self.categories)}
+
+    def __len__(self) -> int:
+        return self.num_tokens
+
+
+class VocabView(Set):
+    """The tokens of one category of a CompiledVocab, as a read-only set."""
+
+    def __init__(self, store: CompiledVocab, bit: int):
+        self.store = store
+        self._bit = bit
+        self._len: int | None = None
+
+    def __contains__(self, token) -> bool:
+        return isinstance(token, str) and bool(self.store.mask(token) >> self._bit & 1)
+
+    def __iter__(self) -> Iterator[str]:
+        return self.store.tokens(self._bit)
+
+    def __len__(self) -> int:
+        if self._len is None:
+            self._len = sum(1 for _ in self)
+        return self._len
+
+    def __reduce__(self):
+        # Sent to another process (e.g. a pool task argument): send the tokens, not the mapping
+        return frozenset, (tuple(self),)
+
+    def __repr__(self) -> str:
+        return f"VocabView({self.store.categories[self._bit]!r}, {len(self)} tokens of {self.store.path})"
@@ -4,8 +4,10 @@ import json
 from pathlib import Path
 
 import pandas as pd
+import pytest
 
 from src.bms import extract_point_names as epn
+from src.bms.dataset_io import iter_column_batches, iter_record_batches, plan_shards, write_points_parquet
 
 # ---------------------------
 # is_bms_style_string tests
@@ -34,6 +36,44 @@ def test_is_bms_style_string_handles_non_string_and_short_inputs():
     assert not epn.is_bms_style_string("AB")  # too short
 
 
+# ---------------------------
+# bms_style_mask tests
+# ---------------------------
+
+
+def test_bms_style_mask_matches_is_bms_style_string():
+    """Test that the vectorized bms_style_mask agrees with is_bms_style_string value by value."""
+    values = [
+        "BLDG1_FL03_AHU2_SAT_AI",
+        "AHU-03.SAT",
+        "Effective_RA_CO_dac_AV",
+        "bas_raw",
+        "haystack",
+        "Label",
+        "",
+        "AB",
+        "  AB1  ",
+        "a b c",
+        "EBU3B.CHWP3-VFD.ACC-TIME",
+        "Café_2",  # non-ASCII
+        "ÉTAGE",
+        "²ab",  # Unicode digit that is not ASCII
+        None,
+        123,
+        float("nan"),
+    ]
+    series = pd.Series(values, dtype=object, index=range(10, 10 + len(values)))
+    mask = epn.bms_style_mask(series)
+    assert mask.index.equals(series.index)
+    assert mask.tolist() == [epn.is_bms_style_string(v) for v in values]
+
+
+def test_bms_style_mask_non_text_and_empty_series():
+    """Test that bms_style_mask handles numeric and empty columns."""
+    assert epn.bms_style_mask(pd.Series([1, 2, 3])).tolist() == [False, False, False]
+    assert epn.bms_style_mask(pd.Series([], dtype=object)).tolist() == []
+
+
 # ---------------------------
 # detect_header tests
 # ---------------------------
@@ -227,3 +267,174 @@ def test_load_all_bms_points_mixed_header_and_headerless(tmp_path: Path):
     # building_id derived from filenames
     assert any(r["building_id"] == "b3_ibm" for r in rows)
     assert any(r["building_id"] == "no_header" for r in rows)
+
+
+def test_load_all_bms_points_streaming_matches_default_mode(tmp_path: Path):
+    """Test that streaming mode writes the same JSONL as the in-memory mode, across chunk borders."""
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    rows = "\n".join(f"AHU{i}_SAT_AI,Sensor" for i in range(7))
+    (raw_dir / "b3_ibm.csv").write_text("Label,TagSet\n" + rows + "\n", encoding="utf-8")
+    (raw_dir / "no_header.csv").write_text(rows + "\n", encoding="utf-8")
+    (raw_dir / "empty.csv").write_text("", encoding="utf-8")
+
+    default_out = tmp_path / "default.jsonl"
+    epn.load_all_bms_points(raw_dir=raw_dir, bms_output_file=default_out)
+
+    streamed_out = tmp_path / "streamed.jsonl"
+    epn.stream_all_bms_points(raw_dir, streamed_out, head_rows=4, chunk_rows=3)
+
+    assert streamed_out.read_text(encoding="utf-8") == default_out.read_text(encoding="utf-8")
+    assert len(streamed_out.read_text(encoding="utf-8").splitlines()) == 14
+
+
+def test_load_all_bms_points_parallel_matches_sequential_and_is_sorted(tmp_path: Path):
+    """Test that --workers gives the same JSONL as one process, ordered by filename."""
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    for name in ["zeta.csv", "alpha.csv", "mid.csv"]:
+        rows = "\n".join(f"{name[:3].upper()}_AHU{i}_SAT" for i in range(3))
+        (raw_dir / name).write_text(rows + "\n", encoding="utf-8")
+
+    seq_out = tmp_path / "seq.jsonl"
+    epn.load_all_bms_points(raw_dir=raw_dir, bms_output_file=seq_out)
+
+    for streaming in (False, True):
+        par_out = tmp_path / f"par_{streaming}.jsonl"
+        epn.load_all_bms_points(raw_dir=raw_dir, bms_output_file=par_out, streaming=streaming, workers=2)
+        assert par_out.read_text(encoding="utf-8") == seq_out.read_text(encoding="utf-8")
+
+    records = [json.loads(line) for line in seq_out.read_text(encoding="utf-8").splitlines()]
+    assert [r["source_file"] for r in records[::3]] == ["alpha.csv", "mid.csv", "zeta.csv"]
+
+
+def test_update_bms_points_reparses_only_changed_files(tmp_path: Path, capsys):
+    """Test that incremental updates splice new/changed files into the output like a full rebuild would."""
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    (raw_dir / "a.csv").write_text("Label,TagSet\nAHU1_SAT_AI,x\nAHU2_SAT_AI,x\n", encoding="utf-8")
+    (raw_dir / "b.csv").write_text("VAV1_CMD\nVAV2_CMD\n", encoding="utf-8")
+    (raw_dir / "c.csv").write_text("FCU1_TEMP\n", encoding="utf-8")
+
+    out = tmp_path / "all_points.jsonl"
+    epn.update_bms_points(raw_dir, out)
+    assert "3 parsed, 0 reused" in capsys.readouterr().out
+    manifest = json.loads(epn.manifest_path_for(out).read_text(encoding="utf-8"))
+    assert manifest["files"]["a.csv"]["has_header"] is True
+    assert manifest["files"]["a.csv"]["point_col"] == "Label"
+
+    # change b, remove c, add d
+    (raw_dir / "b.csv").write_text("VAV1_CMD\nVAV2_CMD\nVAV3_CMD\n", encoding="utf-8")
+    (raw_dir / "c.csv").unlink()
+    (raw_dir / "d.csv").write_text("CRAC9_STATUS\n", encoding="utf-8")
+    epn.update_bms_points(raw_dir, out)
+    assert "2 parsed, 1 reused, 1 removed" in capsys.readouterr().out
+
+    full = tmp_path / "full.jsonl"
+    epn.load_all_bms_points(raw_dir, full)
+    assert out.read_text(encoding="utf-8") == full.read_text(encoding="utf-8")
+
+
+def test_update_bms_points_ignores_stale_manifest(tmp_path: Path, capsys):
+    """Test that a manifest is not trusted once the output was rewritten by a full run."""
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    (raw_dir / "a.csv").write_text("AHU1_SAT_AI\n", encoding="utf-8")
+    out = tmp_path / "all_points.jsonl"
+    epn.update_bms_points(raw_dir, out)
+
+    out.write_text("", encoding="utf-8")
+    epn.update_bms_points(raw_dir, out)
+    assert "1 parsed, 0 reused" in capsys.readouterr().out
+    assert json.loads(out.read_text(encoding="utf-8"))["point_label"] == "AHU1_SAT_AI"
+
+
+def test_load_all_bms_points_dedup_skips_identical_files_and_repeated_labels(tmp_path: Path):
+    """Test that dedup ingests byte-identical exports once and drops repeated labels within a file."""
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    content = "AHU1_SAT_AI\nAHU2_SAT_AI\nAHU1_SAT_AI\n"
+    (raw_dir / "CHEM.csv").write_text(content, encoding="utf-8")
+    (raw_dir / "site-efcf3bcb.csv").write_text(content, encoding="utf-8")
+
+    for streaming in (False, True):
+        out = tmp_path / f"out_{streaming}.jsonl"
+        epn.load_all_bms_points(raw_dir=raw_dir, bms_output_file=out, streaming=streaming, dedup=True)
+        rows = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+        assert [r["point_label"] for r in rows] == ["AHU1_SAT_AI", "AHU2_SAT_AI"]
+        assert {r["source_file"] for r in rows} == {"CHEM.csv"}
+
+    out = tmp_path / "incremental.jsonl"
+    epn.update_bms_points(raw_dir, out, dedup=True)
+    assert out.read_text(encoding="utf-8") == (tmp_path / "out_False.jsonl").read_text(encoding="utf-8")
+    manifest = json.loads(epn.manifest_path_for(out).read_text(encoding="utf-8"))
+    assert manifest["files"]["site-efcf3bcb.csv"]["duplicate_of"] == "CHEM.csv"
+
+
+def test_load_all_bms_points_sniff_rows_reads_only_point_column(tmp_path: Path):
+    """Test that sniffing the head and parsing only the point column gives the same JSONL."""
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    wide_rows = "\n".join(f"{i},foo,EBU3B.AHU{i}.SAT,Temp,{i * 2}" for i in range(20))
+    (raw_dir / "ebu3b_ucsd.csv").write_text("id,desc,Johnson Controls Name,kind,val\n" + wide_rows + "\n")
+    (raw_dir / "no_header.csv").write_text("VAV1_CMD,x\nVAV2_CMD,x\nVAV3_CMD,x\n", encoding="utf-8")
+
+    full_out = tmp_path / "full.jsonl"
+    epn.load_all_bms_points(raw_dir=raw_dir, bms_output_file=full_out)
+    sniff_out = tmp_path / "sniff.jsonl"
+    epn.load_all_bms_points(raw_dir=raw_dir, bms_output_file=sniff_out, sniff_rows=5)
+    assert sniff_out.read_text(encoding="utf-8") == full_out.read_text(encoding="utf-8")
+
+    sniffed = epn.sniff_csv(raw_dir / "ebu3b_ucsd.csv", head_rows=5)
+    assert sniffed == {"has_header": True, "point_col": "Johnson Controls Name", "col_idx": 2}
+    column = epn.read_point_column(raw_dir / "ebu3b_ucsd.csv", sniffed)
+    assert list(column.columns) == ["Johnson Controls Name"]
+    assert len(column) == 20
+
+
+def test_load_all_bms_points_parquet_round_trips_like_jsonl(tmp_path: Path):
+    """Test that the Parquet points dataset reads back to the same records as the JSONL one."""
+    pq = pytest.importorskip("pyarrow.parquet")
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    (raw_dir / "CHEM.csv").write_text("AHU1_SAT\nAHU1_RAT\nVAV2_CMD\n", encoding="utf-8")
+    (raw_dir / "b3_ibm.csv").write_text("name,units\nBLDG1_FL03_AHU2_SAT_AI,degF\n", encoding="utf-8")
+
+    jsonl_out = tmp_path / "all_points.jsonl"
+    epn.load_all_bms_points(raw_dir=raw_dir, bms_output_file=jsonl_out)
+    parquet_out = tmp_path / "all_points.parquet"
+    epn.load_all_bms_points(raw_dir=raw_dir, bms_output_file=parquet_out, output_format="parquet")
+
+    schema = pq.read_schema(parquet_out)
+    assert str(schema.field("building_id").type).startswith("dictionary")
+    assert list(iter_record_batches(parquet_out, 2)) == list(iter_record_batches(jsonl_out, 2))
+    columns = ["point_label", "building_id"]
+    assert list(iter_column_batches(parquet_out, 3, columns)) == list(iter_column_batches(jsonl_out, 3, columns))
+
+
+def test_parquet_shards_are_whole_row_groups(tmp_path: Path):
+    """Test that Parquet shards are planned on row group boundaries and read back every row once."""
+    pytest.importorskip("pyarrow.parquet")
+    df = pd.DataFrame(
+        {
+            "building_id": [f"B{i % 2}" for i in range(10)],
+            "source_file": "b.csv",
+            "point_label": [f"AHU{i}_SAT" for i in range(10)],
+            "point_label_col": "Label",
+        }
+    )
+    path = tmp_path / "all_points.parquet"
+    write_points_parquet(df, path, row_group_size=3)
+
+    shards = plan_shards(path, 3)
+    assert shards == [(0, 3), (3, 6), (6, 10)]
+    labels = [
+        label
+        for shard in shards
+        for batch in iter_column_batches(path, 2, ["point_label"], shard=shard)
+        for label in batch["point_label"]
+    ]
+    assert labels == list(df["point_label"])
+    # Ranges off the row group boundaries are still read exactly
+    rows = [r["point_label"] for batch in iter_record_batches(path, 2, shard=(2, 7)) for r in batch]
+    assert rows == list(df["point_label"][2:7])
@@ -5,7 +5,11 @@ from collections import Counter, defaultdict
 
 import pytest
 
+from src.bms import extract_point_names as epn
 from src.bms import generate_bms_vocab as gmv
+from src.bms import label_point_tokens as lpt
+from src.bms.dataset_io import plan_shards
+from src.bms.token_stats import TokenStats, merge_token_stats
 
 # -----------------------------
 # Primitive helpers
@@ -152,3 +156,92 @@ def test_extract_vocab_small_dataset(tmp_path):
     assert "SAT" in vocabs["subcomp_vocab"]
     # Point function (CMD is in seeds)
     assert "CMD" in vocabs["point_func_vocab"]
+
+
+def test_extract_vocab_same_result_across_batch_sizes(tmp_path, monkeypatch):
+    """Test that extract_vocab gives the same vocabs no matter how lines are batched."""
+    jsonl_path = tmp_path / "all_points.jsonl"
+    labels = ["AHU-01.SAT_AI", "VAV12 CMD", "", "AHU-02.SAT_AI", "VAV13 CMD"]
+    with jsonl_path.open("w", encoding="utf-8") as f:
+        for i in range(30):
+            f.write(json.dumps({"building_id": f"B{i % 3}", "point_label": labels[i % len(labels)]}) + "\n")
+            if i == 10:
+                f.write("\n")
+
+    expected = gmv.extract_vocab(jsonl_path)
+    monkeypatch.setattr(gmv, "BATCH_SIZE", 4)
+    assert gmv.extract_vocab(jsonl_path) == expected
+
+
+def test_extract_vocab_map_reduce_over_shards_matches_single_pass(tmp_path):
+    """Test that counting byte-range shards and merging the saved partials reproduces the single-pass vocabs."""
+    jsonl_path = tmp_path / "all_points.jsonl"
+    labels = ["AHU-01.SAT_AI", "VAV12 CMD", "", "SIEMENS_AHU-02.SAT_AI", "vav13 cmd"]
+    with jsonl_path.open("w", encoding="utf-8") as f:
+        for i in range(40):
+            f.write(json.dumps({"building_id": f"B{i % 3}", "point_label": labels[i % len(labels)]}) + "\n")
+
+    expected = gmv.extract_vocab(jsonl_path)
+    for n_shards in (2, 7):
+        partials = []
+        for i, shard in enumerate(plan_shards(jsonl_path, n_shards)):
+            gmv.count_vocab_shard(jsonl_path, shard=shard).save(tmp_path / f"part{i}.json")
+            partials.append(TokenStats.load(tmp_path / f"part{i}.json"))
+        vocabs = gmv.classify_vocab(merge_token_stats(partials))
+        assert json.dumps(vocabs) == json.dumps(expected)  # same content and key order
+    assert gmv.extract_vocab(jsonl_path, workers=3) == expected
+
+
+def test_update_vocab_recounts_only_changed_buildings(tmp_path, capsys):
+    """Test that update_vocab matches a full extract_vocab as building files are added and removed."""
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    for name, label in [("B1", "AHU-01.SAT_AI"), ("B2", "VAV12 CMD"), ("B3", "SIEMENS_AHU-02.SAT")]:
+        (raw_dir / f"{name}.csv").write_text("\n".join(f"{label}_{i}" for i in range(12)) + "\n", encoding="utf-8")
+    points = tmp_path / "all_points.jsonl"
+    state = gmv.state_path_for(tmp_path / "bms_vocabs.json")
+
+    def refresh():
+        epn.update_bms_points(raw_dir, points)
+        vocabs = gmv.update_vocab(points, state)
+        assert vocabs == gmv.extract_vocab(points)
+        return capsys.readouterr().out
+
+    assert "3 files counted, 0 reused" in refresh()
+    assert "0 files counted, 3 reused, 0 removed, 0 tokens reclassified" in refresh()
+    (raw_dir / "B4.csv").write_text("\n".join(f"FCU-{i} RUN" for i in range(12)) + "\n", encoding="utf-8")
+    assert "1 files counted, 3 reused, 0 removed" in refresh()
+    (raw_dir / "B2.csv").unlink()
+    assert "0 files counted, 3 reused, 1 removed" in refresh()
+
+
+# -----------------------------
+# main: output layouts
+# -----------------------------
+
+
+def test_main_split_output_keeps_vocabs_and_moves_statistics(tmp_path, monkeypatch):
+    """Test that --split-output writes the same vocabularies and statistics as one file, in two."""
+    with (tmp_path / "all_points.jsonl").open("w", encoding="utf-8") as f:
+        for i in range(24):
+            f.write(json.dumps({"building_id": f"B{i % 2}", "point_label": "SIEMENS_AHU-01.SAT_AI_CMD"}) + "\n")
+    monkeypatch.setenv("PARSER_OUTPUT_DIR", str(tmp_path))
+    vocab_file = tmp_path / "bms_vocabs.json"
+
+    gmv.main([])
+    combined = json.loads(vocab_file.read_text(encoding="utf-8"))
+    for compress in (False, True):
+        gmv.main(["--split-output", *(["--compress-stats"] if compress else [])])
+        runtime = json.loads(vocab_file.read_text(encoding="utf-8"))
+        assert runtime == {key: value for key, value in combined.items() if key not in gmv.STATS_KEYS}
+        assert lpt.load_vocabs(str(vocab_file)) == lpt.parse_vocabs(json.dumps(combined).encode())
+        assert gmv.load_vocab_stats(vocab_file) == {"frequency": combined["frequency"], "stats": combined["stats"]}
+        assert gmv.stats_path_for(vocab_file, compress).is_file()
+        assert not gmv.stats_path_for(vocab_file, not compress).exists()
+
+    gmv.main([])
+    assert json.loads(vocab_file.read_text(encoding="utf-8")) == combined
+    assert not gmv.stats_path_for(vocab_file, True).exists()
+    assert gmv.load_vocab_stats(vocab_file)["stats"] == combined["stats"]
+    with pytest.raises(SystemExit):
+        gmv.parse_args(["--compress-stats"])
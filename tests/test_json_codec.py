@@ -0,0 +1,80 @@
+"""Unit tests for json_codec module."""
+
+import json
+
+import pytest
+
+from src.bms import json_codec as jc
+
+BACKENDS = jc.available_backends()
+
+TRICKY_VALUES = [
+    {"point_label": "AHU-01/SAT", "tokens": ["AHU", "01"], "token_spans": [[0, 3], [4, 6]], "structured": None},
+    {"point_label": "Café Zone 2", "building_id": "b "},  # non-ASCII, written escaped by json.dumps
+    {"point_label": "".join(chr(i) for i in range(128))},  # control characters, quotes, backslash, DEL
+    {"point_label": "\ud83d", "n": 2**70, "flag": True},  # lone surrogate, big integer
+    {"point_label_col": 3, "empty": [], "nested": {}},
+]
+
+
+# -----------------------------
+# get_codec
+# -----------------------------
+
+
+def test_get_codec_resolves_auto_and_environment(monkeypatch):
+    """Test that auto picks the fastest installed backend and BMS_JSON_BACKEND is honoured."""
+    assert jc.get_codec("auto").name == BACKENDS[0]
+    assert jc.get_codec("stdlib").name == "stdlib"
+    monkeypatch.setenv("BMS_JSON_BACKEND", "stdlib")
+    assert jc.get_codec().name == "stdlib"
+    with pytest.raises(ValueError):
+        jc.get_codec("simdjson")
+
+
+# -----------------------------
+# encoding and decoding
+# -----------------------------
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("separators", [None, (",", ":")])
+def test_dumps_matches_json_dumps(backend, separators):
+    """Test that every backend writes exactly the bytes json.dumps writes."""
+    codec = jc.get_codec(backend)
+    for value in TRICKY_VALUES:
+        assert codec.dumps(value, separators=separators) == json.dumps(value, separators=separators)
+        assert codec.encoder(separators)(value) == json.dumps(value, separators=separators)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_decode_records_and_columns_match_json_loads(backend):
+    """Test that batch decoding skips blank lines and agrees with json.loads, falling back where needed."""
+    codec = jc.get_codec(backend)
+    lines = [json.dumps(value).encode("utf-8") for value in TRICKY_VALUES]
+    lines.insert(2, b"  \n")
+    expected = [json.loads(line) for line in lines if line.strip()]
+    assert codec.decode_records(lines) == expected
+
+    columns = ["point_label", "building_id"]
+    got = codec.decode_columns(lines, columns, defaults={"building_id": "unknown"})
+    assert got == {
+        "point_label": [r.get("point_label") for r in expected],
+        "building_id": [r.get("building_id", "unknown") for r in expected],
+    }
+    assert codec.decode_columns(lines[:2], columns) == {
+        "point_label": ["AHU-01/SAT", "Café Zone 2"],
+        "building_id": [None, "b "],
+    }
+
+
+def test_msgspec_column_decoder_reads_only_the_requested_columns():
+    """Test that msgspec decodes columns into reused structs, skipping other keys and filling defaults."""
+    pytest.importorskip("msgspec")
+    codec = jc.get_codec("msgspec")
+    lines = [b'{"point_label": "AHU", "extra": {"x": [1, 2]}}', b"", b'{"building_id": "B1", "point_label": "VAV"}']
+    got = codec.decode_columns(lines, ["point_label", "building_id"], defaults={"building_id": "unknown"})
+    assert got == {"point_label": ["AHU", "VAV"], "building_id": ["unknown", "B1"]}
+    decoder = codec._column_decoder(("point_label", "building_id"), (None, "unknown"))
+    assert decoder is codec._column_decoder(("point_label", "building_id"), (None, "unknown"))
+    assert not hasattr(decoder(lines[0]), "extra")
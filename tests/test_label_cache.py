@@ -0,0 +1,74 @@
+"""Unit tests for label_cache module."""
+
+from src.bms.label_cache import LabelCache, label_key, vocab_fingerprint
+
+VOCAB_TABLE = {"AHU": "EQUIP", "SAT": "SUBCOMP", "CMD": "POINT_FUNC"}
+
+
+def fill(cache: LabelCache):
+    """Store two labels: one with a SAT token, one without."""
+    cache.put_many(
+        [
+            (label_key("AHU-01.SAT"), ["AHU", "01", "SAT"], "head1", "tail1"),
+            (label_key("VAV12 CMD"), ["VAV", "12", "CMD"], "head2", "tail2"),
+        ]
+    )
+
+
+# -----------------------------
+# LabelCache
+# -----------------------------
+
+
+def test_label_cache_round_trip_across_runs(tmp_path):
+    """Test that entries stored in one run are found by the next run with the same vocab."""
+    path = tmp_path / "labels.sqlite"
+    cache = LabelCache(path, VOCAB_TABLE)
+    fill(cache)
+    cache.close()
+
+    cache = LabelCache(path, dict(reversed(VOCAB_TABLE.items())))  # same table, other order
+    keys = [label_key("AHU-01.SAT"), label_key("VAV12 CMD"), label_key("unknown"), label_key("AHU-01.SAT")]
+    assert cache.get_many(keys) == {keys[0]: ("head1", "tail1"), keys[1]: ("head2", "tail2")}
+    assert (cache.hits, cache.misses, cache.invalidated) == (2, 1, 0)
+    assert LabelCache(path, VOCAB_TABLE, mode="compact").get_many(keys) == {}
+    cache.close()
+
+
+def test_label_cache_invalidates_only_labels_with_changed_tokens(tmp_path):
+    """Test that a vocab change drops only entries holding a token whose category changed."""
+    path = tmp_path / "labels.sqlite"
+    cache = LabelCache(path, VOCAB_TABLE)
+    fill(cache)
+    cache.close()
+
+    new_table = {**VOCAB_TABLE, "SAT": "EQUIP", "RAT": "SUBCOMP"}
+    assert vocab_fingerprint(new_table) != vocab_fingerprint(VOCAB_TABLE)
+    cache = LabelCache(path, new_table)
+    assert cache.invalidated == 1
+    assert list(cache.get_many([label_key("AHU-01.SAT"), label_key("VAV12 CMD")])) == [label_key("VAV12 CMD")]
+    cache.close()
+
+
+def test_label_cache_is_emptied_when_the_rules_change(tmp_path):
+    """Test that a new rules version drops every entry, whatever the vocab."""
+    path = tmp_path / "labels.sqlite"
+    cache = LabelCache(path, VOCAB_TABLE, rules_version="1:abc")
+    fill(cache)
+    cache.close()
+
+    assert LabelCache(path, VOCAB_TABLE, rules_version="1:abc").invalidated == 0
+    cache = LabelCache(path, VOCAB_TABLE, rules_version="2:abc")
+    assert cache.invalidated == 2
+    assert cache.get_many([label_key("AHU-01.SAT")]) == {}
+    cache.close()
+
+
+def test_label_cache_counts_each_label_once_per_run(tmp_path):
+    """Test that hits and misses count distinct labels, not repeated lookups of the same label."""
+    cache = LabelCache(tmp_path / "labels.sqlite", VOCAB_TABLE)
+    fill(cache)
+    for _ in range(3):
+        cache.get_many([label_key("AHU-01.SAT"), label_key("unknown")])
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
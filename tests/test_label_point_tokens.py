@@ -1,8 +1,16 @@
 """Unit tests for label_point_tokens module."""
 
+import json
+import re
+from pathlib import Path
+
 import pytest
 
 from src.bms import label_point_tokens as lpt
+from src.bms.json_codec import available_backends
+from src.bms.labeled_io import iter_labeled_records
+
+SHIPPED_VOCABS = Path(__file__).resolve().parents[1] / "data" / "output" / "point-name-parser" / "bms_vocabs.json"
 
 # -----------------------------
 # Helper: tiny vocab fixture
@@ -84,6 +92,123 @@ def test_label_token_equip_id_pattern_numeric():
     assert lpt.label_token("03", vocabs) == "EQUIP_ID"
 
 
+def cascade_pattern_label(token: str) -> str:
+    """The pattern categories as label_token used to try them: one regex list after another."""
+    for category, patterns in lpt.PATTERN_PRECEDENCE:
+        if any(p.match(token) for p in patterns):
+            return category
+    return "MISC"
+
+
+@pytest.mark.skipif(not SHIPPED_VOCABS.is_file(), reason="shipped bms_vocabs.json not available")
+def test_combined_pattern_matches_cascade_on_shipped_frequency_tokens():
+    """Test that the single named-group regex labels every shipped frequency token like the pattern cascade."""
+    with SHIPPED_VOCABS.open("r", encoding="utf-8") as f:
+        frequency = json.load(f)["frequency"]
+    assert frequency
+    for tok in frequency:
+        for variant in (tok, tok.lower(), tok.capitalize()):
+            m = lpt.TOKEN_PATTERN_RE.match(variant)
+            assert (m.lastgroup if m else "MISC") == cascade_pattern_label(variant), variant
+
+
+def test_combined_pattern_keeps_precedence_and_case_rules():
+    """Test precedence (FLOOR before ZONE before EQUIP_ID) and that EQUIP_ID stays case-sensitive."""
+    no_vocab = {"EQUIP": set(), "SUBCOMP": set(), "POINT_FUNC": set(), "IO_TYPE": set(), "VENDOR_TAG": set()}
+    for tok in ["F3", "floor", "1203", "2SE21", "rm148a", "12", "A10", "a10", "bldg7", "AHU", "12\n", ""]:
+        assert lpt.label_token(tok, no_vocab) == cascade_pattern_label(tok), tok
+    assert lpt.label_token("a10", no_vocab) == "MISC"
+    with pytest.raises(ValueError):
+        lpt.combine_patterns([("FLOOR", [re.compile(r"FL\d+")])])
+
+
+# -----------------------------
+# TokenLabeler
+# -----------------------------
+
+
+def test_token_labeler_matches_label_token(small_vocabs):
+    """Test that the compiled labeler gives label_token's category for vocab, mixed-case and pattern tokens."""
+    vocabs = {**small_vocabs, "EQUIP": {"AHU", "SIEMENS"}, "SUBCOMP": {"SAT", "TEMP", "ahu"}}
+    labeler = lpt.TokenLabeler(vocabs, cache_size=4)
+    tokens = ["SIEMENS", "Siemens", "AHU", "ahu", "Temp", "CMD", "Di", "FL03", "RM148A", "01", "A10", "BLDG1", "XYZ"]
+    expected = [lpt.label_token(tok, vocabs) for tok in tokens]
+    assert labeler.label_tokens(tokens) == expected
+    assert labeler.label_tokens(tokens) == expected  # second pass through the (now evicting) cache
+    assert [labeler.label(tok) for tok in tokens] == expected
+    assert labeler.table["SIEMENS"] == "VENDOR_TAG"  # vendor precedes equipment
+    assert "ahu" not in labeler.table
+
+
+def test_annotate_record_with_labeler_matches_vocab_labels(small_vocabs):
+    """Test that annotate_record gives the same output with and without a TokenLabeler."""
+    raw = {"point_label": "SIEMENS_AHU-01.SAT_AI_cmd", "building_id": "B1"}
+    labeler = lpt.TokenLabeler(small_vocabs)
+    assert lpt.annotate_record(raw, small_vocabs, labeler=labeler) == lpt.annotate_record(raw, small_vocabs)
+
+
+def test_compiled_vocabs_label_like_json_and_follow_json_changes(tmp_path):
+    """Test that compile_vocabs writes a file load_vocabs reads back as the same vocabularies, recompiling on change."""
+    vocab_path = tmp_path / "bms_vocabs.json"
+    vocab_json = {"equip_vocab": ["AHU", "SIEMENS"], "subcomp_vocab": ["SAT", "ahu"], "vendor_vocab": ["SIEMENS"]}
+    vocab_path.write_text(json.dumps({**vocab_json, "frequency": {"AHU": 3}}), encoding="utf-8")
+    compiled = lpt.compile_vocabs(vocab_path)
+    assert compiled == tmp_path / "bms_vocabs.bin"
+
+    json_vocabs = lpt.load_vocabs(str(vocab_path))
+    vocabs = lpt.load_vocabs(str(compiled))
+    assert {category: set(tokens) for category, tokens in vocabs.items()} == json_vocabs
+    tokens = ["SIEMENS", "AHU", "ahu", "Sat", "FL03", "01", "XYZ"]
+    labeler = lpt.TokenLabeler(vocabs)
+    assert labeler.table == {}  # tokens are looked up in the mapped file, not copied per process
+    assert labeler.label_tokens(tokens) == [lpt.label_token(tok, json_vocabs) for tok in tokens]
+    glued = lpt.TokenLabeler(vocabs, split_glued=True).split_glued_tokens(["AHUSIEMENS"], None, ["MISC"])
+    assert glued == (["AHU", "SIEMENS"], None, ["EQUIP", "VENDOR_TAG"])
+
+    mtime = compiled.stat().st_mtime_ns
+    assert lpt.compile_vocabs(vocab_path) == compiled and compiled.stat().st_mtime_ns == mtime
+    assert lpt.compile_vocabs(compiled) == compiled
+    vocab_path.write_text(json.dumps({**vocab_json, "equip_vocab": ["AHU", "VAV"]}), encoding="utf-8")
+    assert "VAV" in lpt.load_vocabs(str(lpt.compile_vocabs(vocab_path)))["EQUIP"]
+
+
+def test_split_glued_labeler_splits_misc_tokens_into_vocab_words(small_vocabs):
+    """Test that a split_glued labeler replaces glued MISC tokens by their words, keeping tokens and spans aligned."""
+    vocabs = {**small_vocabs, "SUBCOMP": {"SAT", "TEMP", "SENSOR"}, "POINT_FUNC": {"CMD", "STATUS", "OCC"}}
+    raw = {"point_label": "AHU-01.OccSensor_TEMPCMD xyz"}
+    plain = lpt.annotate_record(raw, vocabs, output_mode="spans", labeler=lpt.TokenLabeler(vocabs, split_glued=False))
+    assert plain["tokens"] == ["AHU", "01", "OccSensor", "TEMPCMD", "xyz"]
+    assert plain["token_labels"] == ["EQUIP", "EQUIP_ID", "MISC", "MISC", "MISC"]
+    assert plain == lpt.annotate_record(raw, vocabs, output_mode="spans")
+
+    labeler = lpt.TokenLabeler(vocabs, split_glued=True)
+    annotated = lpt.annotate_record(raw, vocabs, output_mode="spans", labeler=labeler)
+    assert annotated["tokens"] == ["AHU", "01", "Occ", "Sensor", "TEMP", "CMD", "xyz"]
+    assert annotated["token_labels"] == ["EQUIP", "EQUIP_ID", "POINT_FUNC", "SUBCOMP", "SUBCOMP", "POINT_FUNC", "MISC"]
+    assert [raw["point_label"][start:end] for start, end in annotated["token_spans"]] == annotated["tokens"]
+    assert annotated["bio_tags"] == lpt.categories_to_bio(annotated["token_labels"])
+    compact = lpt.annotate_record(raw, vocabs, output_mode="compact", labeler=labeler)
+    assert compact["token_spans"] == annotated["token_spans"]
+    tokens_only = lpt.annotate_record(raw, vocabs, labeler=labeler)
+    assert tokens_only["tokens"] == annotated["tokens"] and tokens_only["structured"] == annotated["structured"]
+
+    with pytest.raises(SystemExit):
+        lpt.parse_args(["--split-glued", "--cache"])
+
+
+def test_split_glued_only_uses_vocabulary_words():
+    """Test that glued tokens with a piece missing from the shipped vocab (OFF, PIPE, SUPPLY, AIR) stay MISC."""
+    vocabs = lpt.load_vocabs(str(SHIPPED_VOCABS))
+    glued = ["OPENOFF", "PIPEVLV", "SUPPLYAIRTEMP"]
+    labeler = lpt.TokenLabeler(vocabs, split_glued=True)
+    assert labeler.split_glued_tokens(glued, None, labeler.label_tokens(glued)) == (glued, None, ["MISC"] * 3)
+
+    extended = {**vocabs, "SUBCOMP": vocabs["SUBCOMP"] | {"OFF", "PIPE", "SUPPLY", "AIR"}}
+    labeler = lpt.TokenLabeler(extended, split_glued=True)
+    tokens, _, _ = labeler.split_glued_tokens(glued, None, labeler.label_tokens(glued))
+    assert tokens == ["OPEN", "OFF", "PIPE", "VLV", "SUPPLY", "AIR", "TEMP"]
+
+
 # -----------------------------
 # build_structured / annotate_record
 # -----------------------------
@@ -128,3 +253,155 @@ def test_annotate_record_end_to_end_small_example(small_vocabs, monkeypatch):
     assert annotated["structured"]["equip_id"] == "03"
     assert annotated["structured"]["subcomp"] == "SAT"
     assert annotated["structured"]["io_type"] == "AI"
+
+
+def test_annotate_record_span_output_modes(small_vocabs):
+    """Test that spans/compact output modes emit token offsets into point_label."""
+    raw = {"point_label": "AHU-03.SAT_AI", "building_id": "B1"}
+
+    with_spans = lpt.annotate_record(raw, small_vocabs, output_mode="spans")
+    assert with_spans["tokens"] == ["AHU", "03", "SAT", "AI"]
+    assert with_spans["token_spans"] == [(0, 3), (4, 6), (7, 10), (11, 13)]
+
+    compact = lpt.annotate_record(raw, small_vocabs, output_mode="compact")
+    assert "tokens" not in compact
+    assert compact["token_spans"] == with_spans["token_spans"]
+    assert compact["token_labels"] == ["EQUIP", "EQUIP_ID", "SUBCOMP", "IO_TYPE"]
+
+    with pytest.raises(ValueError):
+        lpt.annotate_record(raw, small_vocabs, output_mode="bogus")
+
+
+# -----------------------------
+# main
+# -----------------------------
+
+
+# bms_vocabs.json key of every vocabulary category
+VOCAB_JSON_KEYS = {
+    "EQUIP": "equip_vocab",
+    "SUBCOMP": "subcomp_vocab",
+    "POINT_FUNC": "point_func_vocab",
+    "IO_TYPE": "io_type_vocab",
+    "VENDOR_TAG": "vendor_vocab",
+}
+
+
+def vocab_json_of(vocabs):
+    """The bms_vocabs.json content of category -> tokens vocabularies."""
+    return {VOCAB_JSON_KEYS[category]: sorted(tokens) for category, tokens in vocabs.items()}
+
+
+@pytest.fixture
+def run_main(tmp_path, monkeypatch):
+    """
+    Run main with tmp_path as PARSER_OUTPUT_DIR: run_main(records, vocab_json, *args) writes the
+    points and bms_vocabs.json, runs main(args) and returns the output as JSONL text.
+    """
+    monkeypatch.setenv("PARSER_OUTPUT_DIR", str(tmp_path))
+
+    def run(records, vocab_json, *args):
+        with (tmp_path / "all_points.jsonl").open("w", encoding="utf-8") as f:
+            f.writelines(json.dumps(record) + "\n" for record in records)
+        (tmp_path / "bms_vocabs.json").write_text(json.dumps(vocab_json), encoding="utf-8")
+        lpt.main(list(args))
+        if "--format" in args and args[args.index("--format") + 1] == "parquet":
+            records = iter_labeled_records(tmp_path / "point_names_labeled.parquet")
+            return "".join(json.dumps(record) + "\n" for record in records)
+        return (tmp_path / "point_names_labeled.jsonl").read_text(encoding="utf-8")
+
+    return run
+
+
+def test_main_with_workers_matches_single_process(run_main, tmp_path, small_vocabs):
+    """Test that --workers writes the same annotated JSONL, in input order, as the single-process run."""
+    labels = ["SIEMENS_AHU-01.SAT_AI", "FL03 RM148A TEMP", "", "VAV12 CMD", "BLDG1.AHU-02.STATUS"]
+    records = [{"building_id": f"B{i % 4}", "point_label": f"{labels[i % len(labels)]}_{i}"} for i in range(50)]
+    vocab_json = vocab_json_of(small_vocabs)
+
+    expected = run_main(records, vocab_json)
+    assert run_main(records, vocab_json, "--workers", "2") == expected
+    assert (tmp_path / "bms_vocabs.bin").is_file()  # what the workers loaded
+    assert [json.loads(line)["point_label"] for line in expected.splitlines()][:2] == [
+        "SIEMENS_AHU-01.SAT_AI_0",
+        "FL03 RM148A TEMP_1",
+    ]
+
+
+def test_main_with_cache_reuses_annotations_and_follows_vocab_changes(run_main, monkeypatch, capsys):
+    """Test that --cache writes the same output as a plain run, also after the vocab or the rules changed."""
+    labels = ["AHU-01.SAT_AI", 'Odd, "building_id": label', "FL03 RM148A TEMP", "AHU-01.SAT_AI", "VAV12 CMD"]
+    records = [
+        {"building_id": f"B{i % 2}", "source_file": "x.csv", "point_label": label} for i, label in enumerate(labels)
+    ]
+    vocab_json = {"equip_vocab": ["AHU"], "subcomp_vocab": ["SAT"], "point_func_vocab": ["CMD"]}
+
+    for mode in ("tokens", "compact"):
+        expected = run_main(records, vocab_json, "--output-mode", mode)
+        assert run_main(records, vocab_json, "--output-mode", mode, "--cache") == expected
+        assert run_main(records, vocab_json, "--output-mode", mode, "--cache") == expected
+        assert "4 hits, 0 misses (distinct labels)" in capsys.readouterr().out
+
+    vocab_json["subcomp_vocab"] = ["SAT", "TEMP"]
+    expected = run_main(records, vocab_json)
+    assert run_main(records, vocab_json, "--cache") == expected
+    # TEMP labels, tokens + compact
+    assert "3 hits, 1 misses (distinct labels), 2 entries invalidated" in capsys.readouterr().out
+
+    monkeypatch.setattr(lpt, "LABEL_RULES_VERSION", lpt.LABEL_RULES_VERSION + 1)
+    assert run_main(records, vocab_json, "--cache") == expected
+    assert "0 hits, 4 misses (distinct labels)" in capsys.readouterr().out
+
+
+def test_main_with_dedup_labels_matches_plain_run(run_main, capsys):
+    """Test that --dedup-labels writes the same output as a plain run and reports the dedup ratio."""
+    labels = ["AHU-01.SAT_AI", "VAV12 CMD", "AHU-01.SAT_AI", "AHU-01.SAT_AI", "VAV12 CMD", "FL03 TEMP"]
+    records = [
+        {"building_id": f"B{i % 2}", "source_file": f"{i}.csv", "point_label": label} for i, label in enumerate(labels)
+    ]
+    vocab_json = {"equip_vocab": ["AHU", "VAV"]}
+
+    for mode in ("tokens", "spans", "compact"):
+        expected = run_main(records, vocab_json, "--output-mode", mode)
+        assert run_main(records, vocab_json, "--output-mode", mode, "--dedup-labels") == expected
+        assert "6 rows, 3 distinct point labels (2.00 rows per label), 3 annotated" in capsys.readouterr().out
+
+
+def test_main_with_dedup_labels_and_workers_counts_labels_shared_by_shards_once(run_main, capsys):
+    """Test that --dedup-labels --workers reports the distinct labels of the whole input, not a sum over shards."""
+    labels = ["AHU-01.SAT_AI", "VAV12 CMD", "FL03 TEMP"]
+    records = [{"building_id": "B1", "source_file": f"{i}.csv", "point_label": labels[i % 3]} for i in range(60)]
+    vocab_json = {"equip_vocab": ["AHU", "VAV"]}
+
+    expected = run_main(records, vocab_json)
+    assert run_main(records, vocab_json, "--dedup-labels", "--workers", "2") == expected
+    out = capsys.readouterr().out
+    assert "60 rows, 3 distinct point labels (20.00 rows per label)" in out
+    assert int(re.search(r"(\d+) annotated", out).group(1)) > 3  # every shard annotates its own labels
+
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_main_output_does_not_depend_on_json_backend(run_main, backend):
+    """Test that every --json-backend writes the same bytes as the stdlib backend."""
+    labels = ["AHU-01.SAT_AI", "Café Zone 2", "VAV12 CMD\x7f"]
+    records = [{"building_id": "B1", "source_file": "x.csv", "point_label": label} for label in labels]
+    vocab_json = {"equip_vocab": ["AHU", "VAV"]}
+
+    for mode in ("tokens", "compact"):
+        expected = run_main(records, vocab_json, "--output-mode", mode, "--json-backend", "stdlib")
+        assert run_main(records, vocab_json, "--output-mode", mode, "--json-backend", backend) == expected
+
+
+def test_main_parquet_format_reads_back_as_jsonl_records(run_main):
+    """Test that --format parquet stores the same annotations as the JSONL output."""
+    labels = ["AHU-01.SAT_AI", "Café Zone 2", "FL03 RM148A TEMP", "VAV12 CMD"]
+    records = [
+        {"building_id": f"B{i % 2}", "source_file": "x.csv", "point_label": label} for i, label in enumerate(labels)
+    ]
+    vocab_json = {"equip_vocab": ["AHU", "VAV"]}
+
+    expected = run_main(records, vocab_json)
+    for workers in ("1", "2"):
+        assert run_main(records, vocab_json, "--format", "parquet", "--workers", workers) == expected
+    with pytest.raises(SystemExit):
+        lpt.parse_args(["--format", "parquet", "--dedup-labels"])
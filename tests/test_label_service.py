@@ -0,0 +1,168 @@
+"""Unit tests for label_service module."""
+
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.bms import label_point_tokens as lpt
+from src.bms import label_service as svc
+
+POINTS = [
+    {"point_label": "AHU-01.SAT_AI", "building_id": "B1", "source_file": "b1.csv"},
+    {"point_label": "Café FL03 RM148A VAV12 CMD"},
+]
+
+
+@pytest.fixture
+def vocab_file(tmp_path):
+    """Write a small vocab file and return its path."""
+    path = tmp_path / "bms_vocabs.json"
+    path.write_text(json.dumps({"equip_vocab": ["AHU"], "subcomp_vocab": ["SAT"]}), encoding="utf-8")
+    return path
+
+
+# -----------------------------
+# /annotate and /health
+# -----------------------------
+
+
+@pytest.mark.parametrize("output_mode", lpt.OUTPUT_MODES)
+def test_annotate_endpoint_matches_annotate_record(vocab_file, output_mode):
+    """Test that /annotate returns the annotate_record dicts of every posted point."""
+    client = TestClient(svc.create_app(vocab_file))
+    response = client.post("/annotate", json={"points": POINTS, "output_mode": output_mode})
+    assert response.status_code == 200
+    vocabs = lpt.load_vocabs(str(vocab_file))
+    expected = [lpt.annotate_record(p, vocabs, output_mode=output_mode) for p in POINTS]
+    assert response.json()["annotations"] == json.loads(json.dumps(expected))
+
+    assert client.post("/annotate", json={"points": POINTS, "output_mode": "xml"}).status_code == 422
+    assert client.get("/health").json()["vocab_version"] == response.json()["vocab_version"]
+
+
+# -----------------------------
+# hot reload
+# -----------------------------
+
+
+def test_vocab_file_changes_are_picked_up_and_broken_files_ignored(vocab_file):
+    """Test that a rewritten vocab file is reloaded, and an unreadable one keeps the old vocab in service."""
+    client = TestClient(svc.create_app(vocab_file, check_interval=0))
+
+    def vav_label():
+        response = client.post("/annotate", json={"points": [{"point_label": "VAV"}]})
+        return response.json()["annotations"][0]["token_labels"][0]
+
+    assert vav_label() == "MISC"
+    version = client.get("/health").json()["vocab_version"]
+
+    vocab_file.write_text(json.dumps({"equip_vocab": ["AHU", "VAV"], "subcomp_vocab": ["SAT"]}), encoding="utf-8")
+    assert vav_label() == "EQUIP"
+    assert client.get("/health").json()["vocab_version"] != version
+
+    vocab_file.write_text('{"equip_vocab": ["AH', encoding="utf-8")  # half-written file
+    assert vav_label() == "EQUIP"
+    assert client.get("/health").json()["reload_errors"] > 0
+
+
+def test_empty_vocab_file_keeps_the_old_vocab_in_service(vocab_file):
+    """Test that a vocab file truncated to nothing (as open(..., "w") leaves it) counts as a reload error."""
+    client = TestClient(svc.create_app(vocab_file, check_interval=0))
+    vocab_file.write_text("", encoding="utf-8")
+    response = client.post("/annotate", json={"points": [{"point_label": "AHU"}]})
+    assert response.status_code == 200
+    assert response.json()["annotations"][0]["token_labels"] == ["EQUIP"]
+    health = client.get("/health")
+    assert health.status_code == 200
+    assert health.json()["reload_errors"] > 0
+
+
+# -----------------------------
+# /annotate/stream
+# -----------------------------
+
+
+@pytest.mark.parametrize("output_mode", lpt.OUTPUT_MODES)
+def test_stream_endpoint_matches_label_point_tokens_output(vocab_file, output_mode):
+    """Test that /annotate/stream returns the lines label_point_tokens writes, whatever the body's pieces."""
+    records = POINTS * 4
+    body = (
+        "\n".join(json.dumps(r) for r in records[:5]) + "\n\n" + "\n".join(json.dumps(r) for r in records[5:])
+    ).encode()
+
+    def pieces():
+        for i in range(0, len(body), 7):
+            yield body[i : i + 7]
+
+    client = TestClient(svc.create_app(vocab_file, stream_chunk=3))
+    response = client.post(f"/annotate/stream?output_mode={output_mode}", content=pieces())
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    vocabs = lpt.load_vocabs(str(vocab_file))
+    assert response.text == "".join(lpt.annotate_batch_lines(records, vocabs, output_mode=output_mode))
+
+
+def test_stream_workers_label_from_the_compiled_vocab_file(vocab_file):
+    """Test that stream worker processes map the compiled vocab file and follow its reloads."""
+    snapshot = svc.load_snapshot(vocab_file)
+    assert snapshot.compiled_path == str(vocab_file.with_suffix(".bin"))
+    body = b'{"point_label": "VAV-01"}\n'
+    vav = {"equip_vocab": ["AHU", "VAV"], "subcomp_vocab": ["SAT"]}
+    with TestClient(svc.create_app(vocab_file, check_interval=0, stream_workers=1)) as client:
+        assert json.loads(client.post("/annotate/stream", content=body).text)["token_labels"][0] == "MISC"
+        vocab_file.write_text(json.dumps(vav), encoding="utf-8")
+        assert json.loads(client.post("/annotate/stream", content=body).text)["token_labels"][0] == "EQUIP"
+
+
+def test_stream_endpoint_ends_with_an_error_line_on_bad_input(vocab_file):
+    """Test that a chunk that cannot be decoded ends the stream with an error line after the good chunks."""
+    client = TestClient(svc.create_app(vocab_file, stream_chunk=1))
+    body = json.dumps(POINTS[0]) + "\n{not json\n" + json.dumps(POINTS[1]) + "\n"
+    lines = client.post("/annotate/stream", content=body.encode()).text.splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[0])["point_label"] == POINTS[0]["point_label"]
+    assert "JSONDecodeError" in json.loads(lines[1])["error"]
+
+
+def test_ndjson_chunks_reject_long_lines_whether_complete_or_partial():
+    """Test that a line over max_line bytes is rejected, also when it arrives whole in one block."""
+
+    async def chunks(*blocks):
+        async def body():
+            for block in blocks:
+                yield block
+
+        return [lines async for lines in svc.iter_ndjson_chunks(body(), chunk_size=2, max_line=8)]
+
+    assert asyncio.run(chunks(b"1234\n5678", b"\n9")) == [[b"1234", b"5678"], [b"9"]]
+    for blocks in ([b"123456789\n"], [b"12345", b"6789"]):
+        with pytest.raises(ValueError):
+            asyncio.run(chunks(*blocks))
+
+
+def test_stream_annotations_stops_reading_while_output_is_not_consumed(vocab_file):
+    """Test that a consumer that stops reading stops the body being read after a bounded number of chunks."""
+    snapshot = svc.load_snapshot(vocab_file)
+    lines_read = 0
+
+    async def body():
+        nonlocal lines_read
+        for _ in range(50):
+            lines_read += 1
+            yield b'{"point_label": "AHU-01"}\n'
+
+    async def consume(executor):
+        stream = svc.stream_annotations(body(), lambda: snapshot, executor, chunk_size=1, queue_depth=2)
+        outputs = [await anext(stream)]
+        await asyncio.sleep(0.2)  # a slow client
+        read_while_stalled = lines_read
+        outputs.extend([text async for text in stream])
+        return read_while_stalled, outputs
+
+    with ThreadPoolExecutor(1) as executor:
+        read_while_stalled, outputs = asyncio.run(consume(executor))
+    assert read_while_stalled <= 1 + 2 + 2
+    assert len(outputs) == 50
@@ -0,0 +1,64 @@
+"""Unit tests for labeled_io module."""
+
+import pytest
+
+from src.bms import label_point_tokens as lpt
+from src.bms import labeled_io as lio
+
+VOCABS = {
+    "EQUIP": {"AHU", "VAV"},
+    "SUBCOMP": {"SAT"},
+    "POINT_FUNC": {"CMD"},
+    "IO_TYPE": {"AI"},
+    "VENDOR_TAG": {"SIEMENS"},
+}
+
+RAW_RECORDS = [
+    {"building_id": "B1", "source_file": "b1.csv", "point_label": "AHU-01.SAT_AI", "point_label_col": "Name"},
+    {"building_id": "B1", "source_file": "b1.csv", "point_label": "", "point_label_col": "Name"},
+    {"building_id": "B2", "source_file": "b2.csv", "point_label": "Café FL03 RM148A VAV12 CMD"},
+    {"building_id": None, "source_file": "b3.csv", "point_label": "BLDG7 SIEMENS AHU AHU 2"},
+]
+
+
+# -----------------------------
+# code tables
+# -----------------------------
+
+
+def test_code_tables_cover_every_label_token_category():
+    """Test that every category label_token can return, and every BIO tag, has a code."""
+    categories = {"MISC", *lpt.VOCAB_PRECEDENCE, *(cat for cat, _ in lpt.PATTERN_PRECEDENCE)}
+    assert set(lio.TOKEN_CATEGORIES) == categories
+    assert set(lpt.categories_to_bio(list(categories))) <= set(lio.BIO_TAGS)
+    assert lio.STRUCTURED_FIELDS == tuple(lpt.build_structured([], []))
+
+
+# -----------------------------
+# write / read round trip
+# -----------------------------
+
+
+@pytest.mark.parametrize("output_mode", lpt.OUTPUT_MODES)
+def test_labeled_parquet_round_trip_gives_annotate_record_dicts(tmp_path, output_mode):
+    """Test that iter_labeled_records yields exactly the dicts annotate_record builds, in every mode."""
+    path = tmp_path / "labeled.parquet"
+    with lio.LabeledPointsWriter(path) as writer:
+        writer.write_annotations(lpt.annotate_batch(RAW_RECORDS[:2], VOCABS, output_mode="compact"))
+        writer.write_annotations(lpt.annotate_batch(RAW_RECORDS[2:], VOCABS, output_mode="spans"))
+    expected = lpt.annotate_batch(RAW_RECORDS, VOCABS, output_mode=output_mode)
+    assert list(lio.iter_labeled_records(path, output_mode, batch_size=3)) == expected
+
+    table = lio.read_labeled_table(path, columns=["token_labels"])
+    codes = table.column("token_labels").to_pylist()
+    assert [[lio.TOKEN_CATEGORIES[c] for c in row] for row in codes] == [a["token_labels"] for a in expected]
+
+
+def test_annotations_to_table_rejects_unknown_categories_and_missing_spans():
+    """Test that the writer refuses annotations it could not read back."""
+    annotated = lpt.annotate_batch(RAW_RECORDS[:1], VOCABS, output_mode="compact")
+    annotated[0]["token_labels"][0] = "ROOF"
+    with pytest.raises(ValueError, match="ROOF"):
+        lio.annotations_to_table(annotated)
+    with pytest.raises(ValueError, match="token_spans"):
+        lio.annotations_to_table(lpt.annotate_batch(RAW_RECORDS[:1], VOCABS))
@@ -0,0 +1,86 @@
+"""Unit tests for token_stats module."""
+
+from collections import Counter, defaultdict
+
+from src.bms.token_stats import TokenStats, merge_token_stats
+from src.bms.tokenizer import tokenize, tokenize_many
+
+LABELS = [
+    ("AHU-03.SAT_AI", "B1"),
+    ("ahu 3 sat", "B2"),
+    ("", "B3"),  # no tokens: B3 is not counted as a building
+    ("VAV12 CMD", "B1"),
+    ("7 VAV", "B2"),  # numeric token right after the previous label's last token
+    ("Rm 101 temp", None),
+]
+
+
+def reference_stats(labels):
+    """Straightforward Counter/set implementation of the statistics TokenStats collects."""
+    token_counter = Counter()
+    token_buildings = defaultdict(set)
+    token_numid_bigram = Counter()
+    buildings = set()
+    for label, bldg in labels:
+        toks = tokenize(label)
+        if not toks:
+            continue
+        upper = [t.upper() for t in toks]
+        token_counter.update(upper)
+        buildings.add(bldg)
+        for t in upper:
+            token_buildings[t].add(bldg)
+        for j in range(len(toks) - 1):
+            if toks[j + 1].isdigit():
+                token_numid_bigram[upper[j]] += 1
+    return token_counter, token_buildings, token_numid_bigram, buildings
+
+
+def build_stats(labels, batch_size):
+    """Feed labels to a TokenStats in batches of batch_size."""
+    stats = TokenStats()
+    for i in range(0, len(labels), batch_size):
+        chunk = labels[i : i + batch_size]
+        stats.add_batch(tokenize_many(label for label, _ in chunk), [bldg for _, bldg in chunk])
+    return stats
+
+
+# -----------------------------
+# TokenStats
+# -----------------------------
+
+
+def test_token_stats_matches_reference_counters():
+    """Test that TokenStats gives the same frequency, support and bigram counts as plain Counters/sets."""
+    token_counter, token_buildings, token_numid_bigram, buildings = reference_stats(LABELS)
+    for batch_size in (1, 2, len(LABELS)):
+        stats = build_stats(LABELS, batch_size)
+        assert list(stats.frequency().items()) == list(token_counter.items())  # same first-seen order
+        assert dict(stats.token_buildings()) == token_buildings
+        assert stats.building_support() == {t: len(b) for t, b in token_buildings.items()}
+        assert stats.numid_bigram_counter() == token_numid_bigram
+        assert stats.num_tokens == len(token_counter)
+        assert stats.num_buildings == len(buildings) == 3
+
+
+def test_token_stats_interns_case_variants_to_one_id():
+    """Test that raw spellings differing only in case share one UPPERCASE token ID."""
+    stats = build_stats(LABELS, len(LABELS))
+    assert stats.tokens.count("AHU") == 1
+    assert stats.frequency()["AHU"] == 2
+    assert stats.buildings_of("AHU") == {"B1", "B2"}
+    assert stats.buildings_of("NOPE") == frozenset()
+
+
+def test_token_stats_merge_of_partials_matches_one_pass(tmp_path):
+    """Test that merging per-shard statistics (also after a save/load round trip) equals counting everything at once."""
+    whole = build_stats(LABELS, len(LABELS))
+    parts = [build_stats(LABELS[:2], 2), build_stats(LABELS[2:4], 2), build_stats(LABELS[4:], 2)]
+    parts[1].save(tmp_path / "part.json")
+    parts[1] = TokenStats.load(tmp_path / "part.json")
+
+    merged = merge_token_stats(parts)
+    assert list(merged.frequency().items()) == list(whole.frequency().items())
+    assert dict(merged.token_buildings()) == dict(whole.token_buildings())
+    assert merged.numid_bigram_counter() == whole.numid_bigram_counter()
+    assert merged.num_buildings == whole.num_buildings
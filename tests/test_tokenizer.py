@@ -0,0 +1,107 @@
+"""Unit tests for tokenizer module."""
+
+import csv
+from pathlib import Path
+
+import pytest
+
+from src.bms import tokenizer as tk
+
+BUILDINGS_DIR = Path(__file__).resolve().parents[1] / "data" / "bms-fierro" / "buildings"
+
+
+def iter_building_cells():
+    """Yield every cell string of every building CSV shipped with the repo."""
+    for csv_path in sorted(BUILDINGS_DIR.glob("*.csv")):
+        with csv_path.open("r", encoding="utf-8", errors="replace", newline="") as f:
+            for row in csv.reader(f):
+                yield from row
+
+
+# -----------------------------
+# tokenize
+# -----------------------------
+
+
+def test_tokenize_splits_on_delimiters_and_alpha_num():
+    """Test that tokenize splits on separators and letter/digit transitions."""
+    assert tk.tokenize("AHU-03.SAT_AI") == ["AHU", "03", "SAT", "AI"]
+    assert tk.tokenize("ZONE.AHU01.RM3218:VLV1 COMD") == ["ZONE", "AHU", "01", "RM", "3218", "VLV", "1", "COMD"]
+
+
+# -----------------------------
+# tokenize_single_pass
+# -----------------------------
+
+
+@pytest.mark.parametrize(
+    "label",
+    [
+        "",
+        "AHU-03.SAT_AI",
+        "CMU/SCSC Gates/Eighth Floor/8126 Machine Room CRAC-9/% Capacity",
+        "Chilled Water System -> Pump -> 3 -> VFD",
+        "__..--//::  ",
+        "RM1203E\tTEMP\nSP",
+        "Café Zone 2",  # non-ASCII letter, non-breaking space
+        "FL٣٤_A",  # non-ASCII digits
+        "(SAT)+[2]",
+    ],
+)
+def test_tokenize_single_pass_matches_tokenize_on_edge_cases(label):
+    """Test that tokenize_single_pass agrees with tokenize on tricky inputs."""
+    assert tk.tokenize_single_pass(label) == tk.tokenize(label)
+
+
+@pytest.mark.skipif(not BUILDINGS_DIR.is_dir(), reason="building CSVs not available")
+def test_tokenize_single_pass_matches_tokenize_on_all_buildings():
+    """Test that tokenize_single_pass agrees with tokenize on every cell of every building CSV."""
+    n_cells = 0
+    for cell in iter_building_cells():
+        assert tk.tokenize_single_pass(cell) == tk.tokenize(cell), cell
+        n_cells += 1
+    assert n_cells > 0
+
+
+# -----------------------------
+# tokenize_many
+# -----------------------------
+
+
+def test_tokenize_many_returns_flat_tokens_and_offsets():
+    """Test that tokenize_many builds one flat buffer with CSR-style offsets."""
+    batch = tk.tokenize_many(["AHU-03.SAT", "", "VAV12 CMD"])
+    assert batch.tokens == ["AHU", "03", "SAT", "VAV", "12", "CMD"]
+    assert batch.offsets == [0, 3, 3, 6]
+    assert batch.label_tokens(2) == ["VAV", "12", "CMD"]
+
+
+def test_tokenize_many_to_lists_matches_tokenize():
+    """Test that TokenBatch.to_lists gives back per-label tokenize() output."""
+    labels = ["AHU-03.SAT_AI", "", "CMU/SCSC Gates/8126 CRAC-9/% Capacity", "RM1203E"]
+    assert tk.tokenize_many(labels).to_lists() == [tk.tokenize(lbl) for lbl in labels]
+    assert tk.tokenize_many([]).to_lists() == []
+
+
+# -----------------------------
+# spans
+# -----------------------------
+
+
+def test_tokenize_with_spans_offsets_slice_back_to_tokens():
+    """Test that every (start, end) span slices the label back to its token."""
+    label = "ZONE.AHU01.RM3218:VLV1 COMD"
+    tokens, spans = tk.tokenize_with_spans(label)
+    assert tokens == tk.tokenize(label)
+    assert spans[:3] == [(0, 4), (5, 8), (8, 10)]
+    assert tk.tokens_from_spans(label, spans) == tokens
+
+
+def test_tokenize_many_with_spans():
+    """Test that tokenize_many can carry per-token spans alongside the flat buffer."""
+    batch = tk.tokenize_many(["AHU-03", "", "VAV12"], with_spans=True)
+    assert batch.label_spans(0) == [(0, 3), (4, 6)]
+    assert batch.label_spans(1) == []
+    assert batch.label_spans(2) == [(0, 3), (3, 5)]
+    with pytest.raises(ValueError):
+        tk.tokenize_many(["AHU-03"]).label_spans(0)
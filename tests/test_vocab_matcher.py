@@ -0,0 +1,47 @@
+"""Unit tests for vocab_matcher module."""
+
+from src.bms.vocab_matcher import VocabTrie
+
+TABLE = {
+    "OCC": "POINT_FUNC",
+    "SENSOR": "SUBCOMP",
+    "SEN": "SUBCOMP",
+    "SOR": "SUBCOMP",
+    "CLG": "SUBCOMP",
+    "MAX": "POINT_FUNC",
+    "MAXFLO": "SUBCOMP",
+    "FLO": "SUBCOMP",
+    "AHU": "EQUIP",
+    "CO": "EQUIP",
+    "ND": "EQUIP",
+}
+
+
+def pieces(trie, token):
+    """The words segment() splits token into, or None."""
+    segments = trie.segment(token)
+    return None if segments is None else [token[start:end] for start, end, _ in segments]
+
+
+# -----------------------------
+# VocabTrie.segment
+# -----------------------------
+
+
+def test_segment_finds_fewest_vocabulary_words():
+    """Test that glued tokens split into the fewest words, preferring longer leading words on ties."""
+    trie = VocabTrie(TABLE)
+    assert trie.segment("OCCSENSOR") == [(0, 3, "POINT_FUNC"), (3, 9, "SUBCOMP")]  # not OCC SEN SOR
+    assert pieces(trie, "CLGMAXFLO") == ["CLG", "MAXFLO"]
+    assert pieces(trie, "OfficeAHU") is None  # OFFICE is not a word
+    assert pieces(trie, "occSensor") == ["occ", "Sensor"]  # matched in uppercase, split in the original
+    assert pieces(trie, "CLGAHUX") is None  # must be covered entirely
+
+
+def test_segment_ignores_short_words_and_single_words():
+    """Test that words under min_length are not used, and a whole-word token is not split."""
+    assert pieces(VocabTrie(TABLE), "COND") is None
+    assert pieces(VocabTrie(TABLE, min_length=2), "COND") == ["CO", "ND"]
+    assert pieces(VocabTrie(TABLE), "SENSOR") is None
+    assert pieces(VocabTrie(TABLE), "") is None
+    assert pieces(VocabTrie({"SS": "SUBCOMP", "AHU": "EQUIP"}, min_length=2), "ßAHU") is None  # upper() changes length
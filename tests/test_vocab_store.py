@@ -0,0 +1,65 @@
+"""Unit tests for vocab_store module."""
+
+import pickle
+import struct
+import sys
+
+import pytest
+
+from src.bms import vocab_store as vs
+
+VOCABS = {
+    "VENDOR_TAG": {"SIEMENS"},
+    "IO_TYPE": set(),
+    "EQUIP": {"AHU", "SIEMENS", "CAFÉ", "\ud83d"},  # shared with VENDOR_TAG, non-ASCII, lone surrogate
+    "SUBCOMP": {f"T{i}" for i in range(100)},  # enough tokens for hash collisions
+}
+
+
+# -----------------------------
+# write_compiled_vocab / CompiledVocab
+# -----------------------------
+
+
+def test_compiled_vocab_round_trips_every_category(tmp_path):
+    """Test that every token is found in exactly its categories, and that views iterate like the sets."""
+    path = vs.write_compiled_vocab(VOCABS, tmp_path / "vocab.bin", b"digest")
+    assert vs.is_compiled_vocab(path)
+    assert vs.source_digest(path) == b"digest".ljust(32, b"\0")
+
+    store = vs.CompiledVocab(path)
+    assert store.categories == tuple(VOCABS)
+    assert len(store) == len(set().union(*VOCABS.values()))
+    views = store.as_vocabs()
+    for category, tokens in VOCABS.items():
+        view = views[category]
+        assert set(view) == tokens and len(view) == len(tokens)
+        for other in VOCABS.values():
+            for token in other:
+                assert (token in view) == (token in tokens)
+    assert "ahu" not in views["EQUIP"] and "" not in views["EQUIP"] and 1 not in views["EQUIP"]
+    assert list(store.tokens()) == sorted(store.tokens(), key=lambda t: t.encode("utf-8", "surrogatepass"))
+    assert pickle.loads(pickle.dumps(views["EQUIP"])) == frozenset(VOCABS["EQUIP"])
+
+    table = store.category_table(["EQUIP", "VENDOR_TAG"])
+    assert table[store.mask("SIEMENS")] == "EQUIP" and table[store.mask("T1")] == "" and table[0] == ""
+
+
+@pytest.mark.skipif(sys.byteorder != "little", reason="simulates a big-endian host on a little-endian one")
+def test_uint32s_are_byte_swapped_on_big_endian_hosts(monkeypatch):
+    """Test that a big-endian host swaps the integers it reads (simulated with big-endian bytes)."""
+    monkeypatch.setattr(vs.sys, "byteorder", "big")
+    # These bytes read natively here as the file's bytes read natively on a big-endian host
+    data = b"\0" * 4 + struct.pack(">3I", 1, 2, 70000)
+    assert list(vs.CompiledVocab._uint32s(memoryview(data), 4, 3)) == [1, 2, 70000]
+
+
+def test_non_compiled_files_are_told_apart(tmp_path):
+    """Test that JSON and missing files are not mistaken for compiled vocabularies."""
+    json_path = tmp_path / "bms_vocabs.json"
+    json_path.write_text('{"equip_vocab": ["AHU"]}', encoding="utf-8")
+    assert not vs.is_compiled_vocab(json_path)
+    assert vs.source_digest(json_path) == b""
+    assert vs.source_digest(tmp_path / "missing.bin") == b""
+    with pytest.raises(ValueError):
+        vs.CompiledVocab(json_path)